@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Benchmark Field Declaration Parsing
+
+Times parse_field_declarations from serializationlib_core against the field
+regex the stages used before it, on pathological lines (long whitespace runs,
+10k-character template argument lists, deep template nesting, unterminated
+declarator lists) and on ordinary member declarations.
+
+Before timing, the parser is checked against the expected fields of
+declarator lists, templates with commas, arrays and default initializers; the
+run exits with status 1 on the first mismatch.
+
+The parser must stay linear in the line length. For every pathological case the
+time at the largest length is compared with the time at the smallest; the run
+exits with status 1 if it grew more than linearly (within --threshold):
+
+    python bench_field_parser.py --lengths 10000,40000 --threshold 1.0
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+from typing import Callable, Dict, List, Tuple
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(script_dir), 'serializationlib_core'))
+
+from serializationlib_field_parser import parse_field_declarations
+
+
+# The field regex of S4, S5 and S7 before the parser (S2 used it without the access prefix)
+LEGACY_FIELD_PATTERN = re.compile(
+    r'^\s*(?:Public|Private|Protected)?\s*([A-Za-z_][A-Za-z0-9_<>*&,\s]*?)\s+([A-Za-z_][A-Za-z0-9_]*)\s*[;=]'
+)
+
+# Ordinary member declarations, for the per-line cost
+ORDINARY_LINES = [
+    'optional<int> count;',
+    'Public optional<StdString> name;',
+    'StdString label = "x";',
+    'optional<map<StdString, optional<int>>> scores;',
+    'Private optional<vector<double>> samples;',
+    'int a, b;',
+    'void reset();',
+    'public:',
+]
+
+
+# Lines and the (type, name) pairs the parser must return
+EXPECTED_DECLARATIONS: List[Tuple[str, List[Tuple[str, str]]]] = [
+    # Declarator lists
+    ('int a, b;', [('int', 'a'), ('int', 'b')]),
+    ('Public optional<int> x, y, z;', [('optional<int>', 'x'), ('optional<int>', 'y'), ('optional<int>', 'z')]),
+    ('int* p, q;', [('int*', 'p'), ('int', 'q')]),
+    ('int a, *b, &c;', [('int', 'a'), ('int*', 'b'), ('int&', 'c')]),
+    # Declarators the parser cannot read are dropped, and lines that do not reach their ; are no declarations
+    ('int a, b{2};', [('int', 'a')]),
+    ('int x, y{0}, z;', [('int', 'x')]),
+    ('int a,', []),
+    # A parameter list wrapped over several lines
+    ('void Set(int first,', []),
+    ('int second,', []),
+    ('int third);', []),
+    ('int fourth = 0,', []),
+    # Templates with commas
+    ('optional<map<StdString, int>> scores;', [('optional<map<StdString, int>>', 'scores')]),
+    ('map<int, vector<int>> m, n;', [('map<int, vector<int>>', 'm'), ('map<int, vector<int>>', 'n')]),
+    ('optional<map<int, int> values;', []),
+    ('void set(map<int, int> values);', []),
+    # Arrays (never fields)
+    ('int codes[4];', []),
+    ('int grid[ROWS][COLS];', []),
+    ('int codes[4], count;', [('int', 'count')]),
+    ('int count, codes[4];', [('int', 'count')]),
+    # Default initializers
+    ('StdString label = "x";', [('StdString', 'label')]),
+    ('int a = 1, b = 2;', [('int', 'a'), ('int', 'b')]),
+    ('StdString s = "x, y", t;', [('StdString', 's'), ('StdString', 't')]),
+    ('map<int, int> m = {{1, 2}, {3, 4}}, n;', [('map<int, int>', 'm'), ('map<int, int>', 'n')]),
+    ('StdString s = "continued"', [('StdString', 's')]),
+    # Other lines
+    ('PrivateKey key;', [('PrivateKey', 'key')]),
+    ('public:', []),
+    ('void reset();', []),
+]
+
+
+def check_declarations() -> List[str]:
+    """
+    Compare the parser's output with EXPECTED_DECLARATIONS.
+
+    Returns:
+        List of descriptions of mismatching lines (empty if every line parses as expected)
+    """
+    failures = []
+    for line, expected in EXPECTED_DECLARATIONS:
+        actual = parse_field_declarations(line, access_prefix=True)
+        if actual != expected:
+            failures.append(f"{line!r}: expected {expected}, got {actual}")
+    return failures
+
+
+def whitespace_run(length: int) -> str:
+    """A type and a name separated by a long run of spaces, without a terminator."""
+    return 'int' + ' ' * length + 'x'
+
+
+def tab_run(length: int) -> str:
+    """A long run of tabs inside the type, without a terminator (minified generated code)."""
+    return 'Public StdString' + '\t' * length + 'name'
+
+
+def long_template_list(length: int) -> str:
+    """A declaration whose template argument list is about length characters long."""
+    arguments = ', '.join(f'K{index}' for index in range(length // 5))
+    return f'optional<map<{arguments}>> values;'
+
+
+def deep_nesting(length: int) -> str:
+    """A declaration with template arguments nested length // 10 levels deep."""
+    depth = length // 10
+    return 'optional<' * depth + 'int' + '>' * depth + ' nested;'
+
+
+def unterminated_declarators(length: int) -> str:
+    """A declarator list of about length characters that never reaches ; or =."""
+    return 'int a' + ', a' * (length // 3)
+
+
+PATHOLOGICAL_CASES: Dict[str, Callable[[int], str]] = {
+    'whitespace_run': whitespace_run,
+    'tab_run': tab_run,
+    'long_template_list': long_template_list,
+    'deep_nesting': deep_nesting,
+    'unterminated_declarators': unterminated_declarators,
+}
+
+
+def parse_new(line: str):
+    """Parse a line with the linear-time parser."""
+    return parse_field_declarations(line, access_prefix=True)
+
+
+def parse_legacy(line: str):
+    """Parse a line with the legacy field regex."""
+    return LEGACY_FIELD_PATTERN.search(line)
+
+
+def parse_legacy_call_site(line: str):
+    """Parse a line the way the stages called the legacy regex (re.search with the pattern string)."""
+    return re.search(LEGACY_FIELD_PATTERN.pattern, line)
+
+
+def best_of(func, repeat: int, number: int = 1) -> float:
+    """
+    Return the best wall time of one func() call in milliseconds.
+
+    Args:
+        func: Zero-argument callable to time
+        repeat: Number of timed runs
+        number: Calls per run (the run time is divided by it)
+
+    Returns:
+        Best time per call in milliseconds
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = (time.perf_counter() - start) * 1000 / number
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def bench_pathological(lengths: List[int], repeat: int, legacy_max: int) -> Dict[str, Dict[int, Dict[str, float]]]:
+    """
+    Time both parsers on every pathological case and length.
+
+    Args:
+        lengths: Line lengths to generate
+        repeat: Number of timed runs per measurement
+        legacy_max: Longest line the legacy regex is run on (it is quadratic)
+
+    Returns:
+        Dictionary mapping case names to lengths to {'parser_ms': ..., 'legacy_ms': ...}
+    """
+    results = {}
+    for name, build in PATHOLOGICAL_CASES.items():
+        results[name] = {}
+        for length in lengths:
+            line = build(length)
+            timings = {'parser_ms': best_of(lambda: parse_new(line), repeat, number=5)}
+            if length <= legacy_max:
+                # Timed once: it is only the reference, and takes seconds on the long lines
+                timings['legacy_ms'] = best_of(lambda: parse_legacy(line), 1)
+            results[name][length] = timings
+    return results
+
+
+def bench_ordinary(lines: int, repeat: int) -> Dict[str, float]:
+    """
+    Time both parsers on ordinary member declarations.
+
+    Args:
+        lines: Number of lines to parse per run
+        repeat: Number of timed runs
+
+    Returns:
+        Dictionary with the per-line cost of each parser in microseconds (the legacy regex
+        both precompiled and as the stages called it)
+    """
+    sample = (ORDINARY_LINES * (lines // len(ORDINARY_LINES) + 1))[:lines]
+
+    def run(parse):
+        for line in sample:
+            parse(line)
+
+    return {
+        'parser_us_per_line': best_of(lambda: run(parse_new), repeat) * 1000 / lines,
+        'legacy_us_per_line': best_of(lambda: run(parse_legacy), repeat) * 1000 / lines,
+        'call_site_us_per_line': best_of(lambda: run(parse_legacy_call_site), repeat) * 1000 / lines,
+    }
+
+
+def find_superlinear(results: Dict[str, Dict[int, Dict[str, float]]], threshold: float) -> List[str]:
+    """
+    Find cases whose parser time grew more than linearly with the line length.
+
+    Args:
+        results: Results of bench_pathological
+        threshold: Allowed growth over linear (1.0 = up to twice the linear growth)
+
+    Returns:
+        List of descriptions (empty if every case scales linearly)
+    """
+    failures = []
+    for name, by_length in results.items():
+        shortest, longest = min(by_length), max(by_length)
+        if shortest == longest:
+            continue
+        growth = by_length[longest]['parser_ms'] / max(by_length[shortest]['parser_ms'], 1e-6)
+        allowed = longest / shortest * (1 + threshold)
+        if growth > allowed:
+            failures.append(f"{name}: {growth:.1f}x slower from {shortest} to {longest} characters "
+                            f"(linear allows {allowed:.1f}x)")
+    return failures
+
+
+def parse_lengths(value: str) -> List[int]:
+    """Parse a comma-separated list of line lengths."""
+    return [int(length) for length in value.split(',') if length.strip()]
+
+
+def main():
+    """Main function to handle command line arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the field declaration parser on pathological lines"
+    )
+    parser.add_argument("--lengths", type=parse_lengths, default=[2500, 10000],
+                        help="Comma-separated line lengths (default: 2500,10000)")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Number of timed runs per measurement (default: 5)")
+    parser.add_argument("--legacy-max", type=int, default=10000,
+                        help="Longest line to run the legacy regex on (default: 10000)")
+    parser.add_argument("--ordinary-lines", type=int, default=20000,
+                        help="Ordinary declarations parsed per run (default: 20000)")
+    parser.add_argument("--threshold", type=float, default=1.0,
+                        help="Allowed growth over linear between the shortest and longest length (default: 1.0)")
+
+    args = parser.parse_args()
+
+    mismatches = check_declarations()
+    if mismatches:
+        print(f"{len(mismatches)} line(s) parse differently than expected:")
+        for mismatch in mismatches:
+            print(f"  {mismatch}")
+        return 1
+    print(f"All {len(EXPECTED_DECLARATIONS)} declaration checks passed\n")
+
+    results = bench_pathological(args.lengths, args.repeat, args.legacy_max)
+    print(f"{'case':26}{'length':>10}{'parser ms':>14}{'legacy ms':>14}")
+    for name, by_length in results.items():
+        for length, timings in by_length.items():
+            legacy = timings.get('legacy_ms')
+            legacy_cell = '-' if legacy is None else f"{legacy:.3f}"
+            print(f"{name:26}{length:>10}{timings['parser_ms']:>14.3f}{legacy_cell:>14}")
+
+    ordinary = bench_ordinary(args.ordinary_lines, args.repeat)
+    print(f"\nOrdinary declarations: {ordinary['parser_us_per_line']:.2f} us/line "
+          f"(legacy regex {ordinary['legacy_us_per_line']:.2f} us/line precompiled, "
+          f"{ordinary['call_site_us_per_line']:.2f} us/line as the stages called it)")
+
+    failures = find_superlinear(results, args.threshold)
+    if failures:
+        print(f"\n{len(failures)} case(s) scale worse than linear:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("\nAll pathological cases scale linearly")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Benchmark Client File Discovery
+
+Compares the scandir-based discovery engine in serializationlib_core against the
+original os.walk implementation on a synthetic PlatformIO project tree.
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+from typing import List
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(script_dir), 'serializationlib_core'))
+
+from serializationlib_get_client_files import get_client_files, iter_client_files
+
+
+def legacy_get_client_files(project_dir, file_extensions=None, skip_exclusions=False) -> List[str]:
+    """
+    The original os.walk based walker, kept here as the benchmark baseline.
+
+    Args:
+        project_dir: Path to the client project root
+        file_extensions: Optional list of file extensions to filter by
+        skip_exclusions: If True, skip directory exclusion logic
+
+    Returns:
+        Sorted list of resolved file paths
+    """
+    project_path = Path(project_dir).resolve()
+    client_files = []
+
+    normalized_extensions = None
+    if file_extensions:
+        normalized_extensions = []
+        for ext in file_extensions:
+            ext_str = str(ext).lower()
+            if not ext_str.startswith('.'):
+                ext_str = '.' + ext_str
+            normalized_extensions.append(ext_str)
+
+    exclude_dirs = {'.pio', '.git', 'build', '.vscode', '.idea'}
+
+    for root, dirs, files in os.walk(project_path):
+        root_path = Path(root)
+        if not skip_exclusions:
+            should_skip = False
+            for part in root_path.parts:
+                if part in exclude_dirs:
+                    should_skip = True
+                    break
+            if should_skip:
+                dirs[:] = [d for d in dirs if d not in exclude_dirs]
+                continue
+        for file in files:
+            file_path = root_path / file
+            if normalized_extensions:
+                if file_path.suffix.lower() not in normalized_extensions:
+                    continue
+            try:
+                client_files.append(str(file_path.resolve()))
+            except (ValueError, OSError):
+                continue
+
+    return sorted(client_files)
+
+
+def build_synthetic_tree(root: str, total_files: int) -> None:
+    """
+    Create a synthetic project tree with most files under .pio/libdeps and build/_deps.
+
+    Args:
+        root: Directory to create the tree in
+        total_files: Approximate number of files to create
+    """
+    # Roughly what a real project looks like: a small src/ and huge dependency trees
+    layout = [
+        ('src', 0.02),
+        ('include', 0.01),
+        (os.path.join('.pio', 'libdeps', 'esp32dev'), 0.45),
+        (os.path.join('.pio', 'build', 'esp32dev'), 0.12),
+        (os.path.join('build', '_deps'), 0.38),
+        ('.git', 0.02),
+    ]
+    extensions = ['.h', '.hpp', '.cpp', '.o', '.json', '.txt']
+    files_per_dir = 50
+    for base, share in layout:
+        count = max(1, int(total_files * share))
+        for i in range(count):
+            directory = os.path.join(root, base, f'lib{i // (files_per_dir * 10)}', f'd{i // files_per_dir}')
+            if i % files_per_dir == 0:
+                os.makedirs(directory, exist_ok=True)
+            ext = extensions[i % len(extensions)]
+            with open(os.path.join(directory, f'f{i}{ext}'), 'w') as handle:
+                handle.write('// synthetic\n')
+
+
+def time_call(func, repeat: int) -> float:
+    """
+    Return the best wall time of func() over several runs.
+
+    Args:
+        func: Zero-argument callable to time
+        repeat: Number of runs
+
+    Returns:
+        Best time in seconds
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    """Main function to handle command line arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark scandir discovery against the legacy os.walk walker"
+    )
+    parser.add_argument(
+        "--files",
+        type=int,
+        default=50000,
+        help="Number of files in the synthetic tree (default: 50000)"
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Number of timed runs per implementation (default: 3)"
+    )
+    parser.add_argument(
+        "--keep",
+        action="store_true",
+        help="Keep the synthetic tree instead of deleting it"
+    )
+
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='serializationlib_bench_')
+    try:
+        build_synthetic_tree(root, args.files)
+        extensions = ['.h', '.hpp']
+
+        legacy = legacy_get_client_files(root, file_extensions=extensions)
+        current = get_client_files(root, file_extensions=extensions)
+        if legacy != current:
+            print(f"Mismatch: legacy found {len(legacy)} file(s), scandir found {len(current)}")
+            return 1
+
+        legacy_time = time_call(lambda: legacy_get_client_files(root, file_extensions=extensions), args.repeat)
+        scandir_time = time_call(lambda: get_client_files(root, file_extensions=extensions), args.repeat)
+        first_time = time_call(lambda: next(iter_client_files(root, file_extensions=extensions), None), args.repeat)
+
+        print(f"Synthetic tree: {args.files} file(s), {len(current)} header(s) outside excluded directories")
+        print(f"  os.walk (legacy):     {legacy_time * 1000:8.1f} ms")
+        print(f"  scandir:              {scandir_time * 1000:8.1f} ms")
+        print(f"  scandir first result: {first_time * 1000:8.1f} ms")
+        print(f"  speedup:              {legacy_time / scandir_time:8.1f}x")
+    finally:
+        if args.keep:
+            print(f"Tree kept at {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
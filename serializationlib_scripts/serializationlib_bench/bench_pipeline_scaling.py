@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+Benchmark Pipeline Scaling
+
+Generates synthetic PlatformIO projects of increasing size and times the
+pre-build pipeline on each: process_all_serializable_classes end to end (a cold
+run on fresh headers and a rerun on the processed tree), plus discovery and the
+S1/S2/S3/S6/S7/S8 stage functions on their own. Peak memory of the cold run is
+measured in a separate tracemalloc run so it does not skew the timings.
+
+Results can be saved as a baseline and later runs compared against it:
+
+    python bench_pipeline_scaling.py --headers 100,1000 --save-baseline baseline.json
+    python bench_pipeline_scaling.py --headers 100,1000 --baseline baseline.json --threshold 0.25
+
+The comparison exits with status 1 if any metric is slower (or uses more
+memory) than the baseline by more than the threshold.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import importlib.util
+import tracemalloc
+from typing import Dict, List
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+scripts_dir = os.path.dirname(script_dir)
+serializer_dir = os.path.join(scripts_dir, 'serializationlib_serializer')
+sys.path.insert(0, os.path.join(scripts_dir, 'serializationlib_core'))
+sys.path.insert(0, serializer_dir)
+
+from serializationlib_scan_context import ScanContext
+import S1_check_dto_macro
+import S2_extract_dto_fields
+import S3_inject_serialization
+import S6_discover_validation_macros
+import S7_extract_validation_fields
+import S8_handle_enum_serialization
+
+
+# Bump when the result layout changes
+BENCH_FORMAT = 1
+
+# Differences below this many milliseconds are treated as noise
+NOISE_FLOOR_MS = 5.0
+
+VALIDATION_HEADER = """#ifndef BENCH_VALIDATION_H
+#define BENCH_VALIDATION_H
+#define NotNull /* Validation Function -> ValidationUtility::ValidateNotNull */
+#define NotBlank /* Validation Function -> nayan::validation::ValidationUtility::ValidateNotBlank */
+#endif
+"""
+
+FIELD_TYPES = ['optional<StdString>', 'optional<int>', 'int', 'StdString', 'optional<float>', 'bool']
+
+
+def load_process_module():
+    """
+    Import 00_process_serializable_classes (its name is not a valid module name).
+
+    Returns:
+        The imported module
+    """
+    path = os.path.join(serializer_dir, '00_process_serializable_classes.py')
+    spec = importlib.util.spec_from_file_location('process_serializable_classes', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def render_dto(name: str, fields: int, validations: int, enum_name: str = None) -> str:
+    """
+    Render one @Serializable class.
+
+    Args:
+        name: Class name
+        fields: Number of fields
+        validations: Number of fields that carry a validation annotation
+        enum_name: Optional enum used as the type of one field
+
+    Returns:
+        C++ source of the class
+    """
+    lines = ['/* @Serializable */', f'class {name} {{', '    Public:']
+    for index in range(fields):
+        field_type = FIELD_TYPES[index % len(FIELD_TYPES)]
+        if enum_name and index == fields - 1:
+            field_type = f'optional<{enum_name}>'
+        if index < validations:
+            lines.append('    Public /* @NotNull */')
+            if field_type == 'optional<StdString>':
+                lines.append('    Public /* @NotBlank */')
+        lines.append(f'    {field_type} field{index};')
+    lines.append(f'    Public {name}() = default;')
+    lines.append('};')
+    return '\n'.join(lines) + '\n'
+
+
+def render_enum(name: str, values: int = 4) -> str:
+    """
+    Render one @Serializable enum.
+
+    Args:
+        name: Enum name
+        values: Number of enumerators
+
+    Returns:
+        C++ source of the enum
+    """
+    body = ',\n'.join(f'    Value{index}' for index in range(values))
+    return f'/* @Serializable */\nenum class {name} {{\n{body}\n}};\n'
+
+
+def render_plain(name: str, fields: int) -> str:
+    """
+    Render a header without annotations (the bulk of a real project and its libraries).
+
+    Args:
+        name: Class name
+        fields: Number of members
+
+    Returns:
+        C++ source of the class
+    """
+    members = '\n'.join(f'    int member{index}; // plain member' for index in range(fields))
+    return f'class {name} {{\npublic:\n{members}\n    void update(int value);\n}};\n'
+
+
+def wrap_header(guard: str, body: str) -> str:
+    """Wrap a header body in include guards."""
+    return f'#ifndef {guard}\n#define {guard}\n#include <StandardDefines.h>\n\n{body}\n#endif // {guard}\n'
+
+
+def build_synthetic_project(root: str, headers: int, dto_ratio: float, enum_ratio: float, fields: int,
+                            validations: int, libraries: int, library_share: float) -> Dict[str, int]:
+    """
+    Create a synthetic PlatformIO project.
+
+    Headers are split between src/ and libraries in .pio/libdeps/bench/. A share of
+    them holds a @Serializable class (some also an enum used by the class), the rest
+    are plain headers the prefilter should skip.
+
+    Args:
+        root: Project directory to create
+        headers: Total number of headers
+        dto_ratio: Share of headers with a @Serializable class
+        enum_ratio: Share of headers with a @Serializable enum
+        fields: Fields per class
+        validations: Validated fields per class
+        libraries: Number of libdeps libraries
+        library_share: Share of headers placed in libraries
+
+    Returns:
+        Dictionary with the number of headers, classes and enums created
+    """
+    os.makedirs(os.path.join(root, 'include'), exist_ok=True)
+    with open(os.path.join(root, 'platformio.ini'), 'w') as handle:
+        handle.write('[env:bench]\nplatform = native\n')
+    with open(os.path.join(root, 'include', 'BenchValidation.h'), 'w') as handle:
+        handle.write(VALIDATION_HEADER)
+
+    dto_every = max(1, round(1 / dto_ratio)) if dto_ratio > 0 else 0
+    enum_every = max(1, round(1 / enum_ratio)) if enum_ratio > 0 else 0
+    library_headers = int(headers * library_share) if libraries > 0 else 0
+    counts = {'headers': headers, 'classes': 0, 'enums': 0}
+    created = set()
+
+    for index in range(headers):
+        if index < library_headers:
+            base = os.path.join(root, '.pio', 'libdeps', 'bench', f'lib{index % libraries}', 'src')
+        else:
+            base = os.path.join(root, 'src')
+        directory = os.path.join(base, f'd{index // 100}')
+        if directory not in created:
+            os.makedirs(directory, exist_ok=True)
+            created.add(directory)
+
+        parts = []
+        enum_name = None
+        if enum_every and index % enum_every == 0:
+            enum_name = f'BenchStatus{index}'
+            parts.append(render_enum(enum_name))
+            counts['enums'] += 1
+        if dto_every and index % dto_every == 0:
+            parts.append(render_dto(f'BenchDto{index}', fields, validations, enum_name))
+            counts['classes'] += 1
+        elif not parts:
+            parts.append(render_plain(f'BenchPlain{index}', fields))
+
+        with open(os.path.join(directory, f'Bench{index}.h'), 'w') as handle:
+            handle.write(wrap_header(f'BENCH_{index}_H', '\n'.join(parts)))
+    return counts
+
+
+def copy_project(template: str, target: str) -> None:
+    """Replace target with a fresh copy of the template project."""
+    shutil.rmtree(target, ignore_errors=True)
+    shutil.copytree(template, target, symlinks=True)
+
+
+def best_of(func, repeat: int, setup=None) -> float:
+    """
+    Return the best wall time of func() in milliseconds.
+
+    Args:
+        func: Zero-argument callable to time
+        repeat: Number of runs
+        setup: Optional zero-argument callable run (untimed) before each run
+
+    Returns:
+        Best time in milliseconds
+    """
+    best = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        elapsed = (time.perf_counter() - start) * 1000
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def bench_stages(project: str, library_dir: str, repeat: int) -> Dict[str, float]:
+    """
+    Time discovery and each stage function on its own over all annotated headers.
+
+    File contents are read once before timing, so the stage numbers exclude I/O.
+
+    Args:
+        project: Project directory (unprocessed headers)
+        library_dir: serializationlib library root
+        repeat: Number of timed runs per stage
+
+    Returns:
+        Dictionary mapping metric names to milliseconds
+    """
+    metrics = {}
+    metrics['discovery_prefilter_ms'] = best_of(
+        lambda: ScanContext(project, library_dir).annotated_header_files, repeat
+    )
+    metrics['S6_ms'] = best_of(
+        lambda: S6_discover_validation_macros.find_validation_macro_definitions(
+            None, scan_context=ScanContext(project, library_dir)
+        ),
+        repeat
+    )
+
+    scan_context = ScanContext(project, library_dir)
+    files = scan_context.annotated_header_files
+    for file_path in files:
+        scan_context.read_source_lines(file_path)
+    validation_macros = S6_discover_validation_macros.find_validation_macro_definitions(
+        None, scan_context=scan_context
+    )
+    classes = []
+    for file_path in files:
+        for dto_info in S1_check_dto_macro.find_dto_annotations(file_path, scan_context=scan_context):
+            classes.append((file_path, dto_info['class_name']))
+
+    def run_s8():
+        for file_path in files:
+            for enum_info in S8_handle_enum_serialization.find_enum_annotations(file_path, scan_context=scan_context):
+                S8_handle_enum_serialization.generate_enum_serialization_code(
+                    enum_info['enum_name'], enum_info['enum_values']
+                )
+
+    def run_s1():
+        for file_path in files:
+            S1_check_dto_macro.find_dto_annotations(file_path, scan_context=scan_context)
+
+    def run_s2():
+        for file_path, class_name in classes:
+            S2_extract_dto_fields.extract_all_fields(file_path, class_name, scan_context=scan_context)
+
+    def run_s7():
+        for file_path, class_name in classes:
+            S7_extract_validation_fields.extract_validation_fields(
+                file_path, class_name, validation_macros, scan_context=scan_context
+            )
+
+    inputs = []
+    for file_path, class_name in classes:
+        inputs.append((
+            class_name,
+            S2_extract_dto_fields.extract_all_fields(file_path, class_name, scan_context=scan_context),
+            S7_extract_validation_fields.extract_validation_fields(
+                file_path, class_name, validation_macros, scan_context=scan_context
+            ),
+        ))
+
+    def run_s3():
+        for class_name, fields, validation_fields_by_macro in inputs:
+            S3_inject_serialization.generate_serialization_methods(class_name, fields, validation_fields_by_macro)
+
+    metrics['S8_ms'] = best_of(run_s8, repeat)
+    metrics['S1_ms'] = best_of(run_s1, repeat)
+    metrics['S2_ms'] = best_of(run_s2, repeat)
+    metrics['S7_ms'] = best_of(run_s7, repeat)
+    metrics['S3_generate_ms'] = best_of(run_s3, repeat)
+    return metrics
+
+
+def bench_size(process_module, template: str, work: str, library_dir: str, repeat: int,
+               jobs: int, measure_memory: bool) -> Dict[str, float]:
+    """
+    Run every measurement for one project size.
+
+    Args:
+        process_module: The imported 00_process_serializable_classes module
+        template: Unprocessed synthetic project
+        work: Scratch directory for the processed copies
+        library_dir: serializationlib library root
+        repeat: Number of timed runs per metric
+        jobs: Worker processes for the end-to-end runs
+        measure_memory: If True, record the peak memory of a cold run
+
+    Returns:
+        Dictionary mapping metric names to values
+    """
+    def run_pipeline():
+        process_module.process_all_serializable_classes(scan_context=ScanContext(work, library_dir), jobs=jobs)
+
+    metrics = {}
+    metrics['end_to_end_cold_ms'] = best_of(run_pipeline, repeat, setup=lambda: copy_project(template, work))
+    # The last cold run left a processed tree behind; a rerun finds every block up to date
+    metrics['end_to_end_rerun_ms'] = best_of(run_pipeline, repeat)
+
+    if measure_memory:
+        copy_project(template, work)
+        tracemalloc.start()
+        try:
+            run_pipeline()
+            metrics['peak_memory_kb'] = tracemalloc.get_traced_memory()[1] / 1024
+        finally:
+            tracemalloc.stop()
+
+    metrics.update(bench_stages(template, library_dir, repeat))
+    return metrics
+
+
+def compare_with_baseline(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+                          threshold: float) -> List[str]:
+    """
+    Find metrics that regressed against the baseline.
+
+    Args:
+        results: Current results by size label
+        baseline: Baseline results by size label
+        threshold: Allowed relative increase (0.25 = 25%)
+
+    Returns:
+        List of regression descriptions (empty if none)
+    """
+    regressions = []
+    for label, metrics in results.items():
+        for name, value in metrics.items():
+            base = baseline.get(label, {}).get(name)
+            if base is None or name.startswith('count_'):
+                continue
+            if name.endswith('_ms') and value - base < NOISE_FLOOR_MS:
+                continue
+            if value > base * (1 + threshold):
+                regressions.append(f"{label} {name}: {value:.1f} vs baseline {base:.1f} (+{(value / base - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_table(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]]) -> None:
+    """Print one row per metric and one column per project size."""
+    labels = list(results)
+    names = []
+    for metrics in results.values():
+        names.extend(name for name in metrics if name not in names)
+    print(f"{'metric':26}" + ''.join(f"{label:>22}" for label in labels))
+    for name in names:
+        row = f"{name:26}"
+        for label in labels:
+            value = results[label].get(name)
+            cell = '-' if value is None else f"{value:.1f}"
+            base = baseline.get(label, {}).get(name)
+            if value is not None and base:
+                cell += f" ({(value / base - 1) * 100:+.0f}%)"
+            row += f"{cell:>22}"
+        print(row)
+
+
+def parse_sizes(value: str) -> List[int]:
+    """Parse a comma-separated list of header counts."""
+    return [int(size) for size in value.split(',') if size.strip()]
+
+
+def main():
+    """Main function to handle command line arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark how the pre-build pipeline scales with project size"
+    )
+    parser.add_argument("--headers", type=parse_sizes, default=[100, 1000],
+                        help="Comma-separated header counts to benchmark (default: 100,1000; up to 100000)")
+    parser.add_argument("--dto-ratio", type=float, default=0.2,
+                        help="Share of headers with a @Serializable class (default: 0.2)")
+    parser.add_argument("--enum-ratio", type=float, default=0.05,
+                        help="Share of headers with a @Serializable enum (default: 0.05)")
+    parser.add_argument("--fields", type=int, default=8,
+                        help="Fields per class (default: 8)")
+    parser.add_argument("--validations", type=int, default=3,
+                        help="Fields per class with a validation annotation (default: 3)")
+    parser.add_argument("--libraries", type=int, default=10,
+                        help="Number of libraries in .pio/libdeps (default: 10)")
+    parser.add_argument("--library-share", type=float, default=0.7,
+                        help="Share of headers placed in libraries (default: 0.7)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Number of timed runs per metric (default: 3)")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Worker processes for the end-to-end runs (default: 1)")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="Skip the tracemalloc peak memory run")
+    parser.add_argument("--baseline", help="Compare against this baseline file")
+    parser.add_argument("--save-baseline", help="Write the results to this baseline file")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed relative slowdown against the baseline (default: 0.25)")
+    parser.add_argument("--keep", action="store_true",
+                        help="Keep the synthetic projects instead of deleting them")
+
+    args = parser.parse_args()
+
+    # Run without the environment of an enclosing build
+    for name in ('SERIALIZATIONLIB_OUTPUT', 'SERIALIZATIONLIB_PROFILE', 'SERIALIZATIONLIB_JOBS'):
+        os.environ.pop(name, None)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as handle:
+            baseline = json.load(handle).get('results', {})
+
+    process_module = load_process_module()
+    library_dir = os.path.dirname(scripts_dir)
+    root = tempfile.mkdtemp(prefix='serializationlib_bench_')
+    results = {}
+    try:
+        for headers in args.headers:
+            label = f"headers={headers}"
+            template = os.path.join(root, f'template_{headers}')
+            work = os.path.join(root, f'work_{headers}')
+            counts = build_synthetic_project(
+                template, headers, args.dto_ratio, args.enum_ratio, args.fields,
+                args.validations, args.libraries, args.library_share
+            )
+            print(f"{label}: {counts['classes']} class(es), {counts['enums']} enum(s)", flush=True)
+            metrics = {f'count_{name}': value for name, value in counts.items()}
+            metrics.update(bench_size(process_module, template, work, library_dir, args.repeat,
+                                      args.jobs, not args.no_memory))
+            results[label] = metrics
+    finally:
+        if args.keep:
+            print(f"Projects kept at {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print()
+    print_table(results, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as handle:
+            json.dump({
+                'format': BENCH_FORMAT,
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'settings': {name: value for name, value in vars(args).items()
+                             if name not in ('baseline', 'save_baseline', 'keep')},
+                'results': results,
+            }, handle, indent=2)
+            handle.write('\n')
+        print(f"\nBaseline written to {args.save_baseline}")
+
+    if args.baseline:
+        regressions = compare_with_baseline(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold * 100:.0f}%:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"\nNo regressions over {args.threshold * 100:.0f}% against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,5 @@
+"""
+Shared building blocks of the serializationlib pre-build pipeline: file
+discovery, prefiltering, the scan context, the fingerprint ledger, the
+header document model and the out-of-tree generated files.
+"""
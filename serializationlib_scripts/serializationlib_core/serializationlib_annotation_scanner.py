@@ -0,0 +1,122 @@
+"""
+Single-pass annotation scanner for header files.
+
+One re.finditer over the whole text finds every token the detection stages
+look for: comment annotations (/* @Serializable */, /* @NotNull */, ...),
+processed markers (/*--@Serializable--*/), class and enum declarations and
+access specifiers. The result is an ordered list of events; the stages visit
+only the lines that carry an event instead of running their regexes on every
+line.
+
+All patterns stop at line ends and overlapping tokens are all reported, so an
+event is found exactly where the per-line regexes of the stages would find it,
+and "enum class Color {" yields both an enum and a class event.
+"""
+
+from __future__ import annotations
+
+import bisect
+import itertools
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+
+# Event kinds
+ANNOTATION = 'annotation'
+PROCESSED = 'processed'
+CLASS = 'class'
+ENUM = 'enum'
+ACCESS = 'access'
+
+# Each branch consumes only the first character of its token and checks the rest in a
+# lookahead: no match hides a token starting inside it (e.g., the "/* @NotBlank */" that
+# begins at the closing "*/" of "/* @NotNull */* @NotBlank */"), and the leading characters
+# let the regex engine skip to candidates. Access specifiers start at a newline; the text
+# is scanned with one prepended. [^\S\n] is whitespace within a line.
+SCAN_PATTERN = re.compile(
+    r'/(?=\*--[^\S\n]*(?P<processed>@?[A-Za-z_][A-Za-z0-9_]*)[^\S\n]*--\*/)'
+    r'|/(?=\*[^\S\n]*(?P<annotation>@?[A-Za-z_][A-Za-z0-9_]*)[^\S\n]*\*/)'
+    r'|\n(?=[^\S\n]*(?P<access>(?i:public|private|protected))[^\S\n]*:)'
+    r'|c(?=lass[^\S\n]+(?P<class>[A-Za-z_][A-Za-z0-9_]*)[^\S\n]*[:{])'
+    r'|e(?=num[^\S\n]+(?:class[^\S\n]+)?(?P<enum>[A-Za-z_][A-Za-z0-9_]*)[^\S\n]*[:{])'
+)
+
+# Closing text after the name of comment tokens
+COMMENT_ENDS = {PROCESSED: '--*/', ANNOTATION: '*/'}
+
+
+class AnnotationEvent(NamedTuple):
+    """A token found by the scanner."""
+
+    kind: str
+    # Annotation text without the comment (e.g., "@NotNull"), class or enum name, or access specifier
+    name: str
+    # Line number (1-based)
+    line: int
+    # Columns in the line; end is after the comment for annotations, else after the name
+    start: int
+    end: int
+
+
+def scan_annotations(lines: List[str]) -> List[AnnotationEvent]:
+    """
+    Scan a header for annotations, declarations and access specifiers.
+
+    Args:
+        lines: File content as a list of lines (e.g., from ScanContext.read_source_lines)
+
+    Returns:
+        Events in text order
+    """
+    line_offsets = [0]
+    line_offsets.extend(itertools.accumulate(map(len, lines)))
+    text = '\n' + ''.join(lines)
+    events = []
+    for match in SCAN_PATTERN.finditer(text):
+        kind = match.lastgroup
+        end = match.end(kind)
+        if kind in COMMENT_ENDS:
+            end = text.index(COMMENT_ENDS[kind], end) + len(COMMENT_ENDS[kind])
+        # Offsets in the lines (the scanned text starts with the prepended newline)
+        start = (match.end() if kind == ACCESS else match.start()) - 1
+        line_index = bisect.bisect_right(line_offsets, start) - 1
+        line_start = line_offsets[line_index]
+        events.append(AnnotationEvent(kind, match.group(kind), line_index + 1,
+                                      start - line_start, end - 1 - line_start))
+    return events
+
+
+def events_by_line(events: Iterable[AnnotationEvent]) -> Dict[int, List[AnnotationEvent]]:
+    """
+    Group events by line.
+
+    Args:
+        events: Events from scan_annotations
+
+    Returns:
+        Dictionary mapping line numbers to their events, in text order
+    """
+    grouped = {}
+    for event in events:
+        grouped.setdefault(event.line, []).append(event)
+    return grouped
+
+
+def find_event(line_events: Optional[List[AnnotationEvent]], kind: str, names=None,
+               start: int = 0) -> Optional[AnnotationEvent]:
+    """
+    Return the first event of a kind on a line.
+
+    Args:
+        line_events: Events of one line (or None)
+        kind: Event kind
+        names: Optional collection of accepted names
+        start: Only consider events starting at or after this column
+
+    Returns:
+        The leftmost matching event, or None
+    """
+    for event in line_events or ():
+        if event.kind == kind and event.start >= start and (names is None or event.name in names):
+            return event
+    return None
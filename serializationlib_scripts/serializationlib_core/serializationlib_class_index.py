@@ -0,0 +1,298 @@
+"""
+Index of the classes and structs of a header.
+
+Built once per file from its HeaderTokens: every class, struct and nested class
+with a body is recorded with its line and offset ranges, its base list and its
+access sections. Stages look a class up by name in the index instead of
+scanning the file for it again.
+"""
+
+from __future__ import annotations
+
+import bisect
+import itertools
+import re
+from array import array
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    from serializationlib_tokenizer import CLOSE_BRACE, OPEN_BRACE, TOKEN_KINDS, HeaderTokens
+except ImportError:
+    from serializationlib_core.serializationlib_tokenizer import CLOSE_BRACE, OPEN_BRACE, TOKEN_KINDS, HeaderTokens
+
+
+# Class or struct keyword. Patterns starting with a literal let the regex engine skip
+# to candidates, so the word boundary before the keyword is checked separately.
+CLASS_PATTERN = re.compile(r'(class|struct)\b')
+
+# "enum" in front of a class keyword ("enum class Color")
+ENUM_PREFIX_PATTERN = re.compile(r'\benum\s+$')
+
+# Text between the keyword and the body: the name, optionally wrapped in macros
+# (e.g., "EXPORT UserDto final" or "UserDto ALIGNED(4)"), and the base list. Anything
+# else (e.g., "T> struct X" of a template parameter, or "Point p" of "struct Point p{1, 2};")
+# is not a class definition.
+CLASS_HEAD_PATTERN = re.compile(
+    r'\s*(?:[A-Z_][A-Z0-9_]*\b(?:\s*\([^()]*\))?\s+)*?'
+    r'([A-Za-z_][A-Za-z0-9_]*)'
+    r'\s*(?:(?:final\b|[A-Z_][A-Z0-9_]*\b(?:\s*\([^()]*\))?)\s*)*'
+    r'(?::(.*))?',
+    re.DOTALL
+)
+
+# Namespace keyword; the name between it and the brace is checked with NAMESPACE_HEAD_PATTERN
+NAMESPACE_PATTERN = re.compile(r'namespace\b')
+
+# Name of a namespace definition (e.g., "app", "app::v1", "app::inline v1"), or none for
+# an anonymous namespace. "namespace x = y;" and "using namespace x;" have no body.
+NAMESPACE_HEAD_PATTERN = re.compile(
+    r'\s*((?:inline\s+)?[A-Za-z_][A-Za-z0-9_]*(?:\s*::\s*(?:inline\s+)?[A-Za-z_][A-Za-z0-9_]*)*)?\s*'
+)
+
+# Access specifier (also macro spellings such as "Public:"), but not "public::"
+ACCESS_PATTERN = re.compile(r'(?i:(p(?:ublic|rivate|rotected)))\s*:(?!:)')
+
+# Characters of identifiers, for the word boundary in front of a keyword
+IDENTIFIER_CHARS = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_')
+
+# Change of the brace depth after a token, by kind
+BRACE_DEPTH_CHANGES = {kind: 0 for kind in TOKEN_KINDS.values()}
+BRACE_DEPTH_CHANGES.update({OPEN_BRACE: 1, CLOSE_BRACE: -1})
+
+# Access and virtual keywords in front of a base class
+BASE_KEYWORDS_PATTERN = re.compile(r'^(?:(?:public|private|protected|virtual)\s+)*')
+
+
+class AccessSection(NamedTuple):
+    """Members under one access specifier."""
+
+    # 'public', 'private' or 'protected'
+    access: str
+    # Lines (1-based) from the specifier to the line before the next one (or the closing brace)
+    start_line: int
+    end_line: int
+
+
+class ClassInfo(NamedTuple):
+    """A class or struct with a body."""
+
+    name: str
+    # Name including the enclosing classes (e.g., "Outer::Inner")
+    qualified_name: str
+    # 'class' or 'struct'
+    kind: str
+    # Lines (1-based) of the declaration and of the closing brace
+    start_line: int
+    end_line: int
+    # Offsets in the text of the declaration and after the closing brace
+    start_offset: int
+    end_offset: int
+    # Token indices of the braces of the body
+    open_index: int
+    close_index: int
+    # Base classes without access keywords (e.g., ("Serializable<UserDto>",))
+    bases: Tuple[str, ...]
+    # In order; members before the first specifier are in a section with the default access
+    access_sections: Tuple[AccessSection, ...]
+
+
+def split_bases(base_list: str) -> Tuple[str, ...]:
+    """
+    Split a base list at the commas outside template arguments and parentheses.
+
+    Args:
+        base_list: Text after the colon of a class head (e.g., "public A<B, C>, private D")
+
+    Returns:
+        Base classes without access keywords and with whitespace collapsed
+    """
+    bases = []
+    depth = 0
+    start = 0
+    for position, char in enumerate(base_list + ','):
+        if char in '<([':
+            depth += 1
+        elif char in '>)]':
+            depth -= 1
+        elif char == ',' and depth <= 0:
+            base = ' '.join(base_list[start:position].split())
+            base = BASE_KEYWORDS_PATTERN.sub('', base)
+            if base:
+                bases.append(base)
+            start = position + 1
+    return tuple(bases)
+
+
+class ClassIndex:
+    """
+    Classes and structs of one header, by name.
+
+    Lookups are a dictionary access; the file is scanned once, when the index is built.
+    """
+
+    def __init__(self, tokens: HeaderTokens):
+        """
+        Args:
+            tokens: Token stream of the header (e.g., from ScanContext.header_tokens)
+        """
+        self.tokens = tokens
+        self.classes: List[ClassInfo] = []
+        self._by_name: Dict[str, List[ClassInfo]] = {}
+        # (name, offset of the opening brace, offset after the closing brace) of each
+        # named namespace body, found on first use
+        self._namespaces: Optional[List[Tuple[str, int, int]]] = None
+        # Brace depth before each token
+        self._depths = array('l', [0])
+        self._depths.extend(itertools.accumulate(map(BRACE_DEPTH_CHANGES.__getitem__, tokens.kinds)))
+        self._build()
+
+    def _build(self):
+        """Record every class and struct definition, in text order."""
+        tokens = self.tokens
+        kinds = tokens.kinds
+        # Classes whose body contains the current declaration, innermost last
+        enclosing: List[ClassInfo] = []
+        text = tokens.text
+        for match in CLASS_PATTERN.finditer(text):
+            start = match.start()
+            if start and text[start - 1] in IDENTIFIER_CHARS:
+                continue
+            if ENUM_PREFIX_PATTERN.search(text, max(start - 32, 0), start) or not tokens.is_code(start):
+                continue
+            # The body starts at the next brace; a ; or } first means there is none
+            open_index = bisect.bisect_left(tokens.starts, match.end())
+            while open_index < len(kinds) and kinds[open_index] < OPEN_BRACE:
+                open_index += 1
+            if open_index >= len(kinds) or kinds[open_index] != OPEN_BRACE:
+                continue
+            head = CLASS_HEAD_PATTERN.fullmatch(tokens.code(match.end(), tokens.starts[open_index]))
+            if not head:
+                continue
+            close_index = tokens.matching_brace(open_index)
+            if close_index is None:
+                continue
+
+            while enclosing and enclosing[-1].close_index < open_index:
+                enclosing.pop()
+            kind, name = match.group(1), head.group(1)
+            class_info = ClassInfo(
+                name=name,
+                qualified_name='::'.join([outer.name for outer in enclosing] + [name]),
+                kind=kind,
+                start_line=tokens.line_of(start),
+                end_line=tokens.line_of(tokens.starts[close_index]),
+                start_offset=start,
+                end_offset=tokens.ends[close_index],
+                open_index=open_index,
+                close_index=close_index,
+                bases=split_bases(head.group(2) or ''),
+                access_sections=self._access_sections(kind, open_index, close_index)
+            )
+            self.classes.append(class_info)
+            self._by_name.setdefault(name, []).append(class_info)
+            if class_info.qualified_name != name:
+                self._by_name.setdefault(class_info.qualified_name, []).append(class_info)
+            enclosing.append(class_info)
+
+    def _access_sections(self, kind: str, open_index: int, close_index: int) -> Tuple[AccessSection, ...]:
+        """
+        Find the access sections of a body.
+
+        Args:
+            kind: 'class' or 'struct' (for the default access)
+            open_index: Index of the opening brace of the body
+            close_index: Index of the closing brace of the body
+
+        Returns:
+            Access sections in order
+        """
+        tokens = self.tokens
+        body_depth = self._depths[open_index] + 1
+        # (access, first line) of each section
+        starts = [('private' if kind == 'class' else 'public', tokens.line_of(tokens.starts[open_index]))]
+        for match in ACCESS_PATTERN.finditer(tokens.text, tokens.starts[open_index] + 1, tokens.starts[close_index]):
+            # A whole word directly in this body, not in a nested class or a comment
+            if tokens.text[match.start() - 1] in IDENTIFIER_CHARS:
+                continue
+            if self._depths[bisect.bisect_left(tokens.starts, match.start())] != body_depth:
+                continue
+            if not tokens.is_code(match.start()):
+                continue
+            starts.append((match.group(1).lower(), tokens.line_of(match.start())))
+
+        end_line = tokens.line_of(tokens.starts[close_index])
+        sections = []
+        for position, (access, start_line) in enumerate(starts):
+            section_end = starts[position + 1][1] - 1 if position + 1 < len(starts) else end_line
+            if section_end >= start_line:
+                sections.append(AccessSection(access, start_line, section_end))
+        return tuple(sections)
+
+    def _find_namespaces(self) -> List[Tuple[str, int, int]]:
+        tokens = self.tokens
+        kinds = tokens.kinds
+        text = tokens.text
+        namespaces = []
+        for match in NAMESPACE_PATTERN.finditer(text):
+            start = match.start()
+            if start and text[start - 1] in IDENTIFIER_CHARS:
+                continue
+            if not tokens.is_code(start):
+                continue
+            open_index = bisect.bisect_left(tokens.starts, match.end())
+            while open_index < len(kinds) and kinds[open_index] < OPEN_BRACE:
+                open_index += 1
+            if open_index >= len(kinds) or kinds[open_index] != OPEN_BRACE:
+                continue
+            head = NAMESPACE_HEAD_PATTERN.fullmatch(tokens.code(match.end(), tokens.starts[open_index]))
+            if not head or not head.group(1):
+                continue
+            close_index = tokens.matching_brace(open_index)
+            if close_index is None:
+                continue
+            name = '::'.join(part.split()[-1] for part in head.group(1).split('::'))
+            namespaces.append((name, tokens.starts[open_index], tokens.ends[close_index]))
+        return namespaces
+
+    def scope_of(self, offset: int) -> str:
+        """
+        Return the namespaces and classes whose bodies contain an offset.
+
+        Anonymous namespaces are left out; inline namespaces are included.
+
+        Args:
+            offset: Offset in the text (e.g., ClassInfo.start_offset)
+
+        Returns:
+            Qualified scope (e.g., "app::v1::Outer"), or '' at global scope
+        """
+        if self._namespaces is None:
+            self._namespaces = self._find_namespaces()
+        scopes = [(open_offset, name) for name, open_offset, end_offset in self._namespaces
+                  if open_offset < offset < end_offset]
+        for class_info in self.classes:
+            if self.tokens.starts[class_info.open_index] < offset < class_info.end_offset:
+                scopes.append((self.tokens.starts[class_info.open_index], class_info.name))
+        return '::'.join(name for _, name in sorted(scopes))
+
+    def find(self, name: str, start_line: int = 1) -> Optional[ClassInfo]:
+        """
+        Return the first class or struct of a name.
+
+        Args:
+            name: Class name, or qualified name of a nested class (e.g., "Outer::Inner")
+            start_line: Only consider classes declared at or after this line (1-based)
+
+        Returns:
+            ClassInfo, or None if there is no such class with a body
+        """
+        for class_info in self._by_name.get(name, ()):
+            if class_info.start_line >= start_line:
+                return class_info
+        return None
+
+    def __iter__(self):
+        return iter(self.classes)
+
+    def __len__(self) -> int:
+        return len(self.classes)
@@ -0,0 +1,272 @@
+"""
+Linear-time parser for member variable declarations.
+
+Replaces the field regex the stages used to share,
+
+    ^\\s*([A-Za-z_][A-Za-z0-9_<>*&,\\s]*?)\\s+([A-Za-z_][A-Za-z0-9_]*)\\s*[;=]
+
+whose lazy type overlaps with the \\s+ before the name: on a line with a long
+run of whitespace and no terminator it backtracks quadratically. It also let a
+comma end the type outside template arguments ("int a, b;" gave the type
+"int a,"), accepted unbalanced brackets, and cut prefixes off words
+("PrivateKey key;" gave the type "Key").
+
+The first declarator is read the way the regex read it: a type of identifiers,
+numbers, < > * & and commas starting with an identifier, whitespace (or the
+closing > of template arguments), then the name. Commas and spaces inside
+"optional<map<K, V>>" belong to the type. The parser then reads the rest of
+the declaration, so a declarator list gives the same fields as one
+declaration per declarator:
+
+    int a, b;              -> int a, int b
+    int* p, q = 1;         -> int* p, int q
+    StdString s = "x, y";  -> StdString s
+    int codes[4], count;   -> int count (arrays were never fields)
+
+Default initializers are skipped up to the next comma or ; outside brackets
+and string literals. An initializer that does not end on the line ends the
+declaration there. A declarator the parser cannot read (e.g., "b{2}" in
+"int a, b{2};") is dropped with the rest of the line, with a warning when
+SERIALIZATIONLIB_VERBOSE is set. A line that does not reach its ; (e.g., the
+"int second," of a parameter list wrapped over several lines) is not a
+declaration. Each step is a single pass over the line.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from typing import List, Optional, Tuple
+
+
+# Common case in one match: one word, optionally three levels of template arguments, then
+# pointer or reference marks, whitespace, the names and ; (or = and an initializer
+# without a comma), e.g. "optional<StdString> name;" or "int a, b;". Each part stops at a
+# character the next one cannot start with, so a failed match gives up each character
+# at most once.
+SIMPLE_DECLARATION = (
+    r'\s*([A-Za-z_][A-Za-z0-9_]*'
+    r'(?:<(?:[A-Za-z0-9_\s,*&]|<(?:[A-Za-z0-9_\s,*&]|<[A-Za-z0-9_\s,*&]*>)*>)*>)?[*&]*)'
+    r'\s+([A-Za-z_][A-Za-z0-9_]*(?:\s*,\s*[A-Za-z_][A-Za-z0-9_]*)*)\s*(?:;|=[^,]*$)'
+)
+SIMPLE_DECLARATION_PATTERN = re.compile(SIMPLE_DECLARATION)
+# The same after an optional access macro; without the macro if the type is named like one
+PREFIXED_DECLARATION_PATTERN = re.compile(r'\s*(?:(?:Public|Private|Protected)(?![A-Za-z0-9_]))?' + SIMPLE_DECLARATION)
+
+# Start of a declaration: an identifier, then only type characters. One character class
+# without alternatives cannot backtrack more than once.
+DECLARATION_HEAD_PATTERN = re.compile(r'\s*[A-Za-z_][A-Za-z0-9_<>*&,\s]*')
+
+# Template brackets and commas, the only characters of the head whose nesting matters
+BRACKET_PATTERN = re.compile(r'[<>,]')
+
+IDENTIFIER_CHARS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_'
+
+# Array extents after a declarator name (e.g., "[4]" or "[ROWS][COLS]"); always matches
+ARRAY_EXTENT_PATTERN = re.compile(r'\s*(?:\[[^\[\]]*\]\s*)*')
+
+# A further declarator after a comma: pointer or reference marks and the name
+NEXT_DECLARATOR_PATTERN = re.compile(r'\s*([*&]*)\s*([A-Za-z_][A-Za-z0-9_]*)')
+
+# Characters whose nesting decides where a default initializer ends
+INITIALIZER_PATTERN = re.compile(r'[()\[\]{}<>,;"\']')
+
+# String or character literal starting at a quote
+LITERAL_PATTERN = re.compile(r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'')
+
+OPENING_BRACKETS = '([{'
+CLOSING_BRACKETS = ')]}'
+
+# Access macro in front of a field (e.g., "Public optional<int> x;")
+ACCESS_PREFIX_PATTERN = re.compile(r'\s*(?:Public|Private|Protected)(?![A-Za-z0-9_])')
+
+
+def parse_field_declarations(line: str, access_prefix: bool = False, file_path: Optional[str] = None,
+                             line_number: Optional[int] = None) -> List[Tuple[str, str]]:
+    """
+    Parse the member variable declarations at the start of a line.
+
+    Common declarations are matched by one regex. Otherwise the first declarator
+    is split off at its end outside template arguments and the remaining
+    declarators are read one by one.
+
+    Args:
+        line: Source line
+        access_prefix: If True, a leading Public, Private or Protected macro is skipped
+        file_path: Optional path of the header, for the warning about a dropped declarator
+        line_number: Optional line number of the line, for the same warning
+
+    Returns:
+        One (type, name) tuple per declarator, in order, with the type as written
+        (e.g., "optional<map<K, V>>"); empty if the line does not start with a declaration
+    """
+    simple = (PREFIXED_DECLARATION_PATTERN if access_prefix else SIMPLE_DECLARATION_PATTERN).match(line)
+    if simple:
+        field_type, names = simple.groups()
+        if ',' not in names:
+            return [(field_type, names)]
+        first, *others = names.split(',')
+        # Pointer and reference marks belong to the first declarator only
+        base_type = field_type.rstrip('*&')
+        return [(field_type, first.rstrip())] + [(base_type, name.strip()) for name in others]
+    if access_prefix:
+        prefix = ACCESS_PREFIX_PATTERN.match(line)
+        if prefix:
+            fields = _parse_declaration(line, prefix.end(), file_path, line_number)
+            if fields:
+                return fields
+    return _parse_declaration(line, 0, file_path, line_number)
+
+
+def _parse_declaration(line: str, position: int, file_path: Optional[str],
+                       line_number: Optional[int]) -> List[Tuple[str, str]]:
+    """
+    Parse a declaration that SIMPLE_DECLARATION_PATTERN does not match.
+
+    Args:
+        line: Source line
+        position: Offset to start at
+        file_path: Path of the header for the warning, or None
+        line_number: Line number for the warning, or None
+
+    Returns:
+        One (type, name) tuple per declarator (empty if there is no declaration at the position)
+    """
+    # The first declarator ends at ; = or [ after the type characters, or at a
+    # comma among them outside template arguments
+    head_match = DECLARATION_HEAD_PATTERN.match(line, position)
+    if not head_match:
+        return []
+    end = head_match.end()
+    head = line[position:end]
+    if '<' in head or '>' in head or ',' in head:
+        depth = 0
+        comma = -1
+        for char in BRACKET_PATTERN.findall(head):
+            if char == '<':
+                depth += 1
+            elif char == '>':
+                depth -= 1
+                if depth < 0:
+                    return []
+            else:
+                comma = head.index(',', comma + 1)
+                if depth == 0:
+                    end = position + comma
+                    head = head[:comma]
+                    break
+        else:
+            if depth != 0:
+                return []
+    if end == head_match.end() and line[end:end + 1] not in (';', '=', '['):
+        return []
+
+    # The name is the identifier at the end, after whitespace or template arguments
+    declarator = head.rstrip()
+    type_part = declarator.rstrip(IDENTIFIER_CHARS)
+    name = declarator[len(type_part):]
+    if not name or name[0].isdigit() or not type_part or not (type_part[-1].isspace() or type_part[-1] == '>'):
+        return []
+    field_type = type_part.strip()
+    if not field_type:
+        return []
+
+    # Pointer and reference marks belong to each declarator, not to the list
+    base_type = field_type.rstrip('*& ')
+    fields = []
+    first = True
+    index = end
+    while True:
+        char = line[index:index + 1]
+        is_array = False
+        if char not in (';', '=', ','):
+            extent = ARRAY_EXTENT_PATTERN.match(line, index)
+            is_array = '[' in extent.group()
+            index = extent.end()
+            char = line[index:index + 1]
+        if char not in (';', '=', ','):
+            if first:
+                return []
+            return _unread_declarator(line, index, fields, file_path, line_number)
+        # Arrays were never fields; they are read only to reach the next declarator
+        if not is_array:
+            fields.append((field_type, name))
+        first = False
+        if char == '=':
+            index = _skip_initializer(line, index + 1)
+            if index is None:
+                return fields
+            char = line[index]
+        if char == ';':
+            return fields
+
+        # A comma: the next declarator must follow on the line
+        next_declarator = NEXT_DECLARATOR_PATTERN.match(line, index + 1)
+        if not next_declarator:
+            return _unread_declarator(line, index, fields, file_path, line_number)
+        marks, name = next_declarator.groups()
+        field_type = base_type + marks
+        index = next_declarator.end()
+
+
+def _unread_declarator(line: str, index: int, fields: List[Tuple[str, str]], file_path: Optional[str],
+                       line_number: Optional[int]) -> List[Tuple[str, str]]:
+    """
+    Handle a declarator the parser cannot read.
+
+    Args:
+        line: Source line
+        index: Offset of the unreadable declarator
+        fields: Declarators read before it
+        file_path: Path of the header for the warning, or None
+        line_number: Line number for the warning, or None
+
+    Returns:
+        The declarators read before it if the declaration ends on the line, else an
+        empty list (the line continues something else, e.g. a wrapped parameter list)
+    """
+    if ';' not in line[index:]:
+        return []
+    if os.environ.get('SERIALIZATIONLIB_VERBOSE'):
+        location = f"{file_path}:{line_number}: " if file_path else ""
+        print(f"serializationlib: {location}skipped a declarator that cannot be read: {line.strip()}")
+    return fields
+
+
+def _skip_initializer(line: str, index: int) -> Optional[int]:
+    """
+    Find the end of a default initializer.
+
+    Args:
+        line: Source line
+        index: Offset just after the =
+
+    Returns:
+        Offset of the comma or ; ending the initializer, or None if it does not end on the line
+    """
+    depth = 0
+    angle_depth = 0
+    while True:
+        found = INITIALIZER_PATTERN.search(line, index)
+        if not found:
+            return None
+        char = found.group()
+        index = found.end()
+        if char in OPENING_BRACKETS:
+            depth += 1
+        elif char in CLOSING_BRACKETS:
+            depth -= 1
+            if depth < 0:
+                return None
+        elif char == '<':
+            angle_depth += 1
+        elif char == '>':
+            # A comparison rather than template arguments
+            angle_depth = max(angle_depth - 1, 0)
+        elif char == '"' or char == "'":
+            literal = LITERAL_PATTERN.match(line, found.start())
+            if not literal:
+                return None
+            index = literal.end()
+        elif depth == 0 and (char == ';' or angle_depth == 0):
+            return found.start()
@@ -0,0 +1,56 @@
+"""
+Compare-before-write for every file the pipeline produces.
+
+Headers and generated include files are only replaced when their content
+differs from what is on disk, and then atomically. A run that produces the same
+bytes leaves mtimes alone, so build systems and ccache see no change.
+"""
+
+import os
+
+
+def write_if_changed(file_path: str, content: str) -> bool:
+    """
+    Atomically write a text file unless it already has this content.
+
+    The file keeps its permission bits; new files are created as 0644. A symlink is
+    followed, so its target is replaced and the link stays in place.
+
+    Args:
+        file_path: Path to the file
+        content: New content
+
+    Returns:
+        True if the file was written, False if it was already up to date
+
+    Raises:
+        OSError: If the file cannot be written
+    """
+    # Replacing the link itself would turn it into a regular file
+    file_path = os.path.realpath(file_path)
+    mode = 0o644
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            if file.read() == content:
+                return False
+        mode = os.stat(file_path).st_mode & 0o7777
+    except (OSError, UnicodeDecodeError):
+        pass
+
+    import tempfile
+    directory = os.path.dirname(file_path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.serializationlib_', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            file.write(content)
+        # mkstemp creates the file as 0600
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return True
@@ -0,0 +1,129 @@
+"""
+Begin/end markers around code injected into headers.
+
+Every block of generated code is wrapped in marker comments that carry its name
+and a hash of the generated code:
+
+    // @serializationlib-begin UserDto 3f2a9c0d1e4b5a67
+    ...
+    // @serializationlib-end UserDto
+
+The code is generated from the extracted field and validation model, so the hash
+changes exactly when the model (or the generator) does. A rerun replaces only
+the blocks whose hash differs. The parsing stages read headers with the blocks
+blanked out, so generated code is never mistaken for user fields.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, List
+
+try:
+    from _blake2 import blake2b
+except ImportError:
+    from hashlib import blake2b
+
+
+BLOCK_BEGIN = '// @serializationlib-begin'
+BLOCK_END = '// @serializationlib-end'
+
+BEGIN_PATTERN = re.compile(r'^\s*// @serializationlib-begin\s+([A-Za-z_][A-Za-z0-9_]*)\s+([0-9a-f]+)\s*$')
+END_PATTERN = re.compile(r'^\s*// @serializationlib-end\s+([A-Za-z_][A-Za-z0-9_]*)\s*$')
+
+
+def block_hash(code: str) -> str:
+    """
+    Hash generated code for its begin marker.
+
+    Args:
+        code: Generated code (before indentation)
+
+    Returns:
+        16-character hex digest
+    """
+    return blake2b(code.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def begin_marker(name: str, code_hash: str, indent: str = '') -> str:
+    """
+    Return the begin marker line of a block.
+
+    Args:
+        name: Class or enum name
+        code_hash: Hash from block_hash()
+        indent: Leading whitespace
+
+    Returns:
+        Marker line including the line ending
+    """
+    return f'{indent}{BLOCK_BEGIN} {name} {code_hash}\n'
+
+
+def end_marker(name: str, indent: str = '') -> str:
+    """
+    Return the end marker line of a block.
+
+    Args:
+        name: Class or enum name
+        indent: Leading whitespace
+
+    Returns:
+        Marker line including the line ending
+    """
+    return f'{indent}{BLOCK_END} {name}\n'
+
+
+def find_generated_blocks(lines: List[str]) -> Dict[str, Dict[str, any]]:
+    """
+    Find the complete generated blocks in a header.
+
+    A begin marker without a matching end marker is ignored.
+
+    Args:
+        lines: File content as a list of lines
+
+    Returns:
+        Dictionary mapping block names to 'hash', 'begin_line' and 'end_line' (1-based, inclusive)
+    """
+    blocks = {}
+    open_block = None
+    for line_num, line in enumerate(lines, 1):
+        if '@serializationlib-' not in line:
+            continue
+        begin_match = BEGIN_PATTERN.match(line)
+        if begin_match:
+            open_block = (begin_match.group(1), begin_match.group(2), line_num)
+            continue
+        end_match = END_PATTERN.match(line)
+        if end_match and open_block and end_match.group(1) == open_block[0]:
+            name, code_hash, begin_line = open_block
+            blocks[name] = {
+                'hash': code_hash,
+                'begin_line': begin_line,
+                'end_line': line_num
+            }
+            open_block = None
+    return blocks
+
+
+def blank_generated_blocks(lines: List[str]) -> List[str]:
+    """
+    Replace every line of the generated blocks with an empty line.
+
+    Line numbers stay valid, so results can be applied to the original text.
+
+    Args:
+        lines: File content as a list of lines
+
+    Returns:
+        Lines with generated blocks blanked (the same list if there are none)
+    """
+    blocks = find_generated_blocks(lines)
+    if not blocks:
+        return lines
+    source_lines = list(lines)
+    for block in blocks.values():
+        for index in range(block['begin_line'] - 1, block['end_line']):
+            source_lines[index] = '\n'
+    return source_lines
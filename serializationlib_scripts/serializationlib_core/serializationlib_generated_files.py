@@ -0,0 +1,119 @@
+"""
+Out-of-tree output for generated serialization code.
+
+In generated mode the pipeline leaves user headers untouched and writes the code
+for each @Serializable class or enum to <generated dir>/<Name>.serialization.inc,
+in a subdirectory per enclosing namespace or class. The generated directory is
+added to the include path; user code includes the file once, inside the class
+body or after the enum declaration:
+
+    #include "UserDto.serialization.inc"          // class UserDto at global scope
+    #include "app/dto/UserDto.serialization.inc"  // class app::dto::UserDto
+
+Two headers that produce the same file (e.g., the same class name in the same
+namespace of two libraries) are an error, raised before anything is written.
+
+Files are written with serializationlib_file_writer.write_if_changed, so an
+unchanged run keeps their mtimes and does not trigger a rebuild.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    from serializationlib_ledger import default_ledger_dir
+except ImportError:
+    from serializationlib_core.serializationlib_ledger import default_ledger_dir
+
+
+# Suffix of every generated file
+GENERATED_SUFFIX = '.serialization.inc'
+
+# Output modes accepted by SERIALIZATIONLIB_OUTPUT
+OUTPUT_MODE_INPLACE = 'inplace'
+OUTPUT_MODE_GENERATED = 'generated'
+
+
+def default_generated_dir(project_dir) -> Optional[Path]:
+    """
+    Choose the generated directory for a project.
+
+    SERIALIZATIONLIB_GENERATED_DIR overrides the location. Otherwise the directory
+    is generated/ next to the build ledger.
+
+    Args:
+        project_dir: Path to the client project root
+
+    Returns:
+        Generated directory, or None if there is no project
+    """
+    override = os.environ.get('SERIALIZATIONLIB_GENERATED_DIR')
+    if override:
+        return Path(override)
+    ledger_dir = default_ledger_dir(project_dir)
+    if ledger_dir is None:
+        return None
+    return ledger_dir / 'generated'
+
+
+def resolve_output_dir(project_dir, output_dir=None) -> Optional[str]:
+    """
+    Resolve where generated code goes.
+
+    Uses the output_dir argument, then SERIALIZATIONLIB_OUTPUT=generated (with
+    default_generated_dir). Otherwise code is injected into the headers in place.
+
+    Args:
+        project_dir: Path to the client project root
+        output_dir: Requested generated directory, or None to read the environment
+
+    Returns:
+        Absolute generated directory, or None for in-place mode
+    """
+    if output_dir is None:
+        mode = os.environ.get('SERIALIZATIONLIB_OUTPUT', OUTPUT_MODE_INPLACE).strip().lower()
+        if mode != OUTPUT_MODE_GENERATED:
+            return None
+        output_dir = default_generated_dir(project_dir)
+        if output_dir is None:
+            return None
+    return os.path.abspath(str(output_dir))
+
+
+def generated_file_path(output_dir: str, qualified_name: str) -> str:
+    """
+    Return the generated file for a class or enum.
+
+    Args:
+        output_dir: Generated directory
+        qualified_name: Class or enum name with its enclosing namespaces and classes
+                        (e.g., "app::dto::UserDto")
+
+    Returns:
+        Path to <output_dir>/app/dto/UserDto.serialization.inc
+    """
+    parts = qualified_name.split('::')
+    return os.path.join(output_dir, *parts[:-1], parts[-1] + GENERATED_SUFFIX)
+
+
+def check_generated_file_owner(owners: Dict[str, str], output_path: str, file_path: str) -> None:
+    """
+    Record the header that produces a generated file, rejecting a second one.
+
+    Args:
+        owners: Mapping of generated file to its header, updated in place
+        output_path: Path to the generated file
+        file_path: Path to the header producing it
+
+    Raises:
+        ValueError: If another header already produces the file
+    """
+    owner = owners.setdefault(output_path, file_path)
+    if owner != file_path:
+        raise ValueError(
+            f"{output_path} is generated from both {owner} and {file_path}; "
+            f"rename one of the classes or enums or move it into a namespace"
+        )
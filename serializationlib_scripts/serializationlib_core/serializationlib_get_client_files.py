@@ -4,11 +4,107 @@ This script walks through the client project directory and returns all files
 excluding those in .pio/libdeps and other library directories.
 """
 
+from __future__ import annotations
+
 import os
 from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+
+# Directories to exclude (PlatformIO library and build directories)
+DEFAULT_EXCLUDE_DIRS = frozenset({
+    '.pio',           # PlatformIO build and library directory
+    '.git',           # Git directory
+    'build',          # Build directory
+    '.vscode',        # VS Code settings (optional, but common)
+    '.idea',          # IDE settings
+})
 
 
-def get_client_files(project_dir, file_extensions=None, skip_exclusions=False):
+def normalize_extensions(file_extensions: Optional[Iterable[str]]) -> Optional[Tuple[str, ...]]:
+    """
+    Normalize file extensions so they start with '.' and are lowercase.
+    
+    Args:
+        file_extensions: Optional list of file extensions (e.g., ['.h', '.cpp'] or ['h', 'cpp'])
+        
+    Returns:
+        Tuple of normalized extensions, or None if no filtering should be applied
+    """
+    if not file_extensions:
+        return None
+    normalized_extensions = []
+    for ext in file_extensions:
+        ext_str = str(ext).lower()
+        if not ext_str.startswith('.'):
+            ext_str = '.' + ext_str
+        normalized_extensions.append(ext_str)
+    return tuple(normalized_extensions)
+
+
+def iter_client_files(project_dir, file_extensions=None, skip_exclusions=False,
+                      resolve_symlinks=False, exclude_dirs=None) -> Iterator[str]:
+    """
+    Lazily yield files in the client project using os.scandir.
+    
+    Excluded directories are pruned before descending into them, extensions are
+    matched against the raw directory entry name, and paths are only resolved
+    when resolve_symlinks is True. Symlinked directories are not followed.
+    
+    Args:
+        project_dir: Path to the client project root (where platformio.ini is)
+        file_extensions: Optional list of file extensions to filter by (e.g., ['.h', '.cpp'] or ['h', 'cpp']).
+                        If None or empty, yields all files. Extensions are case-insensitive.
+        skip_exclusions: If True, skip directory exclusion logic (useful for scanning library directories)
+        resolve_symlinks: If True, yield fully resolved paths (slower, one resolve per file)
+        exclude_dirs: Optional set of directory names to prune (default: DEFAULT_EXCLUDE_DIRS)
+    
+    Yields:
+        Absolute file paths, in directory order (not sorted)
+    """
+    root = str(Path(project_dir).resolve())
+    extensions = normalize_extensions(file_extensions)
+    if skip_exclusions:
+        pruned = frozenset()
+    else:
+        pruned = DEFAULT_EXCLUDE_DIRS if exclude_dirs is None else frozenset(exclude_dirs)
+    
+    pending = [root]
+    while pending:
+        current = pending.pop()
+        try:
+            scanner = os.scandir(current)
+        except OSError:
+            # Directory vanished or is unreadable
+            continue
+        with scanner:
+            for entry in scanner:
+                name = entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if name not in pruned:
+                            pending.append(entry.path)
+                        continue
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+                
+                # Filter by extension if extensions are provided
+                if extensions and not name.lower().endswith(extensions):
+                    continue
+                
+                if resolve_symlinks:
+                    try:
+                        yield os.path.realpath(entry.path)
+                    except (ValueError, OSError):
+                        # Skip if path cannot be resolved
+                        continue
+                else:
+                    yield entry.path
+
+
+def get_client_files(project_dir, file_extensions=None, skip_exclusions=False, resolve_symlinks=False) -> List[str]:
     """
     Get all files in the client project, excluding library directories.
     Optionally filter files by their extensions.
@@ -18,70 +114,17 @@ def get_client_files(project_dir, file_extensions=None, skip_exclusions=False):
         file_extensions: Optional list of file extensions to filter by (e.g., ['.h', '.cpp'] or ['h', 'cpp']).
                         If None or empty, returns all files. Extensions are case-insensitive.
         skip_exclusions: If True, skip directory exclusion logic (useful for scanning library directories)
+        resolve_symlinks: If True, resolve symlinks in the returned paths
     
     Returns:
         List of full absolute file paths
     """
-    project_path = Path(project_dir).resolve()
-    client_files = []
-    
-    # Normalize file extensions: ensure they start with '.' and are lowercase
-    normalized_extensions = None
-    if file_extensions:
-        normalized_extensions = []
-        for ext in file_extensions:
-            ext_str = str(ext).lower()
-            if not ext_str.startswith('.'):
-                ext_str = '.' + ext_str
-            normalized_extensions.append(ext_str)
-    
-    # Directories to exclude (PlatformIO library and build directories)
-    exclude_dirs = {
-        '.pio',           # PlatformIO build and library directory
-        '.git',           # Git directory
-        'build',          # Build directory
-        '.vscode',        # VS Code settings (optional, but common)
-        '.idea',          # IDE settings
-    }
-    
-    # Walk through the project directory
-    for root, dirs, files in os.walk(project_path):
-        # Convert to Path for easier manipulation
-        root_path = Path(root)
-        
-        # Skip exclusion logic if skip_exclusions is True
-        if not skip_exclusions:
-            # Skip if this directory or any parent is in exclude_dirs
-            should_skip = False
-            for part in root_path.parts:
-                if part in exclude_dirs:
-                    should_skip = True
-                    break
-            
-            if should_skip:
-                # Remove excluded directories from dirs list to prevent walking into them
-                dirs[:] = [d for d in dirs if d not in exclude_dirs]
-                continue
-        
-        # Add files in this directory (with optional extension filtering)
-        for file in files:
-            file_path = root_path / file
-            
-            # Filter by extension if extensions are provided
-            if normalized_extensions:
-                file_ext = file_path.suffix.lower()
-                if file_ext not in normalized_extensions:
-                    continue
-            
-            # Get full absolute path
-            try:
-                full_path = file_path.resolve()
-                client_files.append(str(full_path))
-            except (ValueError, OSError):
-                # Skip if path cannot be resolved
-                continue
-    
-    return sorted(client_files)
+    return sorted(iter_client_files(
+        project_dir,
+        file_extensions=file_extensions,
+        skip_exclusions=skip_exclusions,
+        resolve_symlinks=resolve_symlinks,
+    ))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,266 @@
+"""
+In-memory model of one header file with batched edits.
+
+A HeaderDocument loads the text once. Stages query the original lines and record
+edits (include insertions, method and specialization injection, marker rewrites)
+as patches against offsets in the original text. save() applies every patch in
+one atomic write, so line numbers found by the detection stages stay valid no
+matter how many edits come before them.
+"""
+
+import io
+import bisect
+from typing import List, Optional, Tuple
+
+try:
+    from serializationlib_file_writer import write_if_changed
+    from serializationlib_tokenizer import HeaderTokens
+    from serializationlib_class_index import ClassIndex
+except ImportError:
+    from serializationlib_core.serializationlib_file_writer import write_if_changed
+    from serializationlib_core.serializationlib_tokenizer import HeaderTokens
+    from serializationlib_core.serializationlib_class_index import ClassIndex
+
+
+class HeaderDocument:
+    """
+    Text of a header plus the patches to apply to it.
+
+    Patches are (start, end, text) ranges of the original text. Insertions at the
+    same offset are applied in the order they were recorded. Overlapping
+    replacements are rejected.
+    """
+
+    def __init__(self, file_path: str, text: str):
+        """
+        Args:
+            file_path: Path to the header file
+            text: Current content of the file
+        """
+        self.file_path = file_path
+        self._reset(text)
+
+    @classmethod
+    def load(cls, file_path: str, scan_context=None) -> Optional['HeaderDocument']:
+        """
+        Load a header, from the shared ScanContext cache if one is given.
+
+        Args:
+            file_path: Path to the header file
+            scan_context: Optional ScanContext used to read the file
+
+        Returns:
+            HeaderDocument, or None if the file cannot be read
+        """
+        try:
+            if scan_context is not None:
+                text = scan_context.read_text(file_path)
+            else:
+                with open(file_path, 'r', encoding='utf-8') as file:
+                    text = file.read()
+        except Exception:
+            return None
+        return cls(file_path, text)
+
+    @property
+    def modified(self) -> bool:
+        """True if at least one patch was recorded."""
+        return bool(self._patches)
+
+    @property
+    def tokens(self) -> HeaderTokens:
+        """Token stream of the original text, built on first use."""
+        if self._tokens is None:
+            self._tokens = HeaderTokens(self.lines)
+        return self._tokens
+
+    @property
+    def class_index(self) -> ClassIndex:
+        """Class index of the original text, built on first use."""
+        if self._class_index is None:
+            self._class_index = ClassIndex(self.tokens)
+        return self._class_index
+
+    def offset_of_line(self, line_number: int) -> int:
+        """
+        Return the offset of the start of a line in the original text.
+
+        Args:
+            line_number: Line number (1-based); len(lines) + 1 is the end of the text
+
+        Returns:
+            Offset in the original text
+        """
+        if line_number > len(self.lines):
+            return len(self.text)
+        return self._line_offsets[max(line_number, 1) - 1]
+
+    def line_of_offset(self, offset: int) -> int:
+        """
+        Return the line number (1-based) containing an offset of the original text.
+
+        Args:
+            offset: Offset in the original text
+
+        Returns:
+            Line number
+        """
+        return bisect.bisect_right(self._line_offsets, offset)
+
+    def insert(self, offset: int, text: str) -> None:
+        """
+        Record an insertion at an offset of the original text.
+
+        Args:
+            offset: Offset in the original text
+            text: Text to insert
+        """
+        self._add_patch(offset, offset, text)
+
+    def replace(self, start: int, end: int, text: str) -> None:
+        """
+        Record the replacement of a range of the original text.
+
+        Args:
+            start: Start offset in the original text
+            end: End offset (exclusive) in the original text
+            text: Replacement text
+
+        Raises:
+            ValueError: If the range overlaps a different range that is already replaced
+        """
+        for patch_start, patch_end, _, patch_text in self._patches:
+            if (patch_start, patch_end, patch_text) == (start, end, text):
+                # Same edit recorded twice (e.g. one marker reached from two stages)
+                return
+            if patch_start < end and start < patch_end:
+                raise ValueError(f"Overlapping edit at offset {start} in {self.file_path}")
+        self._add_patch(start, end, text)
+
+    def insert_lines(self, line_number: int, lines: List[str]) -> None:
+        """
+        Record the insertion of lines before an original line.
+
+        Args:
+            line_number: Line number (1-based) to insert before; len(lines) + 1 appends
+            lines: Lines to insert, including line endings
+        """
+        self.insert(self.offset_of_line(line_number), ''.join(lines))
+
+    def replace_line(self, line_number: int, line: str) -> None:
+        """
+        Record the replacement of a whole original line.
+
+        Args:
+            line_number: Line number (1-based)
+            line: New line, including its line ending
+        """
+        start = self.offset_of_line(line_number)
+        self.replace(start, start + len(self.lines[line_number - 1]), line)
+
+    def has_include(self, include_path: str) -> bool:
+        """
+        Check if an include already exists in the text or is pending.
+
+        Args:
+            include_path: Include path (e.g., "<optional>" or '"some/header.h"')
+
+        Returns:
+            True if the include exists or was already added
+        """
+        include_pattern = include_path.replace('<', '').replace('>', '').replace('"', '')
+        return include_pattern in self.text or include_path in self._pending_includes
+
+    def add_include(self, include_path: str) -> bool:
+        """
+        Add an include after the last #include (or the header guard) unless it already exists.
+
+        Args:
+            include_path: Include path to add (e.g., "<ArduinoJson.h>" or '"some/header.h"')
+
+        Returns:
+            True if the include exists or was added, False if no insertion point was found
+        """
+        if self.has_include(include_path):
+            return True
+
+        # Find the last #include line
+        insert_line = None
+        for line_number, line in enumerate(self.lines, 1):
+            if line.strip().startswith('#include'):
+                insert_line = line_number + 1
+        if insert_line is None:
+            # No includes found, add after header guard
+            for line_number, line in enumerate(self.lines, 1):
+                if line.strip().startswith('#define') and '_H' in line:
+                    insert_line = line_number + 1
+                    break
+        if insert_line is None:
+            return False
+
+        self.insert_lines(insert_line, [f'#include {include_path}\n'])
+        self._pending_includes.append(include_path)
+        return True
+
+    def render(self) -> str:
+        """
+        Apply all patches to the original text.
+
+        Returns:
+            Patched text
+        """
+        parts = []
+        position = 0
+        for start, end, _, text in sorted(self._patches):
+            parts.append(self.text[position:start])
+            parts.append(text)
+            position = max(position, end)
+        parts.append(self.text[position:])
+        return ''.join(parts)
+
+    def save(self, dry_run: bool = False, scan_context=None) -> bool:
+        """
+        Write the patched text atomically if it differs from the file on disk.
+
+        Args:
+            dry_run: If True, don't actually modify the file
+            scan_context: Optional ScanContext whose cached copy of the file is dropped
+
+        Returns:
+            True if the file is up to date, False on error
+        """
+        if not self._patches or dry_run:
+            return True
+        content = self.render()
+        if content == self.text:
+            return True
+
+        try:
+            write_if_changed(self.file_path, content)
+        except OSError:
+            return False
+        finally:
+            if scan_context is not None:
+                scan_context.invalidate(self.file_path)
+
+        # The new text is the base for any further edits
+        self._reset(content)
+        return True
+
+    def _reset(self, text: str) -> None:
+        self.text = text
+        # Same line splitting as readlines(), so line numbers match the other stages
+        self.lines: List[str] = io.StringIO(text).readlines()
+        self._line_offsets: List[int] = []
+        offset = 0
+        for line in self.lines:
+            self._line_offsets.append(offset)
+            offset += len(line)
+        self._patches: List[Tuple[int, int, int, str]] = []
+        self._pending_includes: List[str] = []
+        self._tokens: Optional[HeaderTokens] = None
+        self._class_index: Optional[ClassIndex] = None
+
+    def _add_patch(self, start: int, end: int, text: str) -> None:
+        # The sequence number keeps insertions at one offset in recording order
+        self._patches.append((start, end, len(self._patches), text))
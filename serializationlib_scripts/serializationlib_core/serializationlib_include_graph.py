@@ -0,0 +1,410 @@
+"""
+Library headers reachable from the build's compilation database.
+
+With a compile_commands.json (CMake with CMAKE_EXPORT_COMPILE_COMMANDS, or
+PlatformIO's `pio run -t compiledb`) the pipeline only processes the library
+headers the build actually includes. Starting from the translation units of the
+database, #include directives are followed through the include paths of the
+compile commands. Only files inside the project and the discovered library
+roots are opened; toolchain and framework headers never are.
+
+Resolution errs on the side of including too much: #if blocks are ignored, and
+an include that exists in several include directories follows all of them. The
+result is a superset of what the compiler reads.
+
+The #include lines of every file are cached with its size and mtime next to the
+build ledger, so walking an unchanged tree does not read any file.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import marshal
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from serializationlib_ledger import default_ledger_dir
+except ImportError:
+    from serializationlib_core.serializationlib_ledger import default_ledger_dir
+
+
+# Bump when the cache layout changes
+INCLUDE_GRAPH_FORMAT = 1
+
+INCLUDE_GRAPH_FILE_NAME = 'include_graph.marshal'
+
+COMPILE_COMMANDS_NAME = 'compile_commands.json'
+
+# Values of SERIALIZATIONLIB_COMPILE_COMMANDS that select a discovered database
+AUTO_VALUES = ('1', 'auto', 'on', 'true', 'yes')
+OFF_VALUES = ('0', 'off', 'false', 'no')
+
+# Compiler flags that add an include directory, as a separate or attached argument
+INCLUDE_DIR_FLAGS = ('-isystem', '-iquote', '-idirafter', '-I')
+
+INCLUDE_PATTERN = re.compile(rb'^[ \t]*#[ \t]*include[ \t]*([<"])([^>"\r\n]+)[>"]', re.MULTILINE)
+
+
+def find_compile_commands(project_dir) -> Optional[str]:
+    """
+    Find the compilation database of a project.
+
+    Looks for compile_commands.json in the project root (PlatformIO compiledb and
+    many CMake setups), in build/, and in .pio/build/<env>/ (the newest one wins).
+
+    Args:
+        project_dir: Path to the client project root
+
+    Returns:
+        Path to compile_commands.json, or None if there is none
+    """
+    if not project_dir:
+        return None
+    for candidate in (os.path.join(project_dir, COMPILE_COMMANDS_NAME),
+                      os.path.join(project_dir, 'build', COMPILE_COMMANDS_NAME)):
+        if os.path.isfile(candidate):
+            return candidate
+
+    newest = None
+    newest_mtime = None
+    pio_build = os.path.join(project_dir, '.pio', 'build')
+    try:
+        env_dirs = os.listdir(pio_build)
+    except OSError:
+        return None
+    for env_name in env_dirs:
+        candidate = os.path.join(pio_build, env_name, COMPILE_COMMANDS_NAME)
+        try:
+            mtime = os.stat(candidate).st_mtime_ns
+        except OSError:
+            continue
+        if newest_mtime is None or mtime > newest_mtime:
+            newest, newest_mtime = candidate, mtime
+    return newest
+
+
+def resolve_compile_commands(project_dir, compile_commands=None) -> Optional[str]:
+    """
+    Resolve the compilation database that restricts library scanning.
+
+    Uses the compile_commands argument, then SERIALIZATIONLIB_COMPILE_COMMANDS.
+    Either may be a path (relative to the project) or "auto" to look for one with
+    find_compile_commands(). Unset, "0" or "off" scans every library header.
+
+    Args:
+        project_dir: Path to the client project root
+        compile_commands: Requested database or "auto", or None to read the environment
+
+    Returns:
+        Absolute path to compile_commands.json, or None to scan every library header
+    """
+    value = compile_commands
+    if value is None:
+        value = os.environ.get('SERIALIZATIONLIB_COMPILE_COMMANDS')
+    if not value:
+        return None
+    value = str(value).strip()
+    if value.lower() in OFF_VALUES:
+        return None
+    if value.lower() in AUTO_VALUES:
+        return find_compile_commands(project_dir)
+    if project_dir and not os.path.isabs(value):
+        value = os.path.join(str(project_dir), value)
+    return os.path.abspath(value)
+
+
+def parse_compile_commands(text: str) -> Tuple[List[str], List[str]]:
+    """
+    Extract the translation units and include directories of a compilation database.
+
+    Args:
+        text: Content of compile_commands.json
+
+    Returns:
+        Tuple of (source files, include directories), both absolute and without duplicates
+
+    Raises:
+        ValueError: If the text is not a compilation database
+    """
+    import json
+    import shlex
+
+    entries = json.loads(text)
+    if not isinstance(entries, list):
+        raise ValueError('compile_commands.json must contain a list')
+
+    sources = {}
+    include_dirs = {}
+    for entry in entries:
+        if not isinstance(entry, dict) or 'file' not in entry:
+            continue
+        directory = entry.get('directory') or ''
+        sources[os.path.normpath(os.path.join(directory, entry['file']))] = None
+
+        arguments = entry.get('arguments')
+        if arguments is None:
+            arguments = shlex.split(entry.get('command', ''))
+        index = 0
+        while index < len(arguments):
+            argument = arguments[index]
+            for flag in INCLUDE_DIR_FLAGS:
+                if argument == flag:
+                    if index + 1 < len(arguments):
+                        index += 1
+                        include_dirs[os.path.normpath(os.path.join(directory, arguments[index]))] = None
+                    break
+                if argument.startswith(flag):
+                    include_dirs[os.path.normpath(os.path.join(directory, argument[len(flag):]))] = None
+                    break
+            index += 1
+    return list(sources), list(include_dirs)
+
+
+def parse_includes(content: bytes) -> List[Tuple[bool, str]]:
+    """
+    Extract the #include directives of a file.
+
+    Args:
+        content: File content
+
+    Returns:
+        List of (quoted, name) tuples in file order; quoted is True for #include "name"
+    """
+    includes = []
+    for match in INCLUDE_PATTERN.finditer(content):
+        try:
+            name = match.group(2).decode('utf-8').strip()
+        except UnicodeDecodeError:
+            continue
+        includes.append((match.group(1) == b'"', name))
+    return includes
+
+
+class IncludeGraph:
+    """
+    Follows #include edges from the translation units of a compilation database.
+
+    Keeps the parsed database and the #include lines of each visited file between
+    runs, keyed by size and mtime.
+    """
+
+    def __init__(self, compile_commands: str, path=None, tool_version: Optional[str] = None):
+        """
+        Args:
+            compile_commands: Path to compile_commands.json
+            path: Path to the cache file (None = keep the cache in memory only)
+            tool_version: Version string from compute_tool_version()
+        """
+        self.compile_commands = str(compile_commands)
+        self.path = Path(path) if path else None
+        self.tool_version = tool_version
+        # file path -> (size, mtime_ns, includes)
+        self.entries: Dict[str, tuple] = {}
+        # (size, mtime_ns, sources, include directories) of the database
+        self.commands: Optional[tuple] = None
+        self._dirty = False
+        self._real_dirs: Dict[str, str] = {}
+
+    @classmethod
+    def for_project(cls, project_dir, compile_commands: str, tool_version: Optional[str] = None) -> 'IncludeGraph':
+        """
+        Create the include graph of a project with its cache next to the build ledger.
+
+        With SERIALIZATIONLIB_NO_CACHE=1 or without a project the cache is not persisted.
+
+        Args:
+            project_dir: Path to the client project root
+            compile_commands: Path to compile_commands.json
+            tool_version: Version string from compute_tool_version()
+
+        Returns:
+            IncludeGraph (loaded from disk when a cache exists)
+        """
+        cache_dir = None
+        if not os.environ.get('SERIALIZATIONLIB_NO_CACHE'):
+            cache_dir = default_ledger_dir(project_dir)
+        if cache_dir is None:
+            return cls(compile_commands)
+        graph = cls(compile_commands, cache_dir / INCLUDE_GRAPH_FILE_NAME, tool_version)
+        graph.load()
+        return graph
+
+    def load(self) -> None:
+        """Load the cache from disk, discarding it if the format, tool version or database differs."""
+        if self.path is None:
+            return
+        try:
+            with open(self.path, 'rb') as file:
+                data = marshal.load(file)
+        except Exception:
+            return
+        if not isinstance(data, dict):
+            return
+        if (data.get('format') != INCLUDE_GRAPH_FORMAT or data.get('tool_version') != self.tool_version
+                or data.get('compile_commands') != self.compile_commands):
+            return
+        entries = data.get('files')
+        if isinstance(entries, dict):
+            self.entries = entries
+        commands = data.get('commands')
+        if isinstance(commands, tuple):
+            self.commands = commands
+
+    def save(self) -> bool:
+        """
+        Atomically write the cache to disk if it changed.
+
+        Returns:
+            True if the cache is up to date on disk (or not persisted), False on error
+        """
+        if self.path is None or not self._dirty:
+            return True
+        data = {
+            'format': INCLUDE_GRAPH_FORMAT,
+            'tool_version': self.tool_version,
+            'compile_commands': self.compile_commands,
+            'commands': self.commands,
+            'files': self.entries,
+        }
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'wb') as file:
+                marshal.dump(data, file)
+            os.replace(tmp_path, self.path)
+        except (OSError, ValueError):
+            return False
+        self._dirty = False
+        return True
+
+    def load_commands(self) -> Optional[Tuple[List[str], List[str]]]:
+        """
+        Return the translation units and include directories of the database.
+
+        Returns:
+            Tuple of (source files, include directories), or None if the database
+            is missing or unreadable
+        """
+        try:
+            st = os.stat(self.compile_commands)
+        except OSError:
+            return None
+        if self.commands is not None and self.commands[:2] == (st.st_size, st.st_mtime_ns):
+            return list(self.commands[2]), list(self.commands[3])
+        try:
+            with open(self.compile_commands, 'r', encoding='utf-8') as file:
+                sources, include_dirs = parse_compile_commands(file.read())
+        except (OSError, ValueError):
+            return None
+        self.commands = (st.st_size, st.st_mtime_ns, tuple(sources), tuple(include_dirs))
+        self._dirty = True
+        return sources, include_dirs
+
+    def includes(self, file_path: str) -> Optional[List[Tuple[bool, str]]]:
+        """
+        Return the #include directives of a file, from the cache when it is unchanged.
+
+        Args:
+            file_path: Path to the file
+
+        Returns:
+            List of (quoted, name) tuples, or None if the file cannot be read
+        """
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        entry = self.entries.get(file_path)
+        if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            return entry[2]
+        try:
+            with open(file_path, 'rb') as file:
+                includes = parse_includes(file.read())
+        except OSError:
+            return None
+        self.entries[file_path] = (st.st_size, st.st_mtime_ns, includes)
+        self._dirty = True
+        return includes
+
+    def reachable_files(self, roots: Iterable) -> Optional[Set[str]]:
+        """
+        Collect every file under the roots that the translation units include.
+
+        Args:
+            roots: Directories whose files are followed (project and library roots)
+
+        Returns:
+            Set of real paths (translation units included), or None if the database
+            cannot be read and every header must be scanned
+        """
+        commands = self.load_commands()
+        if commands is None:
+            return None
+        sources, include_dirs = commands
+
+        root_prefixes = tuple(os.path.join(self._real_dir(str(root)), '') for root in roots if root)
+        # Include directories outside the roots can only lead to files outside them
+        search_dirs = [real_dir for real_dir in (self._real_dir(directory) for directory in include_dirs)
+                       if real_dir.startswith(root_prefixes)]
+        resolved: Dict[str, List[str]] = {}
+
+        visited = set()
+        queue = deque()
+        for source in sources:
+            source = self.real_path(source)
+            if source.startswith(root_prefixes) and source not in visited:
+                visited.add(source)
+                queue.append(source)
+
+        while queue:
+            file_path = queue.popleft()
+            includes = self.includes(file_path)
+            if not includes:
+                continue
+            current_dir = os.path.dirname(file_path)
+            for quoted, name in includes:
+                targets = []
+                if quoted:
+                    local = os.path.normpath(os.path.join(current_dir, name))
+                    if os.path.isfile(local):
+                        targets.append(local)
+                if name not in resolved:
+                    resolved[name] = [candidate for candidate in
+                                      (os.path.normpath(os.path.join(directory, name)) for directory in search_dirs)
+                                      if os.path.isfile(candidate)]
+                targets.extend(resolved[name])
+                for target in targets:
+                    if target not in visited and target.startswith(root_prefixes):
+                        visited.add(target)
+                        queue.append(target)
+
+        # Forget files the build no longer reaches
+        stale = [path for path in self.entries if path not in visited]
+        for path in stale:
+            del self.entries[path]
+        if stale:
+            self._dirty = True
+        return visited
+
+    def _real_dir(self, directory: str) -> str:
+        real_dir = self._real_dirs.get(directory)
+        if real_dir is None:
+            real_dir = os.path.realpath(directory)
+            self._real_dirs[directory] = real_dir
+        return real_dir
+
+    def real_path(self, file_path: str) -> str:
+        """
+        Resolve symlinked directories in a path, as done for reachable_files().
+
+        Args:
+            file_path: Path to a file
+
+        Returns:
+            Path with its directory resolved (file names themselves are rarely symlinks)
+        """
+        directory, name = os.path.split(os.path.abspath(file_path))
+        return os.path.join(self._real_dir(directory), name)
@@ -0,0 +1,501 @@
+"""
+Persistent per-header fingerprint ledger for incremental pre-builds.
+
+Records (size, mtime_ns, content hash) for every header seen by a run together
+with the tool version and a hash of the validation macro registry. A later run
+skips headers whose fingerprint is unchanged and whose generated outputs still
+exist, without opening them, as long as the registry is the same.
+
+Third-party libraries are fingerprinted as a whole (git HEAD and manifests plus
+the size and mtime of every header). A library recorded without annotations or
+validation macros has none of its headers opened until its fingerprint changes.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import marshal
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+# hashlib loads OpenSSL on import; BLAKE2 is built in and all the ledger needs
+try:
+    from _blake2 import blake2b
+except ImportError:
+    from hashlib import blake2b
+
+
+# Bump when the ledger layout changes
+LEDGER_FORMAT = 2
+
+# marshal rather than JSON or pickle: loading 20k entries must stay well under the
+# no-op budget, and marshal is already loaded by the interpreter
+LEDGER_FILE_NAME = 'ledger.marshal'
+
+# Entry layout: (size, mtime_ns, content hash, generated outputs)
+SIZE, MTIME_NS, HASH, OUTPUTS = range(4)
+
+# Files whose content identifies an installed library version
+LIBRARY_MANIFESTS = ('library.json', 'library.properties', '.piopm')
+
+# Header extensions listed by the fallback library fingerprint
+LIBRARY_HEADER_EXTENSIONS = ('.h', '.hpp')
+
+
+def compute_tool_version(scripts_dir: Optional[str] = None) -> str:
+    """
+    Compute a version string that changes whenever the pre-build scripts change.
+
+    Combines the library.json version with the size and mtime of every script,
+    so editing or upgrading the library invalidates previous ledgers.
+
+    Args:
+        scripts_dir: Path to serializationlib_scripts (default: derived from this file)
+
+    Returns:
+        Version string
+    """
+    if scripts_dir is None:
+        scripts_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    # A regex instead of json keeps json out of the no-op startup path
+    library_version = 'unknown'
+    try:
+        with open(os.path.join(os.path.dirname(scripts_dir), 'library.json'), 'r', encoding='utf-8') as file:
+            version_match = re.search(r'"version"\s*:\s*"([^"]*)"', file.read())
+        if version_match:
+            library_version = version_match.group(1)
+    except (OSError, ValueError):
+        pass
+
+    digest = blake2b(digest_size=8)
+    for root, dirs, files in os.walk(scripts_dir):
+        dirs[:] = sorted(d for d in dirs if d != '__pycache__')
+        for name in sorted(files):
+            if name.endswith('.py'):
+                try:
+                    st = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                digest.update(f'{name}:{st.st_size}:{st.st_mtime_ns};'.encode('utf-8'))
+    return f'{library_version}+{digest.hexdigest()}'
+
+
+def hash_file(file_path: str) -> Optional[str]:
+    """
+    Hash the content of a file.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        Hex digest, or None if the file cannot be read
+    """
+    try:
+        with open(file_path, 'rb') as file:
+            return blake2b(file.read(), digest_size=16).hexdigest()
+    except OSError:
+        return None
+
+
+def hash_validation_registry(validation_macros: Dict[str, str]) -> str:
+    """
+    Hash a merged validation macro registry.
+
+    Args:
+        validation_macros: Dictionary mapping macro names to validation function names
+
+    Returns:
+        Hex digest that changes whenever a macro is added, removed or remapped
+    """
+    return blake2b(marshal.dumps(sorted(validation_macros.items())), digest_size=16).hexdigest()
+
+
+def _git_head(lib_root: str) -> Optional[str]:
+    # Commit id of a git checkout, following a gitdir file (submodules, worktrees) and packed refs
+    git_dir = os.path.join(lib_root, '.git')
+    try:
+        if os.path.isfile(git_dir):
+            with open(git_dir, 'r', encoding='utf-8') as file:
+                content = file.read().strip()
+            if not content.startswith('gitdir:'):
+                return None
+            git_dir = os.path.join(lib_root, content[len('gitdir:'):].strip())
+        with open(os.path.join(git_dir, 'HEAD'), 'r', encoding='utf-8') as file:
+            head = file.read().strip()
+    except OSError:
+        return None
+    if not head.startswith('ref:'):
+        return head or None
+    ref = head[len('ref:'):].strip()
+    try:
+        with open(os.path.join(git_dir, *ref.split('/')), 'r', encoding='utf-8') as file:
+            return file.read().strip() or None
+    except OSError:
+        pass
+    try:
+        with open(os.path.join(git_dir, 'packed-refs'), 'r', encoding='utf-8') as file:
+            for line in file:
+                parts = line.split()
+                if len(parts) == 2 and parts[1] == ref:
+                    return parts[0]
+    except OSError:
+        pass
+    return None
+
+
+def fingerprint_library(lib_root) -> Optional[str]:
+    """
+    Fingerprint a library root as a whole.
+
+    Combines the git HEAD of a checkout and the content of its manifests (library.json,
+    library.properties, PlatformIO's .piopm) with the path, size and mtime of every
+    header, so uncommitted and local edits change the fingerprint too. Headers are
+    stat'ed, not read.
+
+    Args:
+        lib_root: Path to the library root
+
+    Returns:
+        Fingerprint string, or None if the library cannot be read
+    """
+    lib_root = str(lib_root)
+    if not os.path.isdir(lib_root):
+        return None
+
+    digest = blake2b(digest_size=16)
+    head = _git_head(lib_root)
+    if head:
+        digest.update(f'git:{head};'.encode('utf-8'))
+    for name in LIBRARY_MANIFESTS:
+        try:
+            with open(os.path.join(lib_root, name), 'rb') as file:
+                digest.update(name.encode('utf-8') + b'\0' + file.read() + b'\0')
+        except OSError:
+            continue
+
+    for root, dirs, files in os.walk(lib_root):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for name in sorted(files):
+            if name.endswith(LIBRARY_HEADER_EXTENSIONS):
+                file_path = os.path.join(root, name)
+                try:
+                    st = os.stat(file_path)
+                except OSError:
+                    continue
+                digest.update(f'{os.path.relpath(file_path, lib_root)}:{st.st_size}:{st.st_mtime_ns};'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def library_manifest_hash(lib_root, file_paths: Iterable[str]) -> Optional[str]:
+    """
+    Hash the manifests and header listing of a library copy.
+
+    Copies of one library installed for several PlatformIO environments hash equal
+    without any header being read. Callers still compare header contents before
+    sharing results between copies.
+
+    Args:
+        lib_root: Path to the library root
+        file_paths: Headers of the library
+
+    Returns:
+        Hex digest, or None if a header cannot be stat'ed
+    """
+    lib_root = str(lib_root)
+    digest = blake2b(digest_size=16)
+    for name in LIBRARY_MANIFESTS:
+        try:
+            with open(os.path.join(lib_root, name), 'rb') as file:
+                digest.update(name.encode('utf-8') + b'\0' + file.read() + b'\0')
+        except OSError:
+            continue
+    for file_path in sorted(file_paths):
+        try:
+            size = os.stat(file_path).st_size
+        except OSError:
+            return None
+        digest.update(f'{os.path.relpath(file_path, lib_root)}:{size};'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def default_ledger_dir(project_dir) -> Optional[Path]:
+    """
+    Choose where the ledger lives for a project.
+
+    SERIALIZATIONLIB_CACHE_DIR overrides the location. Otherwise PlatformIO projects
+    use .pio/serializationlib/ and everything else uses build/serializationlib/.
+
+    Args:
+        project_dir: Path to the client project root
+
+    Returns:
+        Directory for the ledger, or None if there is no project
+    """
+    override = os.environ.get('SERIALIZATIONLIB_CACHE_DIR')
+    if override:
+        return Path(override)
+    if not project_dir:
+        return None
+    project_path = Path(project_dir)
+    if (project_path / 'platformio.ini').exists() or (project_path / '.pio').is_dir():
+        return project_path / '.pio' / 'serializationlib'
+    return project_path / 'build' / 'serializationlib'
+
+
+class BuildLedger:
+    """
+    On-disk record of header fingerprints from the previous run.
+
+    Entries are only trusted when the ledger was written by the same tool version.
+    """
+
+    def __init__(self, path, tool_version: str):
+        """
+        Args:
+            path: Path to the ledger file
+            tool_version: Version string from compute_tool_version()
+        """
+        self.path = Path(path)
+        self.tool_version = tool_version
+        self.entries: Dict[str, Tuple[int, int, Optional[str], Tuple[str, ...]]] = {}
+        # library root -> (fingerprint, True if the library has no annotations or validation macros)
+        self.libraries: Dict[str, Tuple[str, bool]] = {}
+        # hash_validation_registry() of the registry the recorded headers were generated with
+        self.validation_registry: Optional[str] = None
+        self._registry_changed = False
+        self._dirty = False
+
+    @classmethod
+    def for_project(cls, project_dir, tool_version: Optional[str] = None) -> Optional['BuildLedger']:
+        """
+        Load the ledger for a project, or return None if ledgers are disabled.
+
+        Set SERIALIZATIONLIB_NO_CACHE=1 to disable the ledger.
+
+        Args:
+            project_dir: Path to the client project root
+            tool_version: Version string (default: compute_tool_version())
+
+        Returns:
+            Loaded BuildLedger, or None
+        """
+        if os.environ.get('SERIALIZATIONLIB_NO_CACHE'):
+            return None
+        ledger_dir = default_ledger_dir(project_dir)
+        if ledger_dir is None:
+            return None
+        ledger = cls(ledger_dir / LEDGER_FILE_NAME, tool_version or compute_tool_version())
+        ledger.load()
+        return ledger
+
+    def load(self) -> None:
+        """Load entries from disk, discarding them if the format or tool version differs."""
+        try:
+            with open(self.path, 'rb') as file:
+                data = marshal.load(file)
+        except Exception:
+            # Missing, truncated or written by an incompatible Python
+            return
+        if not isinstance(data, dict):
+            return
+        if data.get('format') != LEDGER_FORMAT or data.get('tool_version') != self.tool_version:
+            return
+        entries = data.get('files')
+        if isinstance(entries, dict):
+            self.entries = entries
+        libraries = data.get('libraries')
+        if isinstance(libraries, dict):
+            self.libraries = libraries
+        self.validation_registry = data.get('validation_registry')
+
+    def save(self) -> bool:
+        """
+        Atomically write the ledger to disk if it changed.
+
+        Returns:
+            True if the ledger is up to date on disk, False on error
+        """
+        if not self._dirty:
+            return True
+        data = {
+            'format': LEDGER_FORMAT,
+            'tool_version': self.tool_version,
+            'files': self.entries,
+            'libraries': self.libraries,
+            'validation_registry': self.validation_registry,
+        }
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'wb') as file:
+                marshal.dump(data, file)
+            os.replace(tmp_path, self.path)
+        except (OSError, ValueError):
+            return False
+        self._dirty = False
+        # The headers recorded before saving were generated with the current registry
+        self._registry_changed = False
+        return True
+
+    def require_validation_registry(self, registry_hash: str) -> None:
+        """
+        Set the validation macro registry of the current run.
+
+        Generated code depends on the macros defined in other headers, so a changed
+        registry makes every header count as changed until the ledger is saved. Entries
+        and their outputs are kept, so stale generated files are still cleaned up.
+
+        Args:
+            registry_hash: hash_validation_registry() of the current registry
+        """
+        if self.validation_registry != registry_hash:
+            self.validation_registry = registry_hash
+            self._registry_changed = True
+            self._dirty = True
+
+    def is_unchanged(self, file_path: str, stat_result: Optional[os.stat_result]) -> bool:
+        """
+        Check whether a file matches its recorded fingerprint.
+
+        A size and mtime match is trusted without reading the file. If only the mtime
+        differs, the content hash decides and the stored mtime is refreshed.
+
+        Args:
+            file_path: Path to the header
+            stat_result: Current os.stat result for the file
+
+        Returns:
+            True if the file and its generated outputs are unchanged
+        """
+        entry = self.entries.get(file_path)
+        if entry is None or stat_result is None or self._registry_changed:
+            return False
+        if entry[SIZE] != stat_result.st_size:
+            return False
+        for output in entry[OUTPUTS]:
+            if not os.path.exists(output):
+                return False
+        if entry[MTIME_NS] == stat_result.st_mtime_ns:
+            return True
+        # Touched but possibly not modified
+        if entry[HASH] and entry[HASH] == hash_file(file_path):
+            self.entries[file_path] = (entry[SIZE], stat_result.st_mtime_ns, entry[HASH], entry[OUTPUTS])
+            self._dirty = True
+            return True
+        return False
+
+    def outputs(self, file_path: str) -> Tuple[str, ...]:
+        """
+        Return the generated outputs recorded for a file.
+
+        Args:
+            file_path: Path to the header
+
+        Returns:
+            Tuple of generated file paths (empty if the file is not in the ledger)
+        """
+        entry = self.entries.get(file_path)
+        return entry[OUTPUTS] if entry is not None else ()
+
+    def record(self, file_path: str, stat_result: Optional[os.stat_result], outputs: Iterable[str] = ()) -> None:
+        """
+        Record the current fingerprint of a file.
+
+        Args:
+            file_path: Path to the header
+            stat_result: Current os.stat result for the file (None removes the entry)
+            outputs: Generated files that must exist for the entry to stay valid
+        """
+        if stat_result is None:
+            self.forget(file_path)
+            return
+        entry = (stat_result.st_size, stat_result.st_mtime_ns, hash_file(file_path), tuple(sorted(outputs)))
+        if self.entries.get(file_path) != entry:
+            self.entries[file_path] = entry
+            self._dirty = True
+
+    def forget(self, file_path: str) -> None:
+        """
+        Remove a file from the ledger.
+
+        Args:
+            file_path: Path to the header
+        """
+        if self.entries.pop(file_path, None) is not None:
+            self._dirty = True
+
+    def retain_only(self, file_paths: Iterable[str]) -> None:
+        """
+        Drop entries for files that no longer exist in the scan.
+
+        Args:
+            file_paths: Files seen by the current run
+        """
+        keep = set(file_paths)
+        stale = [path for path in self.entries if path not in keep]
+        for path in stale:
+            del self.entries[path]
+        if stale:
+            self._dirty = True
+
+    def is_quiet_library(self, lib_root: str, fingerprint: Optional[str]) -> bool:
+        """
+        Check whether a library was recorded without annotations at this fingerprint.
+
+        Args:
+            lib_root: Path to the library root
+            fingerprint: Current result of fingerprint_library()
+
+        Returns:
+            True if the library can be skipped without walking it
+        """
+        entry = self.libraries.get(lib_root)
+        return fingerprint is not None and entry is not None and entry == (fingerprint, True)
+
+    def knows_library(self, lib_root: str, fingerprint: Optional[str]) -> bool:
+        """
+        Check whether a library was already evaluated at this fingerprint.
+
+        Args:
+            lib_root: Path to the library root
+            fingerprint: Current result of fingerprint_library()
+
+        Returns:
+            True if the recorded entry is still valid
+        """
+        entry = self.libraries.get(lib_root)
+        return fingerprint is not None and entry is not None and entry[0] == fingerprint
+
+    def record_library(self, lib_root: str, fingerprint: Optional[str], quiet: bool) -> None:
+        """
+        Record whether a library contains annotations.
+
+        Args:
+            lib_root: Path to the library root
+            fingerprint: Result of fingerprint_library() (None removes the entry)
+            quiet: True if no header of the library has an annotation or a validation macro
+        """
+        if fingerprint is None:
+            if self.libraries.pop(lib_root, None) is not None:
+                self._dirty = True
+            return
+        entry = (fingerprint, quiet)
+        if self.libraries.get(lib_root) != entry:
+            self.libraries[lib_root] = entry
+            self._dirty = True
+
+    def retain_libraries(self, lib_roots: Iterable[str]) -> None:
+        """
+        Drop library entries that are no longer discovered.
+
+        Args:
+            lib_roots: Library roots seen by the current run
+        """
+        keep = set(lib_roots)
+        stale = [root for root in self.libraries if root not in keep]
+        for root in stale:
+            del self.libraries[root]
+        if stale:
+            self._dirty = True
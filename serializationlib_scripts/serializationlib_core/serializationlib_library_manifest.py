@@ -0,0 +1,97 @@
+"""
+Annotation manifests declared by libraries in their library.json.
+
+A library can list the headers that contain @Serializable types and the headers
+that define validation macros, so the pipeline reads only those files instead of
+walking the whole library:
+
+    "serializationlib": {
+        "headers": ["src/dto/*.h"],
+        "validation": ["src/Validation.h"]
+    }
+
+Entries are paths relative to the library root; entries with *, ? or [ are glob
+patterns (** matches directories recursively). A missing key means the library
+is scanned as before for that kind of file; an empty list means there is nothing
+to scan.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from typing import Dict, List, Optional
+
+MANIFEST_FILE_NAME = 'library.json'
+MANIFEST_SECTION = 'serializationlib'
+MANIFEST_KEYS = ('headers', 'validation')
+
+# Cheap check before json is imported; most library.json files have no section
+MANIFEST_SECTION_PATTERN = re.compile(r'"serializationlib"\s*:\s*\{')
+
+
+def expand_manifest_entries(lib_root: str, entries: List[str]) -> List[str]:
+    """
+    Resolve manifest entries to existing files.
+
+    Args:
+        lib_root: Path to the library root
+        entries: Relative paths or glob patterns
+
+    Returns:
+        Absolute file paths in entry order, without duplicates
+    """
+    files = {}
+    for entry in entries:
+        path = os.path.normpath(os.path.join(lib_root, entry))
+        if any(char in entry for char in '*?['):
+            import glob
+            for match in sorted(glob.glob(path, recursive=True)):
+                if os.path.isfile(match):
+                    files[match] = None
+        elif os.path.isfile(path):
+            files[path] = None
+    return list(files)
+
+
+def load_library_manifest(lib_root) -> Optional[Dict[str, Optional[List[str]]]]:
+    """
+    Read the serializationlib section of a library's library.json.
+
+    Args:
+        lib_root: Path to the library root
+
+    Returns:
+        Dictionary with 'headers' and 'validation' (absolute paths, or None where the
+        key is missing), or None if the library declares no valid manifest
+    """
+    if not lib_root:
+        return None
+    lib_root = str(lib_root)
+    try:
+        with open(os.path.join(lib_root, MANIFEST_FILE_NAME), 'r', encoding='utf-8') as file:
+            text = file.read()
+    except (OSError, UnicodeDecodeError):
+        return None
+    if not MANIFEST_SECTION_PATTERN.search(text):
+        return None
+
+    import json
+    try:
+        section = json.loads(text).get(MANIFEST_SECTION)
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(section, dict):
+        return None
+
+    manifest = {}
+    for key in MANIFEST_KEYS:
+        entries = section.get(key)
+        if entries is None:
+            manifest[key] = None
+        elif isinstance(entries, list) and all(isinstance(entry, str) for entry in entries):
+            manifest[key] = expand_manifest_entries(lib_root, entries)
+        else:
+            # A malformed manifest falls back to scanning the whole library
+            return None
+    return manifest
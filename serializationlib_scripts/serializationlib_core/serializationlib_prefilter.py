@@ -0,0 +1,109 @@
+"""
+Byte-level prefilter for header files.
+
+Memory-maps each file and searches the raw bytes for live annotation markers
+before any file is decoded and parsed line by line. Files without a hit never
+reach the regex stages.
+"""
+
+from __future__ import annotations
+
+import mmap
+import re
+from typing import Iterable, List, Pattern, Tuple
+
+
+# Cheap anchors searched with mmap.find() before the confirming regex runs: at least
+# one of the ANCHORS and every one of the REQUIRED anchors must be present.
+SERIALIZABLE_ANCHORS = (b'Serializable', b'Entity', b'@serializationlib-begin')
+# "Validation Function" is matched case-insensitively, so the validation anchors are the
+# parts of a definition that are case-sensitive for the preprocessor or not cased at all
+VALIDATION_ANCHORS = ()
+VALIDATION_REQUIRED_ANCHORS = (b'#define', b'->')
+
+# Live (unprocessed) class/enum annotations: /* @Serializable */, /* Serializable */, /* @Entity */,
+# or a generated block whose code may need regenerating. Already processed markers
+# (/*--@Serializable--*/) alone do not match.
+SERIALIZABLE_PATTERN = re.compile(rb'/\*\s*@?(?:Serializable|Entity)\s*\*/|// @serializationlib-begin ')
+
+# Validation macro definitions: #define Name /* Validation Function -> Function */
+VALIDATION_PATTERN = re.compile(rb'(?-i:#define)\s+\w+\s+/\*\s*Validation\s+Function\s*->', re.IGNORECASE)
+
+
+def file_contains_marker(file_path: str, anchors: Tuple[bytes, ...], pattern: Pattern[bytes],
+                         required: Tuple[bytes, ...] = ()) -> bool:
+    """
+    Check whether a file contains a marker without decoding it.
+
+    Args:
+        file_path: Path to the file
+        anchors: Byte strings of which at least one must be present (empty to skip the check)
+        pattern: Compiled bytes regex confirming a live marker
+        required: Byte strings that must all be present
+
+    Returns:
+        True if the pattern matches, False otherwise (including empty or unreadable files)
+    """
+    try:
+        with open(file_path, 'rb') as file:
+            try:
+                data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped
+                return False
+            with data:
+                if anchors and all(data.find(anchor) == -1 for anchor in anchors):
+                    return False
+                if any(data.find(anchor) == -1 for anchor in required):
+                    return False
+                return pattern.search(data) is not None
+    except OSError:
+        return False
+
+
+def has_serializable_annotation(file_path: str) -> bool:
+    """
+    Check whether a file contains a live @Serializable, Serializable or @Entity annotation
+    or a generated block.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        True if the file should be parsed by the class and enum stages
+    """
+    return file_contains_marker(file_path, SERIALIZABLE_ANCHORS, SERIALIZABLE_PATTERN)
+
+
+def has_validation_macro(file_path: str) -> bool:
+    """
+    Check whether a file contains a validation macro definition.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        True if the file should be scanned for validation macros
+    """
+    return file_contains_marker(file_path, VALIDATION_ANCHORS, VALIDATION_PATTERN, VALIDATION_REQUIRED_ANCHORS)
+
+
+def prefilter_files(file_paths: Iterable[str], predicate=has_serializable_annotation) -> Tuple[List[str], int]:
+    """
+    Split a list of files into the ones worth parsing and a count of skipped ones.
+
+    Args:
+        file_paths: Files to check
+        predicate: Function returning True for files that must be parsed
+
+    Returns:
+        Tuple of (files to parse in input order, number of skipped files)
+    """
+    hits = []
+    skipped = 0
+    for file_path in file_paths:
+        if predicate(file_path):
+            hits.append(file_path)
+        else:
+            skipped += 1
+    return hits, skipped
@@ -0,0 +1,441 @@
+"""
+Opt-in instrumentation for the pre-build pipeline.
+
+Set SERIALIZATIONLIB_PROFILE=1 to record wall time per stage, counters and the
+number of regex evaluations made by each stage. At the end of a run the pipeline
+writes profile.json (summary) and trace.json (Chrome trace events, loadable in
+Perfetto or chrome://tracing) to SERIALIZATIONLIB_PROFILE_DIR, or to profile/
+next to the build ledger.
+
+SERIALIZATIONLIB_PROFILE takes a comma-separated list of options:
+    1            stage timings and counters
+    cprofile     also dump cProfile statistics of the main process to profile.pstats
+    tracemalloc  also record peak memory and the top allocation sites
+
+When profiling is off, stage() returns a shared no-op context manager and count()
+returns immediately.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import sys
+import time
+from _thread import get_ident
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    from serializationlib_ledger import default_ledger_dir
+except ImportError:
+    from serializationlib_core.serializationlib_ledger import default_ledger_dir
+
+
+# Bump when the report layout changes
+PROFILE_FORMAT = 1
+
+PROFILE_REPORT_NAME = 'profile.json'
+PROFILE_TRACE_NAME = 'trace.json'
+PROFILE_PSTATS_NAME = 'profile.pstats'
+
+# re functions and compiled pattern methods counted while profiling
+_REGEX_FUNCTIONS = ('search', 'match', 'fullmatch', 'sub', 'subn', 'split', 'findall', 'finditer')
+
+# Modules loaded from here are the pipeline's own; only their regexes are counted
+_SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+
+_NULL_STAGE = nullcontext()
+
+
+class _CountingPattern:
+    """Compiled pattern that reports every evaluation to a counter."""
+
+    __slots__ = ('_pattern', '_count')
+
+    def __init__(self, pattern, count):
+        self._pattern = pattern
+        self._count = count
+
+    def __getattr__(self, name):
+        attribute = getattr(self._pattern, name)
+        if name in _REGEX_FUNCTIONS:
+            self._count()
+        return attribute
+
+
+class _CountingRe:
+    """Stand-in for the re module in a pipeline module, counting evaluations."""
+
+    def __init__(self, count):
+        self._count = count
+
+    def __getattr__(self, name):
+        attribute = getattr(re, name)
+        if name in _REGEX_FUNCTIONS:
+            count = self._count
+
+            def counted(pattern, *args, **kwargs):
+                count()
+                if isinstance(pattern, _CountingPattern):
+                    pattern = pattern._pattern
+                return attribute(pattern, *args, **kwargs)
+            return counted
+        if name == 'compile':
+            return lambda *args, **kwargs: _CountingPattern(attribute(*args, **kwargs), self._count)
+        return attribute
+
+
+def parse_profile_options(value: Optional[str]) -> Optional[set]:
+    """
+    Parse the SERIALIZATIONLIB_PROFILE value.
+
+    Args:
+        value: Environment value (e.g., "1" or "cprofile,tracemalloc")
+
+    Returns:
+        Set of options, or None if profiling is off
+    """
+    if not value or value.strip().lower() in ('0', 'false', 'no', 'off'):
+        return None
+    return {option.strip().lower() for option in value.split(',') if option.strip()}
+
+
+class Profiler:
+    """
+    Stage timings, counters and trace events of one process.
+
+    Worker processes record into their own Profiler; drain() hands the data to the
+    parent, which merge()s it before writing the report.
+    """
+
+    def __init__(self, options: Optional[set] = None):
+        """
+        Args:
+            options: Options from parse_profile_options (None = disabled)
+        """
+        self.options = options or set()
+        self.enabled = options is not None
+        self.pid = os.getpid()
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.events: List[dict] = []
+        self._stack: List[str] = []
+        self._started_ns = None
+        self._cprofile = None
+        # (module globals, name, original) of every regex global replaced while counting
+        self._regex_originals = None
+        self._instrumented_modules = set()
+        self._seen_module_count = 0
+        self._tracemalloc_started = False
+
+    @classmethod
+    def from_environment(cls) -> 'Profiler':
+        """Create a Profiler configured by SERIALIZATIONLIB_PROFILE."""
+        return cls(parse_profile_options(os.environ.get('SERIALIZATIONLIB_PROFILE')))
+
+    def stage(self, name: str, file_path: Optional[str] = None):
+        """
+        Time a stage.
+
+        Args:
+            name: Stage name (e.g., "S1")
+            file_path: Optional file the stage works on, recorded in the trace event
+
+        Returns:
+            Context manager
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        return self._stage(name, file_path)
+
+    @contextmanager
+    def _stage(self, name: str, file_path: Optional[str]):
+        if self._regex_originals is not None:
+            self._instrument_new_modules()
+        self._stack.append(name)
+        start_ns = time.perf_counter_ns()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = repr(e)
+            raise
+        finally:
+            duration_ns = time.perf_counter_ns() - start_ns
+            self._stack.pop()
+            stats = self.stages.setdefault(name, {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'regex_evaluations': 0})
+            stats['calls'] += 1
+            stats['total_ms'] += duration_ns / 1e6
+            stats['max_ms'] = max(stats['max_ms'], duration_ns / 1e6)
+            event = {
+                'name': name,
+                'cat': 'stage',
+                'ph': 'X',
+                'ts': start_ns / 1000,
+                'dur': duration_ns / 1000,
+                'pid': self.pid,
+                'tid': get_ident(),
+            }
+            args = {}
+            if file_path:
+                args['file'] = file_path
+            if error:
+                args['error'] = error
+            if args:
+                event['args'] = args
+            self.events.append(event)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """
+        Add to a counter.
+
+        Args:
+            name: Counter name
+            amount: Amount to add
+        """
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def start(self) -> None:
+        """Start the run clock, the regex counter and the optional cProfile/tracemalloc collection."""
+        if not self.enabled:
+            return
+        # Each run of a long-lived Pipeline gets its own report
+        self.reset()
+        self._started_ns = time.perf_counter_ns()
+        self.install_regex_counter()
+        if 'tracemalloc' in self.options:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(10)
+                self._tracemalloc_started = True
+        if 'cprofile' in self.options:
+            import cProfile
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def install_regex_counter(self) -> None:
+        """
+        Count regex evaluations of the pipeline's own modules, attributed to the innermost stage.
+
+        Only modules loaded from the scripts directory are instrumented: their "re" global
+        and their module-level compiled patterns are replaced by counting wrappers. The re
+        module itself is left alone, so SCons and other extra scripts are not affected.
+        Modules imported later (e.g., stage modules loaded on first use) are instrumented
+        when the next stage starts.
+        """
+        if not self.enabled or self._regex_originals is not None:
+            return
+        self._regex_originals = []
+        self._instrumented_modules = set()
+        self._instrument_new_modules()
+
+    def _instrument_new_modules(self) -> None:
+        if len(sys.modules) == self._seen_module_count:
+            return
+        self._seen_module_count = len(sys.modules)
+        for module_name, module in list(sys.modules.items()):
+            if module_name in self._instrumented_modules or module_name == __name__:
+                continue
+            module_file = getattr(module, '__file__', None)
+            if not module_file or not os.path.abspath(module_file).startswith(_SCRIPTS_DIR):
+                continue
+            self._instrumented_modules.add(module_name)
+            namespace = vars(module)
+            for name, value in list(namespace.items()):
+                if value is re:
+                    wrapper = _CountingRe(self._count_regex)
+                elif isinstance(value, re.Pattern):
+                    wrapper = _CountingPattern(value, self._count_regex)
+                else:
+                    continue
+                self._regex_originals.append((namespace, name, value))
+                namespace[name] = wrapper
+
+    def uninstall_regex_counter(self) -> None:
+        """Restore the globals replaced by install_regex_counter()."""
+        if self._regex_originals is None:
+            return
+        for namespace, name, original in self._regex_originals:
+            namespace[name] = original
+        self._regex_originals = None
+        self._seen_module_count = 0
+
+    def _count_regex(self) -> None:
+        self.counters['regex_evaluations'] = self.counters.get('regex_evaluations', 0) + 1
+        if self._stack:
+            stats = self.stages.get(self._stack[-1])
+            if stats is None:
+                self.stages[self._stack[-1]] = stats = {
+                    'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'regex_evaluations': 0
+                }
+            stats['regex_evaluations'] += 1
+
+    def reset(self) -> None:
+        """Drop everything recorded so far (used at the start of a worker task)."""
+        self.pid = os.getpid()
+        self.stages = {}
+        self.counters = {}
+        self.events = []
+
+    def drain(self) -> Optional[dict]:
+        """
+        Return and clear the data recorded in this process.
+
+        Returns:
+            Dictionary with 'stages', 'counters' and 'events', or None if disabled
+        """
+        if not self.enabled:
+            return None
+        data = {'stages': self.stages, 'counters': self.counters, 'events': self.events}
+        self.reset()
+        return data
+
+    def merge(self, data: Optional[dict]) -> None:
+        """
+        Add the data drained from a worker process.
+
+        Args:
+            data: Result of drain() in the worker
+        """
+        if not self.enabled or not data:
+            return
+        for name, stats in data['stages'].items():
+            total = self.stages.setdefault(name, {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'regex_evaluations': 0})
+            total['calls'] += stats['calls']
+            total['total_ms'] += stats['total_ms']
+            total['max_ms'] = max(total['max_ms'], stats['max_ms'])
+            total['regex_evaluations'] += stats['regex_evaluations']
+        for name, value in data['counters'].items():
+            self.counters[name] = self.counters.get(name, 0) + value
+        self.events.extend(data['events'])
+
+    def finish(self, output_dir, extra: Optional[dict] = None) -> Optional[str]:
+        """
+        Stop collection and write profile.json, trace.json and the optional dumps.
+
+        Args:
+            output_dir: Directory for the files
+            extra: Additional report fields (e.g., scan counters)
+
+        Returns:
+            Path to profile.json, or None if disabled or it cannot be written
+        """
+        if not self.enabled:
+            return None
+        import json
+        wall_ms = (time.perf_counter_ns() - self._started_ns) / 1e6 if self._started_ns else None
+        self.uninstall_regex_counter()
+
+        output_path = Path(output_dir)
+        try:
+            output_path.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            return None
+
+        report = {
+            'format': PROFILE_FORMAT,
+            'wall_time_ms': wall_ms,
+            'stages': {name: self.stages[name] for name in sorted(self.stages)},
+            'counters': dict(sorted(self.counters.items())),
+            'files': {'trace': str(output_path / PROFILE_TRACE_NAME)},
+        }
+        if extra:
+            report.update(extra)
+
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            pstats_path = output_path / PROFILE_PSTATS_NAME
+            try:
+                self._cprofile.dump_stats(str(pstats_path))
+                report['files']['cprofile'] = str(pstats_path)
+            except OSError:
+                pass
+            self._cprofile = None
+
+        if 'tracemalloc' in self.options:
+            report['tracemalloc'] = self._tracemalloc_report()
+
+        trace = {
+            'traceEvents': self._process_names() + sorted(self.events, key=lambda event: event['ts']),
+            'displayTimeUnit': 'ms',
+        }
+        try:
+            with open(output_path / PROFILE_TRACE_NAME, 'w', encoding='utf-8') as file:
+                json.dump(trace, file)
+            with open(output_path / PROFILE_REPORT_NAME, 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2)
+                file.write('\n')
+        except OSError:
+            return None
+        return str(output_path / PROFILE_REPORT_NAME)
+
+    def _tracemalloc_report(self, limit: int = 20) -> dict:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            return {}
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        top = []
+        for statistic in snapshot.statistics('lineno')[:limit]:
+            frame = statistic.traceback[0]
+            top.append({
+                'location': f'{frame.filename}:{frame.lineno}',
+                'size_bytes': statistic.size,
+                'count': statistic.count,
+            })
+        if self._tracemalloc_started:
+            tracemalloc.stop()
+            self._tracemalloc_started = False
+        return {'current_bytes': current, 'peak_bytes': peak, 'top': top}
+
+    def _process_names(self) -> List[dict]:
+        names = []
+        for pid in sorted({event['pid'] for event in self.events} | {self.pid}):
+            names.append({
+                'name': 'process_name',
+                'ph': 'M',
+                'pid': pid,
+                'args': {'name': 'serializationlib' if pid == self.pid else f'serializationlib worker {pid}'},
+            })
+        return names
+
+
+def default_profile_dir(project_dir) -> Optional[Path]:
+    """
+    Choose where profile files are written.
+
+    SERIALIZATIONLIB_PROFILE_DIR overrides the location. Otherwise profile/ next to
+    the build ledger.
+
+    Args:
+        project_dir: Path to the client project root
+
+    Returns:
+        Directory for the profile files, or None if there is no project
+    """
+    override = os.environ.get('SERIALIZATIONLIB_PROFILE_DIR')
+    if override:
+        return Path(override)
+    ledger_dir = default_ledger_dir(project_dir)
+    if ledger_dir is None:
+        return None
+    return ledger_dir / 'profile'
+
+
+_profiler = None
+
+
+def get_profiler() -> Profiler:
+    """
+    Return the Profiler of this process, created from the environment on first use.
+
+    Returns:
+        Profiler (disabled unless SERIALIZATIONLIB_PROFILE is set)
+    """
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler.from_environment()
+    return _profiler
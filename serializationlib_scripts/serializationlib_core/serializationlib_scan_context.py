@@ -0,0 +1,628 @@
+"""
+Shared scan state for one pre-build run.
+
+A ScanContext is built once by execute_scripts and handed to every stage, so the
+project and library trees are walked once and each header is read at most once
+until it is modified. With a BuildLedger attached, headers whose fingerprint is
+unchanged since the previous run are skipped without being opened, and libraries
+recorded without annotations are not walked until their fingerprint changes. With an
+IncludeGraph attached, library headers the build never includes are not scanned.
+"""
+
+from __future__ import annotations
+
+import io
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+
+# The annotation scanner, generated block, tokenizer and class index modules are imported
+# where an annotated header is parsed, so a run without changes never loads them
+try:
+    from serializationlib_generated_files import GENERATED_SUFFIX, check_generated_file_owner
+    from serializationlib_get_client_files import get_client_files
+    from serializationlib_ledger import fingerprint_library, library_manifest_hash
+    from serializationlib_library_manifest import load_library_manifest
+    from serializationlib_prefilter import has_serializable_annotation, has_validation_macro, prefilter_files
+    from serializationlib_profiler import get_profiler
+except ImportError:
+    from serializationlib_core.serializationlib_generated_files import GENERATED_SUFFIX, check_generated_file_owner
+    from serializationlib_core.serializationlib_get_client_files import get_client_files
+    from serializationlib_core.serializationlib_ledger import fingerprint_library, library_manifest_hash
+    from serializationlib_core.serializationlib_library_manifest import load_library_manifest
+    from serializationlib_core.serializationlib_prefilter import (
+        has_serializable_annotation, has_validation_macro, prefilter_files
+    )
+    from serializationlib_core.serializationlib_profiler import get_profiler
+
+if TYPE_CHECKING:
+    try:
+        from serializationlib_class_index import ClassIndex
+        from serializationlib_tokenizer import HeaderTokens
+    except ImportError:
+        from serializationlib_core.serializationlib_class_index import ClassIndex
+        from serializationlib_core.serializationlib_tokenizer import HeaderTokens
+
+
+# Header extensions processed by the serializer stages
+HEADER_EXTENSIONS = ('.h', '.hpp')
+
+# Counters a worker process reports back to the parent ScanContext
+READ_COUNTERS = ('files_read', 'bytes_read', 'content_cache_hits')
+
+
+def discover_all_libraries(project_dir) -> List[Path]:
+    """
+    Discover all library directories in build/_deps/ (CMake) and .pio/libdeps/ (PlatformIO).
+
+    Args:
+        project_dir: Path to the project root directory
+
+    Returns:
+        List of Path objects pointing to library source directories
+    """
+    libraries = []
+    seen_libraries = set()  # Track seen libraries to avoid duplicates
+
+    if not project_dir:
+        return libraries
+
+    project_path = Path(project_dir).resolve()
+
+    # Check CMake FetchContent location: build/_deps/
+    build_deps = project_path / "build" / "_deps"
+
+    if build_deps.exists() and build_deps.is_dir():
+        for lib_dir in build_deps.iterdir():
+            if lib_dir.is_dir() and not lib_dir.name.startswith("."):
+                lib_name = lib_dir.name
+
+                # Include -src directories (source libraries)
+                if lib_name.endswith("-src"):
+                    lib_root = lib_dir.resolve()
+                    lib_path_str = str(lib_root)
+                    if lib_path_str not in seen_libraries:
+                        seen_libraries.add(lib_path_str)
+                        libraries.append(lib_root)
+                # Also check if it's a library with src/ directory (like arduino-core-src)
+                elif (lib_dir / "src").exists() and (lib_dir / "src").is_dir():
+                    lib_root = lib_dir.resolve()
+                    lib_path_str = str(lib_root)
+                    if lib_path_str not in seen_libraries:
+                        seen_libraries.add(lib_path_str)
+                        libraries.append(lib_root)
+
+    # Check PlatformIO library location: .pio/libdeps/
+    pio_libdeps = project_path / ".pio" / "libdeps"
+
+    if pio_libdeps.exists() and pio_libdeps.is_dir():
+        # Iterate through environment directories (e.g., esp32dev, native, etc.)
+        for env_dir in pio_libdeps.iterdir():
+            if env_dir.is_dir():
+                # Iterate through libraries in this environment
+                for lib_dir in env_dir.iterdir():
+                    if lib_dir.is_dir():
+                        lib_root = lib_dir.resolve()
+                        lib_path_str = str(lib_root)
+
+                        # Check if this library has a src/ directory
+                        if (lib_root / "src").exists() and (lib_root / "src").is_dir():
+                            if lib_path_str not in seen_libraries:
+                                seen_libraries.add(lib_path_str)
+                                libraries.append(lib_root)
+
+    return libraries
+
+
+class ScanContext:
+    """
+    File lists, stat results and file contents shared by all pipeline stages.
+
+    File lists are computed lazily on first use and then reused. Contents are
+    cached per path; callers that modify a file must call invalidate() so the
+    next read sees the new content.
+    """
+
+    def __init__(self, project_dir=None, library_dir=None, ledger=None, validation_cache=None,
+                 include_graph=None):
+        """
+        Args:
+            project_dir: Path to the client project root (where platformio.ini is)
+            library_dir: Path to the serializationlib library root
+            ledger: Optional BuildLedger used to skip headers unchanged since the last run
+            validation_cache: Optional ValidationMacroCache used to skip validation sources
+                unchanged since the last run
+            include_graph: Optional IncludeGraph restricting library headers to those
+                reachable from the compilation database
+        """
+        self.project_dir = str(project_dir) if project_dir else None
+        self.library_dir = str(library_dir) if library_dir else None
+        self.ledger = ledger
+        self.validation_cache = validation_cache
+        self.include_graph = include_graph
+        self._unchanged_files = set()
+        # Headers whose processing failed; they are not recorded, so the next run retries them
+        self._failed_files = set()
+        self._prefiltered_files = set()
+        # library root -> (fingerprint, headers) for libraries not yet recorded at their fingerprint
+        self._unrecorded_libraries: Dict[str, tuple] = {}
+        self._outputs: Dict[str, List[str]] = {}
+        # Header producing each generated file, for claim_outputs
+        self._output_owners: Optional[Dict[str, str]] = None
+        self._libraries = None
+        self._project_files = None
+        self._dependency_files = None
+        self._library_copies: Dict[str, str] = {}
+        self._declared_validation_files: List[str] = []
+        self._library_files = None
+        self._annotated_files = None
+        self._stats: Dict[str, Optional[os.stat_result]] = {}
+        self._contents: Dict[str, str] = {}
+        self._source_lines: Dict[str, List[str]] = {}
+        self._annotation_events: Dict[str, list] = {}
+        self._header_tokens: Dict[str, HeaderTokens] = {}
+        self._class_indexes: Dict[str, ClassIndex] = {}
+        self.counters: Dict[str, int] = {
+            'headers_unchanged': 0,
+            'headers_unreachable': 0,
+            'libraries_skipped': 0,
+            'libraries_declared': 0,
+            'headers_scanned': 0,
+            'headers_skipped': 0,
+            'headers_parsed': 0,
+            'headers_deduplicated': 0,
+            'validation_files_unchanged': 0,
+            'validation_files_scanned': 0,
+            'validation_files_skipped': 0,
+            'validation_files_parsed': 0,
+            'generated_files_written': 0,
+            'generated_files_unchanged': 0,
+            'files_read': 0,
+            'bytes_read': 0,
+            'content_cache_hits': 0,
+        }
+
+    @property
+    def libraries(self) -> List[Path]:
+        """Library roots discovered in build/_deps/ and .pio/libdeps/."""
+        if self._libraries is None:
+            self._libraries = discover_all_libraries(self.project_dir)
+        return self._libraries
+
+    @property
+    def project_files(self) -> List[str]:
+        """Header files in the client project, excluding build and library directories."""
+        if self._project_files is None:
+            self._project_files = []
+            if self.project_dir:
+                try:
+                    self._project_files = get_client_files(self.project_dir, file_extensions=HEADER_EXTENSIONS)
+                except Exception:
+                    pass
+        return self._project_files
+
+    @property
+    def dependency_files(self) -> List[str]:
+        """
+        Header files in every discovered library (only reachable ones with an include graph).
+
+        Libraries the ledger recorded without annotations or validation macros at their
+        current fingerprint are left out without their headers being opened, and libraries with a manifest in their
+        library.json contribute only the headers they declare.
+        """
+        if self._dependency_files is None:
+            self._list_dependency_files()
+        return self._dependency_files
+
+    def _list_dependency_files(self) -> None:
+        self._dependency_files = []
+        library_headers = []
+        for lib_dir in self.libraries:
+            lib_root = str(lib_dir)
+            manifest = load_library_manifest(lib_root)
+            if manifest is not None:
+                self.counters['libraries_declared'] += 1
+                # Declared validation headers count even when the library has no annotations
+                self._declared_validation_files.extend(manifest['validation'] or ())
+            fingerprint = None
+            if self.ledger is not None:
+                fingerprint = fingerprint_library(lib_root)
+                if self.ledger.is_quiet_library(lib_root, fingerprint):
+                    self.counters['libraries_skipped'] += 1
+                    continue
+            if manifest is not None and manifest['headers'] is not None:
+                lib_files = manifest['headers']
+            else:
+                try:
+                    lib_files = get_client_files(lib_root, skip_exclusions=True, file_extensions=HEADER_EXTENSIONS)
+                except Exception:
+                    continue
+            if self.ledger is not None and not self.ledger.knows_library(lib_root, fingerprint):
+                self._unrecorded_libraries[lib_root] = (fingerprint, lib_files)
+            library_headers.append((lib_root, lib_files))
+            self._dependency_files.extend(lib_files)
+        self._find_library_copies(library_headers)
+        if self.include_graph is not None and self._dependency_files:
+            self._dependency_files = self._reachable_only(self._dependency_files)
+
+    @property
+    def library_copies(self) -> Dict[str, str]:
+        """
+        Headers of duplicate library copies mapped to the same header in the first copy.
+
+        PlatformIO installs a library once per environment; copies with equal
+        manifests and header listings are grouped, so only one of them is parsed.
+        """
+        if self._dependency_files is None:
+            self._list_dependency_files()
+        return self._library_copies
+
+    def _find_library_copies(self, library_headers: List[tuple]) -> None:
+        representatives = {}
+        for lib_root, lib_files in library_headers:
+            if not lib_files:
+                continue
+            key = library_manifest_hash(lib_root, lib_files)
+            if key is None:
+                continue
+            representative = representatives.setdefault(key, lib_root)
+            if representative == lib_root:
+                continue
+            for file_path in lib_files:
+                self._library_copies[file_path] = os.path.join(
+                    representative, os.path.relpath(file_path, lib_root)
+                )
+
+    def _reachable_only(self, file_paths: List[str]) -> List[str]:
+        # Project headers are always scanned, so a stale database cannot hide the project's own DTOs
+        with get_profiler().stage('include graph'):
+            roots = [self.project_dir] + [str(lib_dir) for lib_dir in self.libraries]
+            try:
+                reachable = self.include_graph.reachable_files(roots)
+            except Exception:
+                reachable = None
+            if reachable is None:
+                return file_paths
+            kept = [file_path for file_path in file_paths if self.include_graph.real_path(file_path) in reachable]
+        self.counters['headers_unreachable'] += len(file_paths) - len(kept)
+        return kept
+
+    @property
+    def library_files(self) -> List[str]:
+        """Header files in the serializationlib library directory itself (or those its manifest declares)."""
+        if self._library_files is None:
+            self._library_files = []
+            manifest = load_library_manifest(self.library_dir)
+            if manifest is not None and manifest['validation'] is not None:
+                self._library_files = manifest['validation']
+            elif self.library_dir:
+                try:
+                    self._library_files = get_client_files(
+                        self.library_dir, skip_exclusions=True, file_extensions=HEADER_EXTENSIONS
+                    )
+                except Exception:
+                    pass
+        return self._library_files
+
+    @property
+    def header_files(self) -> List[str]:
+        """Headers processed for @Serializable classes and enums (project, then libraries)."""
+        return self.project_files + self.dependency_files
+
+    @property
+    def validation_source_files(self) -> List[str]:
+        """
+        Headers scanned for validation macro definitions (project, then library, then the
+        validation headers declared by dependency manifests).
+        """
+        if self._dependency_files is None:
+            self._list_dependency_files()
+        source_files = self.project_files + self.library_files
+        if self._declared_validation_files:
+            source_files = list(dict.fromkeys(source_files + self._declared_validation_files))
+        return source_files
+
+    @property
+    def annotated_header_files(self) -> List[str]:
+        """Entries of header_files that changed since the last run and contain a live annotation."""
+        if self._annotated_files is None:
+            profiler = get_profiler()
+            with profiler.stage('discovery'):
+                candidates = self.header_files
+            with profiler.stage('prefilter'):
+                if self.ledger is not None:
+                    changed = []
+                    for file_path in candidates:
+                        if self.ledger.is_unchanged(file_path, self.stat(file_path)):
+                            self._unchanged_files.add(file_path)
+                        else:
+                            changed.append(file_path)
+                    self.counters['headers_unchanged'] += len(candidates) - len(changed)
+                    candidates = changed
+                self._prefiltered_files.update(candidates)
+                self._annotated_files, skipped = prefilter_files(candidates, has_serializable_annotation)
+            self.counters['headers_scanned'] += len(candidates)
+            self.counters['headers_skipped'] += skipped
+            self.counters['headers_parsed'] += len(self._annotated_files)
+        return self._annotated_files
+
+    def add_output(self, file_path: str, output_path: str) -> None:
+        """
+        Register a generated file that belongs to a header.
+
+        The ledger only skips the header on later runs while all its outputs exist.
+
+        Args:
+            file_path: Path to the source header
+            output_path: Path to the generated file
+        """
+        self._outputs.setdefault(file_path, []).append(str(output_path))
+
+    def mark_failed(self, file_path: str) -> None:
+        """
+        Register a header whose processing failed.
+
+        Its ledger entry is dropped, so the next run processes it again, and the
+        generated files of its previous run are kept.
+
+        Args:
+            file_path: Path to the source header
+        """
+        self._failed_files.add(file_path)
+
+    def claim_outputs(self, file_path: str, output_paths: Iterable[str]) -> None:
+        """
+        Check that no other header produces the generated files of a header.
+
+        Files recorded in the ledger for headers skipped as unchanged stay claimed by
+        those headers. A duplicate library copy claims for its first copy, whose
+        files it shares.
+
+        Args:
+            file_path: Path to the source header
+            output_paths: Paths to its generated files
+
+        Raises:
+            ValueError: If another header produces one of the files
+        """
+        if self._output_owners is None:
+            self._output_owners = {}
+            if self.ledger is not None:
+                for unchanged_path in sorted(self._unchanged_files):
+                    for output_path in self.ledger.outputs(unchanged_path):
+                        check_generated_file_owner(self._output_owners, output_path,
+                                                   self.library_copies.get(unchanged_path, unchanged_path))
+        owner = self.library_copies.get(file_path, file_path)
+        for output_path in output_paths:
+            check_generated_file_owner(self._output_owners, str(output_path), owner)
+
+    def commit_ledger(self) -> bool:
+        """
+        Record fingerprints for every header that was not skipped and save the ledger,
+        the validation macro cache and the include graph cache. Generated files that
+        no header produces any more are removed. Headers marked failed are left out,
+        so the next run processes them again.
+
+        Call this only after the run completed; headers written during the run are
+        fingerprinted in their final state.
+
+        Returns:
+            True if everything was saved (or there is nothing to save), False on error
+        """
+        saved = True
+        if self.validation_cache is not None:
+            saved = self.validation_cache.save()
+        if self.include_graph is not None:
+            saved = self.include_graph.save() and saved
+        if self.ledger is None:
+            return saved
+        header_files = self.header_files
+        self._remove_stale_outputs()
+        for file_path in header_files:
+            if file_path in self._unchanged_files or file_path in self._failed_files:
+                continue
+            self._stats.pop(file_path, None)
+            self.ledger.record(file_path, self.stat(file_path), self._outputs.get(file_path, ()))
+        self.ledger.retain_only(file_path for file_path in header_files if file_path not in self._failed_files)
+        self._record_libraries()
+        return self.ledger.save() and saved
+
+    def _record_libraries(self) -> None:
+        # Headers the prefilter did not see this run (unchanged or unreachable) are checked here,
+        # once per library fingerprint
+        annotated = set(self._annotated_files or ())
+        for lib_root, (fingerprint, lib_files) in self._unrecorded_libraries.items():
+            # Validation macro definitions count too, so a library that only defines macros
+            # keeps being listed and scanned
+            quiet = not any(
+                file_path in annotated
+                or (file_path not in self._prefiltered_files and has_serializable_annotation(file_path))
+                or has_validation_macro(file_path)
+                for file_path in lib_files
+            )
+            self.ledger.record_library(lib_root, fingerprint, quiet)
+        self.ledger.retain_libraries(str(lib_dir) for lib_dir in self.libraries)
+
+    def _remove_stale_outputs(self) -> None:
+        # Generated files recorded for a re-processed or deleted header that no header produces any more
+        claimed = set()
+        previous = set()
+        for file_path in self.ledger.entries:
+            if file_path in self._unchanged_files or file_path in self._failed_files:
+                claimed.update(self.ledger.outputs(file_path))
+            else:
+                previous.update(self.ledger.outputs(file_path))
+        for outputs in self._outputs.values():
+            claimed.update(outputs)
+        for output_path in previous - claimed:
+            if output_path.endswith(GENERATED_SUFFIX):
+                try:
+                    os.remove(output_path)
+                except OSError:
+                    pass
+
+    def report(self) -> Dict[str, int]:
+        """
+        Return the run counters (files scanned, skipped by the prefilter and parsed).
+
+        Returns:
+            Dictionary of counter name to value
+        """
+        return dict(self.counters)
+
+    def stat(self, file_path: str) -> Optional[os.stat_result]:
+        """
+        Return the cached os.stat result for a file.
+
+        Args:
+            file_path: Path to the file
+
+        Returns:
+            os.stat_result, or None if the file does not exist
+        """
+        if file_path not in self._stats:
+            try:
+                self._stats[file_path] = os.stat(file_path)
+            except OSError:
+                self._stats[file_path] = None
+        return self._stats[file_path]
+
+    def exists(self, file_path: str) -> bool:
+        """Return True if the file exists (using the cached stat result)."""
+        return self.stat(file_path) is not None
+
+    def read_text(self, file_path: str) -> str:
+        """
+        Return the cached UTF-8 content of a file, reading it on first use.
+
+        Args:
+            file_path: Path to the file
+
+        Returns:
+            File content
+
+        Raises:
+            OSError, UnicodeDecodeError: If the file cannot be read
+        """
+        content = self._contents.get(file_path)
+        if content is None:
+            with open(file_path, 'r', encoding='utf-8') as file:
+                content = file.read()
+                self.counters['bytes_read'] += os.fstat(file.fileno()).st_size
+            self.counters['files_read'] += 1
+            self._contents[file_path] = content
+        else:
+            self.counters['content_cache_hits'] += 1
+        return content
+
+    def read_lines(self, file_path: str) -> List[str]:
+        """
+        Return the cached content of a file as a list of lines (like readlines()).
+
+        Args:
+            file_path: Path to the file
+
+        Returns:
+            List of lines including line endings
+        """
+        return io.StringIO(self.read_text(file_path)).readlines()
+
+    def read_source_lines(self, file_path: str) -> List[str]:
+        """
+        Return the cached lines of a file with generated blocks blanked out.
+
+        This is what the user wrote; line numbers match read_lines().
+
+        Args:
+            file_path: Path to the file
+
+        Returns:
+            List of lines including line endings
+        """
+        lines = self._source_lines.get(file_path)
+        if lines is None:
+            try:
+                from serializationlib_generated_blocks import blank_generated_blocks
+            except ImportError:
+                from serializationlib_core.serializationlib_generated_blocks import blank_generated_blocks
+            lines = blank_generated_blocks(self.read_lines(file_path))
+            self._source_lines[file_path] = lines
+        return lines
+
+    def annotation_events(self, file_path: str) -> list:
+        """
+        Return the cached annotation scanner events of a file's source lines.
+
+        Every detection stage consumes the same list, so each header is scanned once.
+
+        Args:
+            file_path: Path to the file
+
+        Returns:
+            List of AnnotationEvent in text order
+        """
+        events = self._annotation_events.get(file_path)
+        if events is None:
+            try:
+                from serializationlib_annotation_scanner import scan_annotations
+            except ImportError:
+                from serializationlib_core.serializationlib_annotation_scanner import scan_annotations
+            events = scan_annotations(self.read_source_lines(file_path))
+            self._annotation_events[file_path] = events
+        return events
+
+    def header_tokens(self, file_path: str) -> HeaderTokens:
+        """
+        Return the cached token stream of a file's source lines.
+
+        Class boundaries, fields and enum values are all found in this one tokenization.
+
+        Args:
+            file_path: Path to the file
+
+        Returns:
+            HeaderTokens of read_source_lines()
+        """
+        tokens = self._header_tokens.get(file_path)
+        if tokens is None:
+            try:
+                from serializationlib_tokenizer import HeaderTokens
+            except ImportError:
+                from serializationlib_core.serializationlib_tokenizer import HeaderTokens
+            tokens = HeaderTokens(self.read_source_lines(file_path))
+            self._header_tokens[file_path] = tokens
+        return tokens
+
+    def class_index(self, file_path: str) -> ClassIndex:
+        """
+        Return the cached class index of a file.
+
+        Args:
+            file_path: Path to the file
+
+        Returns:
+            ClassIndex of header_tokens()
+        """
+        class_index = self._class_indexes.get(file_path)
+        if class_index is None:
+            try:
+                from serializationlib_class_index import ClassIndex
+            except ImportError:
+                from serializationlib_core.serializationlib_class_index import ClassIndex
+            class_index = ClassIndex(self.header_tokens(file_path))
+            self._class_indexes[file_path] = class_index
+        return class_index
+
+    def invalidate(self, file_path: str) -> None:
+        """
+        Drop cached stat and content for a file after it has been modified.
+
+        Args:
+            file_path: Path to the file
+        """
+        self._stats.pop(file_path, None)
+        self._contents.pop(file_path, None)
+        self._source_lines.pop(file_path, None)
+        self._annotation_events.pop(file_path, None)
+        self._header_tokens.pop(file_path, None)
+        self._class_indexes.pop(file_path, None)
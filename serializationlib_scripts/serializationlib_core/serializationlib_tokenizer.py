@@ -0,0 +1,243 @@
+"""
+Single-pass tokenizer for C++ headers.
+
+One re.finditer over the text finds the tokens that decide what is code:
+comments, string and character literals (including raw strings), preprocessor
+directives, and the { } ; that delimit declarations and bodies. Token kinds and
+offsets are held in arrays. Identifiers, types and operators between the tokens
+are read from the text, so a brace in a string or a comment, or a class name in
+a commented-out block, is never taken for code.
+
+Every pattern branch starts with a fixed character, which lets the regex engine
+skip straight to candidates instead of trying each branch at every position.
+"""
+
+from __future__ import annotations
+
+import bisect
+import itertools
+import re
+from array import array
+from typing import Dict, List, Optional, Pattern, Tuple
+
+
+# Token kinds; the ones below OPEN_BRACE are opaque (their text is not code)
+COMMENT = 1
+LITERAL = 2
+DIRECTIVE = 3
+OPEN_BRACE = 4
+CLOSE_BRACE = 5
+SEMICOLON = 6
+
+# The text is scanned with a newline prepended, so directives start at a newline like every other line
+TOKEN_PATTERN = re.compile(r'''
+      /\*.*?(?:\*/|\Z)                      # block comment (unterminated: to the end)
+    | //(?:\\\n|[^\n])*                     # line comment, including continuation lines
+    | R"([^()\\\s]{0,16})\(.*?\)\1"         # raw string literal
+    | "(?:\\.|[^"\\\n])*"                   # string literal
+    | '(?<![0-9A-Fa-f]')(?:\\.|[^'\\\n])*'  # character literal (not a digit separator)
+    | \n[ \t]*\#(?:\\\n|/\*.*?\*/|[^\n])*   # preprocessor directive
+    | [{};]
+''', re.DOTALL | re.VERBOSE)
+
+TOKEN_KINDS = {
+    '/': COMMENT,
+    'R': LITERAL,
+    '"': LITERAL,
+    "'": LITERAL,
+    '\n': DIRECTIVE,
+    '{': OPEN_BRACE,
+    '}': CLOSE_BRACE,
+    ';': SEMICOLON
+}
+
+
+class HeaderTokens:
+    """
+    Token stream of one header.
+
+    kinds, starts and ends are parallel arrays; offsets refer to ''.join(lines).
+    """
+
+    def __init__(self, lines: List[str]):
+        """
+        Args:
+            lines: File content as a list of lines (e.g., from ScanContext.read_source_lines)
+        """
+        self.lines = lines
+        self.text = ''.join(lines)
+        self.line_offsets = [0]
+        self.line_offsets.extend(itertools.accumulate(map(len, lines)))
+        self.kinds = array('B')
+        self.starts = array('l')
+        self.ends = array('l')
+        self._matches: Dict[int, Optional[int]] = {}
+
+        scanned = '\n' + self.text
+        for match in TOKEN_PATTERN.finditer(scanned):
+            start, end = match.span()
+            kind = TOKEN_KINDS[scanned[start]]
+            self.kinds.append(kind)
+            # The directive's leading newline belongs to the previous line
+            self.starts.append(start if kind == DIRECTIVE else start - 1)
+            self.ends.append(end - 1)
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def line_of(self, offset: int) -> int:
+        """
+        Return the line number (1-based) containing an offset.
+
+        Args:
+            offset: Offset in the text
+
+        Returns:
+            Line number
+        """
+        return bisect.bisect_right(self.line_offsets, offset)
+
+    def offset_of_line(self, line_number: int) -> int:
+        """
+        Return the offset of the start of a line.
+
+        Args:
+            line_number: Line number (1-based); len(lines) + 1 is the end of the text
+
+        Returns:
+            Offset in the text
+        """
+        return self.line_offsets[min(max(line_number, 1), len(self.line_offsets)) - 1]
+
+    def is_code(self, offset: int) -> bool:
+        """
+        Check whether an offset is outside comments, literals and directives.
+
+        Args:
+            offset: Offset in the text
+
+        Returns:
+            True if the character at the offset is code
+        """
+        index = bisect.bisect_right(self.starts, offset) - 1
+        return index < 0 or self.kinds[index] >= OPEN_BRACE or offset >= self.ends[index]
+
+    def matching_brace(self, index: int) -> Optional[int]:
+        """
+        Return the index of the brace closing an opening brace.
+
+        Args:
+            index: Index of an OPEN_BRACE token
+
+        Returns:
+            Index of the matching CLOSE_BRACE token, or None if the brace is never closed
+        """
+        if index not in self._matches:
+            kinds = self.kinds
+            depth = 0
+            match = None
+            for position in range(index, len(kinds)):
+                kind = kinds[position]
+                if kind == OPEN_BRACE:
+                    depth += 1
+                elif kind == CLOSE_BRACE:
+                    depth -= 1
+                    if depth == 0:
+                        match = position
+                        break
+            self._matches[index] = match
+        return self._matches[index]
+
+    def find_body(self, pattern: Pattern[str], start_offset: int = 0,
+                  name: Optional[str] = None) -> Optional[Tuple[re.Match, int, int]]:
+        """
+        Find the first declaration matching a pattern that has a body.
+
+        Matches in comments, literals and directives are ignored, and so are
+        declarations ending at a ; before any { (e.g., forward declarations).
+
+        Args:
+            pattern: Compiled pattern of the declaration up to its name
+            start_offset: Offset to start searching from
+            name: If given, only matches whose first group equals it (one compiled
+                  pattern serves every class or enum name)
+
+        Returns:
+            Tuple of (declaration match, index of the opening brace, index of the closing brace),
+            or None if there is no such declaration or its body is not closed
+        """
+        kinds = self.kinds
+        for match in pattern.finditer(self.text, start_offset):
+            if name is not None and match.group(1) != name:
+                continue
+            if not self.is_code(match.start()):
+                continue
+            index = bisect.bisect_left(self.starts, match.end())
+            while index < len(kinds) and kinds[index] < OPEN_BRACE:
+                index += 1
+            if index < len(kinds) and kinds[index] == OPEN_BRACE:
+                close_index = self.matching_brace(index)
+                if close_index is None:
+                    return None
+                return match, index, close_index
+        return None
+
+    def code(self, start: int, end: int) -> str:
+        """
+        Return the text of a range with comments, literals and directives replaced by spaces.
+
+        Args:
+            start: Start offset
+            end: End offset (exclusive)
+
+        Returns:
+            Code of the range
+        """
+        parts = []
+        position = start
+        index = bisect.bisect_left(self.starts, start)
+        while index < len(self.kinds) and self.starts[index] < end:
+            if self.kinds[index] < OPEN_BRACE:
+                parts.append(self.text[position:self.starts[index]])
+                parts.append(' ')
+                position = min(self.ends[index], end)
+            index += 1
+        parts.append(self.text[position:end])
+        return ''.join(parts)
+
+    def member_lines(self, open_index: int, close_index: int) -> List[int]:
+        """
+        Return the lines of a body that start directly inside it.
+
+        Lines starting in a nested body (e.g., a method or a nested struct) or inside
+        a multi-line comment or literal are left out.
+
+        Args:
+            open_index: Index of the opening brace of the body
+            close_index: Index of the closing brace of the body
+
+        Returns:
+            Line numbers (1-based), in order
+        """
+        first_line = self.line_of(self.starts[open_index]) + 1
+        last_line = self.line_of(self.starts[close_index])
+        lines = []
+        depth = 1
+        index = open_index + 1
+        for line_number in range(first_line, last_line + 1):
+            line_start = self.line_offsets[line_number - 1]
+            while index < close_index and self.starts[index] < line_start:
+                kind = self.kinds[index]
+                if kind == OPEN_BRACE:
+                    depth += 1
+                elif kind == CLOSE_BRACE:
+                    depth -= 1
+                index += 1
+            if depth != 1:
+                continue
+            # A comment, literal or directive spanning the line start
+            previous = index - 1
+            if previous > open_index and self.kinds[previous] < OPEN_BRACE and self.ends[previous] > line_start:
+                continue
+            lines.append(line_number)
+        return lines
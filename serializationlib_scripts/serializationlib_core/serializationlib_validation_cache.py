@@ -0,0 +1,158 @@
+"""
+Persistent per-file cache of validation macro definitions.
+
+The registry (#define X /* Validation Function -> Y */) is rebuilt every run from
+the macros of each validation source file. The cache keeps those per-file results
+with the file's size and mtime next to the build ledger, so the next run only
+re-scans files that changed.
+"""
+
+from __future__ import annotations
+
+import os
+import marshal
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+try:
+    from serializationlib_ledger import compute_tool_version, default_ledger_dir
+except ImportError:
+    from serializationlib_core.serializationlib_ledger import compute_tool_version, default_ledger_dir
+
+
+# Bump when the cache layout changes
+VALIDATION_CACHE_FORMAT = 1
+
+VALIDATION_CACHE_FILE_NAME = 'validation_macros.marshal'
+
+
+class ValidationMacroCache:
+    """
+    On-disk record of the validation macros found in each source file by the previous run.
+
+    Entries are only trusted when the cache was written by the same tool version.
+    """
+
+    def __init__(self, path, tool_version: str):
+        """
+        Args:
+            path: Path to the cache file
+            tool_version: Version string from compute_tool_version()
+        """
+        self.path = Path(path)
+        self.tool_version = tool_version
+        self.entries: Dict[str, tuple] = {}
+        self._dirty = False
+
+    @classmethod
+    def for_project(cls, project_dir, tool_version: Optional[str] = None) -> Optional['ValidationMacroCache']:
+        """
+        Load the cache for a project, or return None if caching is disabled.
+
+        Uses the ledger directory and honours SERIALIZATIONLIB_NO_CACHE.
+
+        Args:
+            project_dir: Path to the client project root
+            tool_version: Version string (default: compute_tool_version())
+
+        Returns:
+            Loaded ValidationMacroCache, or None
+        """
+        if os.environ.get('SERIALIZATIONLIB_NO_CACHE'):
+            return None
+        cache_dir = default_ledger_dir(project_dir)
+        if cache_dir is None:
+            return None
+        cache = cls(cache_dir / VALIDATION_CACHE_FILE_NAME, tool_version or compute_tool_version())
+        cache.load()
+        return cache
+
+    def load(self) -> None:
+        """Load entries from disk, discarding them if the format or tool version differs."""
+        try:
+            with open(self.path, 'rb') as file:
+                data = marshal.load(file)
+        except Exception:
+            return
+        if not isinstance(data, dict):
+            return
+        if data.get('format') != VALIDATION_CACHE_FORMAT or data.get('tool_version') != self.tool_version:
+            return
+        entries = data.get('files')
+        if isinstance(entries, dict):
+            self.entries = entries
+
+    def save(self) -> bool:
+        """
+        Atomically write the cache to disk if it changed.
+
+        Returns:
+            True if the cache is up to date on disk, False on error
+        """
+        if not self._dirty:
+            return True
+        data = {
+            'format': VALIDATION_CACHE_FORMAT,
+            'tool_version': self.tool_version,
+            'files': self.entries,
+        }
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'wb') as file:
+                marshal.dump(data, file)
+            os.replace(tmp_path, self.path)
+        except (OSError, ValueError):
+            return False
+        self._dirty = False
+        return True
+
+    def lookup(self, file_path: str, stat_result: Optional[os.stat_result]) -> Optional[Dict[str, str]]:
+        """
+        Return the cached macros of a file if its size and mtime are unchanged.
+
+        Args:
+            file_path: Path to the source file
+            stat_result: Current os.stat result for the file
+
+        Returns:
+            Dictionary of macro name to validation function, or None if the file must be scanned
+        """
+        entry = self.entries.get(file_path)
+        if entry is None or stat_result is None:
+            return None
+        size, mtime_ns, macros = entry
+        if size != stat_result.st_size or mtime_ns != stat_result.st_mtime_ns:
+            return None
+        return macros
+
+    def store(self, file_path: str, stat_result: Optional[os.stat_result], macros: Dict[str, str]) -> None:
+        """
+        Record the macros found in a file.
+
+        Args:
+            file_path: Path to the source file
+            stat_result: os.stat result the macros were read under
+            macros: Dictionary of macro name to validation function
+        """
+        if stat_result is None:
+            return
+        entry = (stat_result.st_size, stat_result.st_mtime_ns, dict(macros))
+        if self.entries.get(file_path) != entry:
+            self.entries[file_path] = entry
+            self._dirty = True
+
+    def retain_only(self, file_paths: Iterable[str]) -> None:
+        """
+        Drop entries for files that are no longer validation sources.
+
+        Args:
+            file_paths: Validation source files of the current run
+        """
+        keep = set(file_paths)
+        stale = [path for path in self.entries if path not in keep]
+        for path in stale:
+            del self.entries[path]
+        if stale:
+            self._dirty = True
+
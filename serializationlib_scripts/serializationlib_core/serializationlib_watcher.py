@@ -0,0 +1,278 @@
+"""
+File watchers for the pre-build daemon.
+
+InotifyWatcher uses the Linux inotify API through ctypes, so no package has to
+be installed. PollingWatcher compares stat snapshots and works everywhere.
+Both report the paths of changed headers, library manifests and compilation
+databases; other files are ignored.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from typing import Iterable, List, Optional, Set
+
+# Files whose changes can affect the generated code
+WATCHED_EXTENSIONS = ('.h', '.hpp')
+WATCHED_NAMES = frozenset({'library.json', 'library.properties', '.piopm', 'compile_commands.json'})
+
+# Reported when changes were lost (inotify queue overflow); callers treat it as "anything changed"
+UNKNOWN_CHANGE = ''
+
+# inotify constants from <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_ONLYDIR)
+
+
+def is_watched_file(name: str) -> bool:
+    """
+    Check whether changes to a file name matter to the pipeline.
+
+    Args:
+        name: File name without directory
+
+    Returns:
+        True for headers, library manifests and compilation databases
+    """
+    return name.endswith(WATCHED_EXTENSIONS) or name in WATCHED_NAMES
+
+
+class WatchRoot:
+    """A directory tree to watch, with the directory names pruned inside it."""
+
+    def __init__(self, path: str, exclude_dirs: Iterable[str] = (), exclude_suffixes: Iterable[str] = ()):
+        """
+        Args:
+            path: Root directory
+            exclude_dirs: Directory names not descended into (hidden directories are always skipped)
+            exclude_suffixes: Directory name suffixes not descended into (e.g., "-build")
+        """
+        self.path = os.path.abspath(str(path))
+        self.exclude_dirs = frozenset(exclude_dirs)
+        self.exclude_suffixes = tuple(exclude_suffixes)
+
+    def excludes(self, name: str) -> bool:
+        """
+        Check whether a directory is skipped.
+
+        Args:
+            name: Directory name
+
+        Returns:
+            True if the directory is not watched
+        """
+        return (name.startswith('.') or name in self.exclude_dirs
+                or (bool(self.exclude_suffixes) and name.endswith(self.exclude_suffixes)))
+
+    def walk_dirs(self, start: Optional[str] = None) -> List[str]:
+        """
+        List the watched directories below a directory of this root.
+
+        Args:
+            start: Directory to start from (default: the root)
+
+        Returns:
+            Directory paths, start included
+        """
+        directories = []
+        for root, dirs, _ in os.walk(start or self.path):
+            dirs[:] = [name for name in dirs if not self.excludes(name)]
+            directories.append(root)
+        return directories
+
+
+class PollingWatcher:
+    """Detects changes by comparing stat snapshots of the watched files."""
+
+    def __init__(self, roots: List[WatchRoot], interval: float = 1.0):
+        """
+        Args:
+            roots: Trees to watch
+            interval: Seconds between snapshots
+        """
+        self.roots = roots
+        self.interval = interval
+        self._snapshot = self._take_snapshot()
+
+    def fileno(self) -> Optional[int]:
+        """Polling has no file descriptor to wait on."""
+        return None
+
+    def changes(self) -> Set[str]:
+        """
+        Return the paths changed since the previous call.
+
+        Returns:
+            Set of added, removed or modified file paths
+        """
+        snapshot = self._take_snapshot()
+        changed = {path for path, entry in snapshot.items() if self._snapshot.get(path) != entry}
+        changed.update(path for path in self._snapshot if path not in snapshot)
+        self._snapshot = snapshot
+        return changed
+
+    def close(self) -> None:
+        """Release resources (nothing to release for polling)."""
+
+    def _take_snapshot(self) -> dict:
+        snapshot = {}
+        for watch_root in self.roots:
+            for directory in watch_root.walk_dirs():
+                try:
+                    entries = list(os.scandir(directory))
+                except OSError:
+                    continue
+                for entry in entries:
+                    if is_watched_file(entry.name):
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        snapshot[entry.path] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+
+class InotifyWatcher:
+    """Receives change events from the Linux kernel for every watched directory."""
+
+    def __init__(self, roots: List[WatchRoot]):
+        """
+        Args:
+            roots: Trees to watch
+
+        Raises:
+            OSError: If inotify is unavailable or the watch limit is reached
+        """
+        import ctypes
+        import ctypes.util
+
+        self.roots = roots
+        self.interval = None
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        # watch descriptor -> (directory, WatchRoot)
+        self._watches = {}
+        try:
+            for watch_root in roots:
+                self._add_tree(watch_root, watch_root.path)
+        except OSError:
+            self.close()
+            raise
+
+    def fileno(self) -> Optional[int]:
+        """File descriptor that becomes readable when events are queued."""
+        return self._fd
+
+    def changes(self) -> Set[str]:
+        """
+        Read all queued events without blocking.
+
+        Returns:
+            Set of changed paths (UNKNOWN_CHANGE if events were lost)
+        """
+        import struct
+
+        changed = set()
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                break
+            except OSError:
+                changed.add(UNKNOWN_CHANGE)
+                break
+            if not data:
+                break
+            offset = 0
+            while offset + 16 <= len(data):
+                wd, mask, _, length = struct.unpack_from('iIII', data, offset)
+                name = os.fsdecode(data[offset + 16:offset + 16 + length].rstrip(b'\0'))
+                offset += 16 + length
+                if mask & IN_Q_OVERFLOW:
+                    changed.add(UNKNOWN_CHANGE)
+                    continue
+                if mask & IN_IGNORED:
+                    self._watches.pop(wd, None)
+                    continue
+                watch = self._watches.get(wd)
+                if watch is None:
+                    continue
+                directory, watch_root = watch
+                path = os.path.join(directory, name) if name else directory
+                if mask & IN_ISDIR:
+                    if not name or watch_root.excludes(name):
+                        continue
+                    # A directory appeared or vanished (e.g., a library was installed)
+                    changed.add(path)
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        try:
+                            self._add_tree(watch_root, path)
+                        except OSError:
+                            changed.add(UNKNOWN_CHANGE)
+                elif mask & IN_DELETE_SELF:
+                    changed.add(path)
+                elif is_watched_file(name):
+                    changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        """Close the inotify descriptor."""
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+        self._watches = {}
+
+    def _add_tree(self, watch_root: WatchRoot, start: str) -> None:
+        for directory in watch_root.walk_dirs(start):
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                import ctypes
+                errno = ctypes.get_errno()
+                if not os.path.isdir(directory):
+                    # Removed while walking
+                    continue
+                raise OSError(errno, os.strerror(errno), directory)
+            self._watches[wd] = (directory, watch_root)
+
+
+def create_watcher(roots: List[WatchRoot], poll_interval: Optional[float] = None):
+    """
+    Create the best watcher available.
+
+    Uses inotify on Linux unless a poll interval is requested or SERIALIZATIONLIB_DAEMON_POLL
+    is set; falls back to polling if inotify fails (e.g., fs.inotify.max_user_watches).
+
+    Args:
+        roots: Trees to watch
+        poll_interval: Seconds between snapshots to force polling
+
+    Returns:
+        InotifyWatcher or PollingWatcher
+    """
+    if poll_interval is None and os.environ.get('SERIALIZATIONLIB_DAEMON_POLL'):
+        try:
+            poll_interval = float(os.environ['SERIALIZATIONLIB_DAEMON_POLL'])
+        except ValueError:
+            poll_interval = 1.0
+    if poll_interval is None and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(roots)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(roots, interval=poll_interval or 1.0)
@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+"""
+Optional watch daemon for the pre-build step.
+
+The daemon keeps one Pipeline alive for a project: stage modules imported, the
+ledger, validation macro cache and include graph in memory. It watches the
+project, its libraries and the serializationlib headers (inotify, or polling),
+and regenerates code shortly after a header is saved. Only headers whose
+fingerprint changed are parsed again.
+
+With SERIALIZATIONLIB_DAEMON=1 (or custom_serializationlib_daemon = yes in
+platformio.ini) the pre-build script only asks the daemon over a Unix socket to
+finish pending work. Without a running daemon it runs the pipeline itself and
+starts one in the background for the next build.
+
+    python serializationlib_scripts/serializationlib_daemon.py start --project-dir .
+    python serializationlib_scripts/serializationlib_daemon.py status --project-dir .
+    python serializationlib_scripts/serializationlib_daemon.py stop --project-dir .
+"""
+
+import os
+import sys
+import time
+import socket
+from typing import Dict, Optional
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+if script_dir not in sys.path:
+    sys.path.insert(0, script_dir)
+core_dir = os.path.join(script_dir, 'serializationlib_core')
+if core_dir not in sys.path:
+    sys.path.insert(0, core_dir)
+
+from serializationlib_ledger import compute_tool_version, default_ledger_dir
+
+
+DAEMON_SOCKET_NAME = 'daemon.sock'
+DAEMON_LOG_NAME = 'daemon.log'
+
+# Environment variables that change what the pipeline generates; the daemon only
+# serves builds with the same values it was started with
+CONFIG_ENVIRONMENT = (
+    'SERIALIZATIONLIB_OUTPUT',
+    'SERIALIZATIONLIB_GENERATED_DIR',
+    'SERIALIZATIONLIB_COMPILE_COMMANDS',
+    'SERIALIZATIONLIB_CACHE_DIR',
+    'SERIALIZATIONLIB_NO_CACHE',
+)
+
+# Seconds without further changes before a save is processed
+DEBOUNCE_SECONDS = 0.2
+
+# The daemon exits after this many seconds without builds or changes
+DEFAULT_IDLE_TIMEOUT = 4 * 3600
+
+# Longest path accepted for a Unix socket on every supported platform
+MAX_SOCKET_PATH = 100
+
+OFF_VALUES = ('0', 'off', 'false', 'no')
+
+
+def daemon_enabled(value: Optional[str] = None) -> bool:
+    """
+    Check whether the pre-build step should use the daemon.
+
+    Args:
+        value: Setting to check (default: SERIALIZATIONLIB_DAEMON)
+
+    Returns:
+        True if the daemon is requested and Unix sockets are available
+    """
+    if value is None:
+        value = os.environ.get('SERIALIZATIONLIB_DAEMON')
+    return bool(value) and value.strip().lower() not in OFF_VALUES and hasattr(socket, 'AF_UNIX')
+
+
+def daemon_socket_path(project_dir) -> Optional[str]:
+    """
+    Choose the socket path of a project's daemon.
+
+    The socket lives next to the build ledger; paths too long for a Unix socket
+    move to the temporary directory under a name derived from the project.
+
+    Args:
+        project_dir: Path to the client project root
+
+    Returns:
+        Socket path, or None if there is no project
+    """
+    ledger_dir = default_ledger_dir(project_dir)
+    if ledger_dir is None:
+        return None
+    path = str(ledger_dir / DAEMON_SOCKET_NAME)
+    if len(path) > MAX_SOCKET_PATH:
+        import tempfile
+        import zlib
+        name = f'serializationlib-{zlib.crc32(os.path.abspath(str(project_dir)).encode("utf-8")):08x}.sock'
+        path = os.path.join(tempfile.gettempdir(), name)
+    return path
+
+
+def current_config(serializable_macro: str = "Serializable") -> Dict[str, Optional[str]]:
+    """
+    Describe the settings a build expects the daemon to use.
+
+    Args:
+        serializable_macro: Name of the annotation identifier
+
+    Returns:
+        Dictionary of setting names to values
+    """
+    config = {name: os.environ.get(name) for name in CONFIG_ENVIRONMENT}
+    config['serializable_macro'] = serializable_macro
+    config['tool_version'] = compute_tool_version()
+    return config
+
+
+def send_request(project_dir, request: dict, timeout: Optional[float] = 600.0) -> Optional[dict]:
+    """
+    Send one request to a project's daemon and wait for the reply.
+
+    Args:
+        project_dir: Path to the client project root
+        request: Request with a 'command' key
+        timeout: Seconds to wait for the reply (None = no limit)
+
+    Returns:
+        Reply dictionary, or None if no daemon is reachable
+    """
+    path = daemon_socket_path(project_dir)
+    if path is None or not hasattr(socket, 'AF_UNIX') or not os.path.exists(path):
+        return None
+    import json
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(timeout)
+            client.connect(path)
+            client.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            data = b''
+            while not data.endswith(b'\n'):
+                chunk = client.recv(65536)
+                if not chunk:
+                    break
+                data += chunk
+        reply = json.loads(data.decode('utf-8'))
+    except (OSError, ValueError):
+        return None
+    return reply if isinstance(reply, dict) else None
+
+
+def sync_with_daemon(project_dir, serializable_macro: str = "Serializable") -> Optional[dict]:
+    """
+    Ask the daemon to finish pending regeneration before the build compiles.
+
+    Args:
+        project_dir: Path to the client project root
+        serializable_macro: Name of the annotation identifier
+
+    Returns:
+        Reply with 'processed' and 'output_dir', or None if the build must run the
+        pipeline itself (no daemon, different settings or a failed run)
+    """
+    reply = send_request(project_dir, {
+        'command': 'sync',
+        'project_dir': os.path.abspath(str(project_dir)),
+        'config': current_config(serializable_macro),
+    })
+    if reply is None or not reply.get('ok'):
+        return None
+    return reply
+
+
+def spawn_daemon(project_dir, library_dir, serializable_macro: str = "Serializable") -> bool:
+    """
+    Start a daemon for a project in the background.
+
+    Output goes to daemon.log next to the build ledger.
+
+    Args:
+        project_dir: Path to the client project root
+        library_dir: Path to the serializationlib library root
+        serializable_macro: Name of the annotation identifier
+
+    Returns:
+        True if the process was started
+    """
+    ledger_dir = default_ledger_dir(project_dir)
+    if ledger_dir is None:
+        return False
+    import subprocess
+    command = [sys.executable, os.path.abspath(__file__), 'run', '--project-dir', str(project_dir),
+               '--macro', serializable_macro]
+    if library_dir:
+        command += ['--library-dir', str(library_dir)]
+    try:
+        ledger_dir.mkdir(parents=True, exist_ok=True)
+        with open(ledger_dir / DAEMON_LOG_NAME, 'ab') as log:
+            subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                             cwd=str(project_dir), start_new_session=True, close_fds=True)
+    except OSError:
+        return False
+    return True
+
+
+class WatchDaemon:
+    """
+    Serves pre-build requests for one project from a long-lived Pipeline.
+    """
+
+    def __init__(self, project_dir, library_dir=None, serializable_macro: str = "Serializable",
+                 idle_timeout: float = DEFAULT_IDLE_TIMEOUT, poll_interval: Optional[float] = None):
+        """
+        Args:
+            project_dir: Path to the client project root (where platformio.ini is)
+            library_dir: Path to the serializationlib library root
+            serializable_macro: Name of the annotation identifier
+            idle_timeout: Seconds without builds or changes before the daemon exits
+            poll_interval: Seconds between snapshots to poll instead of using inotify
+        """
+        from serializationlib_serializer import Pipeline
+
+        self.project_dir = os.path.abspath(str(project_dir))
+        self.library_dir = str(library_dir) if library_dir else None
+        self.config = current_config(serializable_macro)
+        self.idle_timeout = idle_timeout
+        self.poll_interval = poll_interval
+        self.pipeline = Pipeline(self.project_dir, self.library_dir, serializable_macro=serializable_macro)
+        self.socket_path = daemon_socket_path(self.project_dir)
+        self.watcher = None
+        self.runs = 0
+        # Enums and classes processed since the last sync reply
+        self.processed_since_sync = 0
+        self.last_error: Optional[str] = None
+        self._pending_since: Optional[float] = None
+        self._stopping = False
+
+    def watch_roots(self):
+        """
+        Return the trees whose headers feed the pipeline.
+
+        Returns:
+            List of WatchRoot (project sources, installed libraries, serializationlib)
+        """
+        from serializationlib_get_client_files import DEFAULT_EXCLUDE_DIRS
+        from serializationlib_watcher import WatchRoot
+
+        roots = [WatchRoot(self.project_dir, exclude_dirs=DEFAULT_EXCLUDE_DIRS)]
+        pio_libdeps = os.path.join(self.project_dir, '.pio', 'libdeps')
+        if os.path.isdir(pio_libdeps):
+            roots.append(WatchRoot(pio_libdeps))
+        build_deps = os.path.join(self.project_dir, 'build', '_deps')
+        if os.path.isdir(build_deps):
+            roots.append(WatchRoot(build_deps, exclude_suffixes=('-build', '-subbuild')))
+        if self.library_dir and not os.path.abspath(self.library_dir).startswith(pio_libdeps + os.sep):
+            roots.append(WatchRoot(self.library_dir, exclude_dirs=DEFAULT_EXCLUDE_DIRS))
+        return roots
+
+    def serve(self) -> int:
+        """
+        Run until stopped, idle for idle_timeout or replaced.
+
+        Returns:
+            Exit code (0 = stopped normally, 1 = another daemon is running or the socket failed)
+        """
+        import select
+        from serializationlib_watcher import create_watcher
+
+        if self.socket_path is None:
+            return 1
+        if send_request(self.project_dir, {'command': 'status'}, timeout=2.0) is not None:
+            print(f"serializationlib daemon: already running for {self.project_dir}")
+            return 1
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+            server.bind(self.socket_path)
+            os.chmod(self.socket_path, 0o600)
+            server.listen(8)
+        except OSError as e:
+            print(f"serializationlib daemon: cannot listen on {self.socket_path}: {e}")
+            server.close()
+            return 1
+
+        self.watcher = create_watcher(self.watch_roots(), self.poll_interval)
+        print(f"serializationlib daemon: pid {os.getpid()} watching {self.project_dir} "
+              f"({type(self.watcher).__name__}) on {self.socket_path}")
+        sys.stdout.flush()
+        self.regenerate()
+
+        last_activity = time.monotonic()
+        next_poll = time.monotonic()
+        try:
+            while not self._stopping:
+                now = time.monotonic()
+                timeouts = [max(0.0, last_activity + self.idle_timeout - now)]
+                if self._pending_since is not None:
+                    timeouts.append(max(0.0, self._pending_since + DEBOUNCE_SECONDS - now))
+                if self.watcher.fileno() is None:
+                    timeouts.append(max(0.0, next_poll - now))
+                waitables = [server] if self.watcher.fileno() is None else [server, self.watcher]
+                readable, _, _ = select.select(waitables, [], [], min(timeouts))
+
+                now = time.monotonic()
+                if self.watcher in readable or (self.watcher.fileno() is None and now >= next_poll):
+                    if self.collect_changes():
+                        last_activity = now
+                    next_poll = now + (self.watcher.interval or 0)
+                if server in readable:
+                    try:
+                        connection, _ = server.accept()
+                    except OSError:
+                        connection = None
+                    if connection is not None:
+                        last_activity = time.monotonic()
+                        with connection:
+                            self.handle_connection(connection)
+                if self._pending_since is not None and time.monotonic() - self._pending_since >= DEBOUNCE_SECONDS:
+                    self.regenerate()
+                if time.monotonic() - last_activity >= self.idle_timeout:
+                    print("serializationlib daemon: idle, exiting")
+                    break
+        finally:
+            self.watcher.close()
+            server.close()
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+        return 0
+
+    def collect_changes(self) -> bool:
+        """
+        Read the watcher and mark regeneration pending for relevant changes.
+
+        Headers whose fingerprint matches the ledger (for example, the ones the
+        last run wrote itself) are ignored.
+
+        Returns:
+            True if a change is pending
+        """
+        changed = self.watcher.changes()
+        ledger = self.pipeline.ledger
+        for path in changed:
+            if ledger is not None and path and ledger.is_unchanged(path, self._stat(path)):
+                continue
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+            return True
+        return False
+
+    def regenerate(self) -> None:
+        """Run the pipeline; unchanged headers are skipped through the in-memory ledger."""
+        self._pending_since = None
+        processed = 0
+        try:
+            processed = self.pipeline.run()
+            self.last_error = None
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            self.last_error = repr(e)
+        self.runs += 1
+        self.processed_since_sync += processed
+        if os.environ.get('SERIALIZATIONLIB_VERBOSE'):
+            print(f"serializationlib daemon: run {self.runs}, {processed} enum(s)/class(es) processed")
+        sys.stdout.flush()
+
+    def handle_connection(self, connection: socket.socket) -> None:
+        """
+        Answer one request.
+
+        Args:
+            connection: Accepted client socket
+        """
+        import json
+        connection.settimeout(5.0)
+        data = b''
+        try:
+            while not data.endswith(b'\n'):
+                chunk = connection.recv(65536)
+                if not chunk:
+                    break
+                data += chunk
+            request = json.loads(data.decode('utf-8'))
+        except (OSError, ValueError):
+            return
+        reply = self.handle(request if isinstance(request, dict) else {})
+        try:
+            connection.sendall(json.dumps(reply).encode('utf-8') + b'\n')
+        except OSError:
+            pass
+
+    def handle(self, request: dict) -> dict:
+        """
+        Execute a request.
+
+        Commands: 'status', 'sync' (process pending changes, then reply) and 'stop'.
+
+        Args:
+            request: Decoded request
+
+        Returns:
+            Reply dictionary with 'ok'
+        """
+        command = request.get('command')
+        if command == 'status':
+            return {'ok': True, 'pid': os.getpid(), 'project_dir': self.project_dir, 'runs': self.runs,
+                    'pending': self._pending_since is not None, 'watcher': type(self.watcher).__name__}
+        if command == 'stop':
+            self._stopping = True
+            return {'ok': True}
+        if command != 'sync':
+            return {'ok': False, 'error': f'unknown command {command!r}'}
+
+        if request.get('project_dir') != self.project_dir:
+            return {'ok': False, 'error': 'different project'}
+        if request.get('config') != self.config:
+            # Settings or scripts changed: let the build run itself and start a fresh daemon
+            self._stopping = True
+            return {'ok': False, 'error': 'configuration changed'}
+
+        # Events the kernel queued before the build started are read now
+        self.collect_changes()
+        if self._pending_since is not None or self.last_error is not None:
+            self.regenerate()
+        if self.last_error is not None:
+            return {'ok': False, 'error': self.last_error}
+        processed, self.processed_since_sync = self.processed_since_sync, 0
+        return {'ok': True, 'processed': processed, 'output_dir': self.pipeline.output_dir}
+
+    @staticmethod
+    def _stat(path: str) -> Optional[os.stat_result]:
+        try:
+            return os.stat(path)
+        except OSError:
+            return None
+
+
+def main(argv=None):
+    """
+    Main function to handle command line arguments.
+
+    Args:
+        argv: Command line arguments (default: sys.argv[1:])
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Watch daemon that keeps the serializationlib pipeline warm between builds"
+    )
+    parser.add_argument(
+        "command",
+        choices=("run", "start", "stop", "status"),
+        help="run in the foreground, start in the background, stop, or show the status"
+    )
+    parser.add_argument(
+        "--project-dir",
+        default=os.getcwd(),
+        help="Client project root (default: current directory)"
+    )
+    parser.add_argument(
+        "--library-dir",
+        default=os.path.dirname(script_dir),
+        help="serializationlib library root (default: parent of this script)"
+    )
+    parser.add_argument(
+        "--macro",
+        default=os.environ.get("SERIALIZABLE_MACRO", "Serializable"),
+        help="Name of the annotation identifier (default: Serializable)"
+    )
+    parser.add_argument(
+        "--poll",
+        type=float,
+        default=None,
+        help="Poll every N seconds instead of using inotify"
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=DEFAULT_IDLE_TIMEOUT,
+        help=f"Exit after N seconds without builds or changes (default: {DEFAULT_IDLE_TIMEOUT})"
+    )
+    args = parser.parse_args(argv)
+    project_dir = os.path.abspath(args.project_dir)
+
+    if args.command == "status":
+        reply = send_request(project_dir, {'command': 'status'}, timeout=5.0)
+        if reply is None:
+            print("serializationlib daemon: not running")
+            return 1
+        print(f"serializationlib daemon: pid {reply.get('pid')}, {reply.get('runs')} run(s), "
+              f"{'changes pending' if reply.get('pending') else 'up to date'}, {reply.get('watcher')}")
+        return 0
+    if args.command == "stop":
+        reply = send_request(project_dir, {'command': 'stop'}, timeout=5.0)
+        if reply is None:
+            print("serializationlib daemon: not running")
+            return 1
+        return 0
+    if args.command == "start":
+        return 0 if spawn_daemon(project_dir, args.library_dir, args.macro) else 1
+
+    daemon = WatchDaemon(project_dir, args.library_dir, serializable_macro=args.macro,
+                         idle_timeout=args.idle_timeout, poll_interval=args.poll)
+    return daemon.serve()
+
+
+if __name__ == "__main__":
+    exit(main(sys.argv[1:]))
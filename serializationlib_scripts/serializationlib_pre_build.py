@@ -21,7 +21,10 @@ from pathlib import Path
 
 def get_library_dir():
     """
-    Find the serializationlib_scripts directory by searching up the directory tree.
+    Find the serializationlib_scripts directory.
+    
+    Resolved from the location of this script. Searching up the directory tree
+    from the working directory is only the fallback.
     
     Returns:
         Path: Path to the serializationlib_scripts directory
@@ -29,6 +32,14 @@ def get_library_dir():
     Raises:
         ImportError: If the directory cannot be found
     """
+    try:
+        script_file = __file__
+    except NameError:
+        # SCons runs extra scripts without __file__, but compiles them with their file name
+        script_file = sys._getframe().f_code.co_filename
+    if script_file and os.path.isfile(script_file):
+        return Path(os.path.dirname(os.path.abspath(script_file)))
+    
     cwd = Path(os.getcwd())
     current = cwd
     for _ in range(10):  # Search up to 10 levels
@@ -81,6 +92,60 @@ project_dir = get_project_dir()
 # Get serializable macro name from environment or use default
 serializable_macro = os.environ.get("SERIALIZABLE_MACRO", "Serializable")
 
-# Import and execute scripts
-from serializationlib_execute_scripts import execute_scripts
-execute_scripts(project_dir, library_dir, serializable_macro=serializable_macro)
+# Out-of-tree output can also be selected in platformio.ini: custom_serializationlib_output = generated
+if hasattr(env, "GetProjectOption"):
+    try:
+        output_mode = env.GetProjectOption("custom_serializationlib_output", None)
+        if output_mode:
+            os.environ.setdefault("SERIALIZATIONLIB_OUTPUT", output_mode)
+    except Exception:
+        pass
+
+# Library scanning can be restricted to the headers the build includes (after `pio run -t compiledb`):
+# custom_serializationlib_compile_commands = auto
+if hasattr(env, "GetProjectOption"):
+    try:
+        compile_commands = env.GetProjectOption("custom_serializationlib_compile_commands", None)
+        if compile_commands:
+            os.environ.setdefault("SERIALIZATIONLIB_COMPILE_COMMANDS", compile_commands)
+    except Exception:
+        pass
+
+# A watch daemon can keep the pipeline warm between builds: custom_serializationlib_daemon = yes
+if hasattr(env, "GetProjectOption"):
+    try:
+        daemon_mode = env.GetProjectOption("custom_serializationlib_daemon", None)
+        if daemon_mode:
+            os.environ.setdefault("SERIALIZATIONLIB_DAEMON", daemon_mode)
+    except Exception:
+        pass
+
+# With the daemon enabled, only ask it to finish pending work; otherwise run the scripts here
+reply = None
+use_daemon = False
+if project_dir and os.environ.get("SERIALIZATIONLIB_DAEMON"):
+    from serializationlib_daemon import daemon_enabled, spawn_daemon, sync_with_daemon
+    use_daemon = daemon_enabled()
+    if use_daemon:
+        reply = sync_with_daemon(project_dir, serializable_macro)
+
+if reply is not None:
+    output_dir = reply.get("output_dir")
+    if os.environ.get("SERIALIZATIONLIB_VERBOSE"):
+        print(f"serializationlib: daemon processed {reply.get('processed', 0)} enum(s)/class(es)")
+else:
+    from serializationlib_execute_scripts import execute_scripts
+    pipeline = execute_scripts(project_dir, library_dir, serializable_macro=serializable_macro)
+    output_dir = pipeline.output_dir
+    # Start a daemon for the next build once this run has updated the ledger
+    if use_daemon:
+        spawn_daemon(project_dir, library_dir, serializable_macro)
+
+# In generated mode the .serialization.inc files must be on the include path of the
+# library and of the project sources (CMake adds the directory itself)
+if output_dir and hasattr(env, "Append"):
+    env.Append(CPPPATH=[output_dir])
+    try:
+        DefaultEnvironment().Append(CPPPATH=[output_dir])
+    except NameError:
+        pass
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Precompile the pre-build scripts to bytecode.
+
+Python caches bytecode in __pycache__ on first import, unless
+PYTHONDONTWRITEBYTECODE is set or the library directory is read-only (CI
+images, shared package directories). Then every build compiles every module it
+imports again. Run this once after installing the library to store the bytecode
+with it:
+
+    python serializationlib_scripts/serializationlib_precompile.py
+
+Imports still compare the bytecode with the source, so edited scripts are
+compiled again as usual.
+"""
+
+import os
+import sys
+import compileall
+
+
+def precompile(scripts_dir=None, force: bool = False, quiet: bool = True) -> bool:
+    """
+    Compile every pre-build script to __pycache__.
+    
+    Args:
+        scripts_dir: Path to serializationlib_scripts (default: the directory of this file)
+        force: If True, compile even if the bytecode is up to date
+        quiet: If True, only print errors
+        
+    Returns:
+        True if every script compiled
+    """
+    if scripts_dir is None:
+        scripts_dir = os.path.dirname(os.path.abspath(__file__))
+    return bool(compileall.compile_dir(str(scripts_dir), force=force, quiet=1 if quiet else 0))
+
+
+def main(argv=None):
+    """
+    Main function to handle command line arguments.
+    
+    Args:
+        argv: Command line arguments (default: sys.argv[1:])
+    """
+    import argparse
+    
+    parser = argparse.ArgumentParser(
+        description="Precompile the serializationlib pre-build scripts to bytecode"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Compile even if the bytecode is up to date"
+    )
+    parser.add_argument(
+        "--verbose", "-v",
+        action="store_true",
+        help="List every compiled file"
+    )
+    args = parser.parse_args(argv)
+    
+    return 0 if precompile(force=args.force, quiet=not args.verbose) else 1
+
+
+if __name__ == "__main__":
+    exit(main(sys.argv[1:]))
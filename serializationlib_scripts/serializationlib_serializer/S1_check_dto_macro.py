@@ -5,28 +5,77 @@ S1 Check Serializable Annotation Script
 This script checks if a C++ class has the @Serializable annotation above it.
 """
 
+import os
 import re
-import argparse
+import sys
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Optional, Dict, List
+
+# Add this directory and serializationlib_core to path for the class boundary helper
+script_dir = os.path.dirname(os.path.abspath(__file__))
+if script_dir not in sys.path:
+    sys.path.insert(0, script_dir)
+core_dir = os.path.join(os.path.dirname(script_dir), 'serializationlib_core')
+if core_dir not in sys.path:
+    sys.path.insert(0, core_dir)
+
+from serializationlib_annotation_scanner import (
+    ANNOTATION, CLASS, PROCESSED, events_by_line, find_event, scan_annotations
+)
+from serializationlib_generated_blocks import blank_generated_blocks
+from serializationlib_class_index import ClassIndex
+from serializationlib_tokenizer import HeaderTokens
+import S2_extract_dto_fields
 
 # print("Executing NayanSerializer/scripts/serializer/S1_check_dto_macro.py")
 # print("Executing NayanSerializer/scripts/serializer/S1_check_dto_macro.py")
 
-def check_dto_annotation(file_path: str, serializable_annotation: str = "Serializable") -> Optional[Dict[str, any]]:
+def check_dto_annotation(file_path: str, serializable_annotation: str = "Serializable", scan_context=None) -> Optional[Dict[str, any]]:
     """
     Check if a C++ file contains a class with the @Serializable or @Entity annotation above it.
     
     Args:
         file_path: Path to the C++ file
         serializable_annotation: Name of the annotation identifier (Serializable -> @Serializable, _Entity -> @Entity)
+        scan_context: Optional ScanContext used to read the file from the shared cache
         
     Returns:
         Dictionary with 'class_name', 'has_dto', 'line_number' if found, None otherwise
     """
+    annotated_classes = find_dto_annotations(file_path, serializable_annotation, scan_context=scan_context)
+    if annotated_classes:
+        return annotated_classes[0]
+    
+    return {
+        'has_dto': False
+    }
+
+
+def find_dto_annotations(file_path: str, serializable_annotation: str = "Serializable", scan_context=None,
+                         include_processed: bool = False) -> List[Dict[str, any]]:
+    """
+    Find every class in a C++ file with the @Serializable or @Entity annotation above it.
+    
+    Annotated enums are left to S8 and are not returned.
+    
+    Args:
+        file_path: Path to the C++ file
+        serializable_annotation: Name of the annotation identifier (Serializable -> @Serializable, _Entity -> @Entity)
+        scan_context: Optional ScanContext used to read the file from the shared cache
+        include_processed: If True, also return classes whose annotation is already processed
+                           (/*--@Serializable--*/), so their generated block can be refreshed
+        
+    Returns:
+        List of dictionaries with 'class_name', 'has_dto', 'processed', 'dto_line', 'class_line',
+        'start_line' and 'end_line' (class boundaries, None if the class body is not closed), in file order
+    """
+    lines = []
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            lines = file.readlines()
+        if scan_context is not None:
+            lines = scan_context.read_source_lines(file_path)
+        else:
+            with open(file_path, 'r', encoding='utf-8') as file:
+                lines = blank_generated_blocks(file.readlines())
     except FileNotFoundError:
         # print(f"Error: File '{file_path}' not found")
         # print(f"Error: File '{file_path}' not found")
@@ -46,69 +95,97 @@ def check_dto_annotation(file_path: str, serializable_annotation: str = "Seriali
         annotation_name = "@Serializable"
     
     # Pattern to match /* @Entity */ or /*@Entity*/ or /* @Serializable */ or /*@Serializable*/ annotation (ignoring whitespace)
-    # Also check for already processed /*--@Entity--*/ or /*--@Serializable--*/ pattern
     annotation_pattern = rf'/\*\s*{re.escape(annotation_name)}\s*\*/'
-    processed_pattern = rf'/\*--\s*{re.escape(annotation_name)}\s*--\*/'
+    # Live annotations (/* @Serializable */) and processed markers (/*--@Serializable--*/) in scanner events
+    annotation_names = (annotation_name,)
+    
+    # Annotated enums (including "enum class") are handled by S8
+    enum_pattern = r'^(?:typedef\s+)?enum\b'
     
-    # Pattern to match class declarations
-    class_pattern = r'class\s+([A-Za-z_][A-Za-z0-9_]*)\s*(?:[:{])'
+    # One scan of the file; only lines with an annotation, declaration or access specifier are visited
+    if scan_context is not None and lines:
+        events = scan_context.annotation_events(file_path)
+    else:
+        events = scan_annotations(lines)
+    line_events = events_by_line(events)
+    
+    annotated_classes = []
+    seen_class_lines = set()
+    # Indexed on the first annotated class; files without one are never indexed
+    class_index = None
     
-    for line_num, line in enumerate(lines, 1):
-        stripped_line = line.strip()
+    for line_num, events_on_line in line_events.items():
+        live_annotation = find_event(events_on_line, ANNOTATION, annotation_names)
+        processed_annotation = find_event(events_on_line, PROCESSED, annotation_names)
         
         # Check if line is already processed (/*--@Entity--*/ or /*--@Serializable--*/)
-        if re.search(processed_pattern, stripped_line):
+        if not include_processed and processed_annotation:
             continue
         
-        # Skip other comments that aren't @Entity/@Serializable annotations
-        # But allow /* @Entity */ or /* @Serializable */ annotations to be processed
-        if stripped_line.startswith('/*') and not re.search(annotation_pattern, stripped_line):
+        # Only annotations start a look ahead for the class
+        if not live_annotation and not processed_annotation:
             continue
         # Skip single-line comments
-        if stripped_line.startswith('//'):
+        if lines[line_num - 1].strip().startswith('//'):
             continue
         
-        # Check for annotation (/* @Entity */ or /*@Entity*/ or /* @Serializable */ or /*@Serializable*/)
-        annotation_match = re.search(annotation_pattern, stripped_line)
-        if annotation_match:
-            # Look ahead for class declaration (within next 10 lines)
-            for i in range(line_num, min(line_num + 11, len(lines) + 1)):
-                if i <= len(lines):
-                    next_line = lines[i - 1].strip()
-                    
-                    # Skip comments (but not the annotation itself which is in a comment)
-                    if next_line.startswith('/*') and not re.search(processed_pattern, next_line):
-                        continue
-                    # Skip other single-line comments that aren't the annotation
-                    if next_line.startswith('//') and not re.search(annotation_pattern, next_line):
-                        continue
-                    
-                    # Check for class declaration
-                    class_match = re.search(class_pattern, next_line)
-                    if class_match:
-                        class_name = class_match.group(1)
-                        return {
-                            'class_name': class_name,
-                            'has_dto': True,
-                            'dto_line': line_num,
-                            'class_line': i
-                        }
-                    
-                    # Stop if we hit something that's not an annotation or class
-                    # Check if it starts with known annotations/macros
-                    known_annotations = ('COMPONENT', 'SCOPE', 'VALIDATE', 'Dto')
-                    if next_line and not (next_line.startswith(known_annotations) or 
-                                         re.match(r'^[A-Z][A-Za-z0-9_]*\s*(?:\(|$)', next_line) or
-                                         re.search(annotation_pattern, next_line)):
-                        break
+        processed = live_annotation is None
+        # Look ahead for class declaration (within next 10 lines)
+        for i in range(line_num, min(line_num + 11, len(lines) + 1)):
+            next_line = lines[i - 1].strip()
+            next_events = line_events.get(i)
+            
+            # Skip comments (but not the annotation itself which is in a comment)
+            if next_line.startswith('/*') and (i == line_num or not find_event(next_events, PROCESSED, annotation_names)):
+                continue
+            # Skip other single-line comments that aren't the annotation
+            if next_line.startswith('//') and not find_event(next_events, ANNOTATION, annotation_names):
+                continue
+            
+            # The annotation belongs to an enum, not a class
+            if re.search(enum_pattern, re.sub(annotation_pattern, '', next_line).strip()):
+                break
+            
+            # Check for class declaration
+            class_event = find_event(next_events, CLASS)
+            if class_event:
+                # Consecutive annotations above the same class count once
+                if i not in seen_class_lines:
+                    seen_class_lines.add(i)
+                    class_name = class_event.name
+                    if class_index is None:
+                        if scan_context is not None and lines:
+                            class_index = scan_context.class_index(file_path)
+                        else:
+                            class_index = ClassIndex(HeaderTokens(lines))
+                    boundaries = S2_extract_dto_fields.find_class_boundaries_in_lines(lines, class_name, i,
+                                                                                      class_index=class_index)
+                    annotated_classes.append({
+                        'class_name': class_name,
+                        'has_dto': True,
+                        'processed': processed,
+                        'dto_line': line_num,
+                        'class_line': i,
+                        'start_line': boundaries[0] if boundaries else None,
+                        'end_line': boundaries[1] if boundaries else None
+                    })
+                break
+            
+            # Stop if we hit something that's not an annotation or class
+            # Check if it starts with known annotations/macros
+            known_annotations = ('COMPONENT', 'SCOPE', 'VALIDATE', 'Dto')
+            if next_line and not (next_line.startswith(known_annotations) or 
+                                 re.match(r'^[A-Z][A-Za-z0-9_]*\s*(?:\(|$)', next_line) or
+                                 find_event(next_events, ANNOTATION, annotation_names)):
+                break
     
-    return {
-        'has_dto': False
-    }
+    return annotated_classes
 
 
 def main():
     """Main function to handle command line arguments."""
+    import argparse
+    
     parser = argparse.ArgumentParser(
         description="Check if a C++ class has the @Serializable or @Entity annotation above it"
     )
@@ -153,17 +230,18 @@ def main():
 
 
 # Backward compatibility alias
-def check_dto_macro(file_path: str, serializable_macro: str = "Serializable") -> Optional[Dict[str, any]]:
+def check_dto_macro(file_path: str, serializable_macro: str = "Serializable", scan_context=None) -> Optional[Dict[str, any]]:
     """
     Deprecated: Use check_dto_annotation instead.
     Check if a C++ file contains a class with the @Serializable or @Entity annotation above it.
     """
-    return check_dto_annotation(file_path, serializable_macro)
+    return check_dto_annotation(file_path, serializable_macro, scan_context=scan_context)
 
 
 # Export functions for other scripts to import
 __all__ = [
     'check_dto_annotation',
+    'find_dto_annotations',
     'check_dto_macro',  # Keep for backward compatibility
     'main'
 ]
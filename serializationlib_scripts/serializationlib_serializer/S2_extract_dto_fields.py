@@ -6,104 +6,122 @@ This script extracts public member variables from a Dto class.
 """
 
 import re
-import argparse
+import os
+import sys
 from pathlib import Path
 from typing import List, Dict, Optional
 
+# Add serializationlib_core to path for the generated block helpers
+core_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'serializationlib_core')
+if core_dir not in sys.path:
+    sys.path.insert(0, core_dir)
+
+from serializationlib_generated_blocks import blank_generated_blocks
+from serializationlib_tokenizer import HeaderTokens
+from serializationlib_class_index import ClassIndex
+from serializationlib_field_parser import parse_field_declarations
+
 # print("Executing NayanSerializer/scripts/serializer/S2_extract_dto_fields.py")
 # print("Executing NayanSerializer/scripts/serializer/S2_extract_dto_fields.py")
 
-def find_class_boundaries(file_path: str, class_name: str) -> Optional[tuple]:
+def find_class_boundaries(file_path: str, class_name: str, scan_context=None) -> Optional[tuple]:
     """
     Find the start and end line numbers of a class definition.
     
     Args:
         file_path: Path to the C++ file
         class_name: Name of the class to find
+        scan_context: Optional ScanContext used to read the file from the shared cache
         
     Returns:
         Tuple of (start_line, end_line) or None if not found
     """
+    class_index = read_class_index(file_path, scan_context)
+    if class_index is None:
+        return None
+    
+    return find_class_boundaries_in_lines(class_index.tokens.lines, class_name, class_index=class_index)
+
+
+def read_class_index(file_path: str, scan_context=None) -> Optional[ClassIndex]:
+    """
+    Read a file and index its classes (generated blocks blanked).
+    
+    Args:
+        file_path: Path to the C++ file
+        scan_context: Optional ScanContext used to reuse the shared cached index
+        
+    Returns:
+        ClassIndex of the file, or None if it cannot be read
+    """
     try:
+        if scan_context is not None:
+            return scan_context.class_index(file_path)
         with open(file_path, 'r', encoding='utf-8') as file:
-            lines = file.readlines()
+            return ClassIndex(HeaderTokens(blank_generated_blocks(file.readlines())))
     except Exception as e:
         # print(f"Error reading file: {e}")
-        pass
         # print(f"Error reading file: {e}")
+        return None
+
+
+def find_class_boundaries_in_lines(lines: List[str], class_name: str, start_line: int = 1,
+                                   class_index: Optional[ClassIndex] = None) -> Optional[tuple]:
+    """
+    Find the start and end line numbers of a class definition in already loaded lines.
     
-    class_start = None
-    brace_count = 0
-    in_class = False
-    
-    # Pattern to match class declaration
-    # Matches: "class TestDto : public Serializablex<TestDto> {" or "class TestDto {"
-    # Use a simpler pattern that just checks for class name
-    class_pattern = rf'class\s+{re.escape(class_name)}'
-    
-    for line_num, line in enumerate(lines, 1):
-        stripped_line = line.strip()
-        
-        # Skip commented lines
-        if stripped_line.startswith('//') or stripped_line.startswith('/*') or stripped_line.startswith('*'):
-            continue
-        
-        # Check for class declaration
-        if not in_class and re.search(class_pattern, stripped_line):
-            class_start = line_num
-            in_class = True
-            # Initialize brace count from this line
-            brace_count = stripped_line.count('{') - stripped_line.count('}')
-        elif in_class:
-            # Count braces for subsequent lines
-            brace_count += stripped_line.count('{')
-            brace_count -= stripped_line.count('}')
+    Args:
+        lines: File content as a list of lines
+        class_name: Name of the class to find
+        start_line: Line number (1-based) to start searching from
+        class_index: Optional class index of the lines, to reuse an existing index
         
-        if in_class:
-            # If braces are balanced and we've closed the class, we're done
-            if brace_count == 0:
-                return (class_start, line_num)
+    Returns:
+        Tuple of (start_line, end_line) or None if not found
+    """
+    if class_index is None:
+        class_index = ClassIndex(HeaderTokens(lines))
     
-    return None
+    class_info = class_index.find(class_name, start_line)
+    if not class_info:
+        return None
+    
+    return (class_info.start_line, class_info.end_line)
 
 
-def extract_all_fields(file_path: str, class_name: str) -> List[Dict[str, str]]:
+def extract_all_fields(file_path: str, class_name: str, scan_context=None) -> List[Dict[str, str]]:
     """
     Extract all member variables (public, private, protected) from a class.
     
     Args:
         file_path: Path to the C++ file
         class_name: Name of the class
+        scan_context: Optional ScanContext used to read the file from the shared cache
         
     Returns:
-        List of dictionaries with 'type' and 'name' keys
+        List of dictionaries with 'type' and 'name' keys, one per declarator
     """
-    boundaries = find_class_boundaries(file_path, class_name)
-    if not boundaries:
+    class_index = read_class_index(file_path, scan_context)
+    if class_index is None:
         return []
     
-    start_line, end_line = boundaries
-    
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            lines = file.readlines()
-    except Exception as e:
-        # print(f"Error reading file: {e}")
-        pass
-        # print(f"Error reading file: {e}")
+    class_info = class_index.find(class_name)
+    if not class_info:
+        return []
     
-    class_lines = lines[start_line - 1:end_line]
+    tokens = class_index.tokens
+    lines = tokens.lines
     
     fields = []
     current_access = None
     
     # Patterns
     access_pattern = r'^\s*(public|private|protected)\s*:'
-    # Field pattern: matches "int a;" or "StdString name;"
-    field_pattern = r'^\s*([A-Za-z_][A-Za-z0-9_<>*&,\s]*?)\s+([A-Za-z_][A-Za-z0-9_]*)\s*[;=]'
     
-    for line in class_lines:
-        stripped = line.strip()
+    # Only lines directly in the class body: method bodies, nested types and
+    # multi-line comments are left out by the tokenizer
+    for line_num in tokens.member_lines(class_info.open_index, class_info.close_index):
+        stripped = lines[line_num - 1].strip()
         
         # Skip comments
         if stripped.startswith('//') or stripped.startswith('/*'):
@@ -121,12 +139,16 @@ def extract_all_fields(file_path: str, class_name: str) -> List[Dict[str, str]]:
         
         # Process all members (public, private, protected) - no access restriction
         # Check for member variable
-        field_match = re.search(field_pattern, stripped)
-        if field_match:
-            field_type = field_match.group(1).strip()
-            field_name = field_match.group(2).strip()
-            # Skip if it looks like a method declaration (has parentheses) or is a keyword
-            if '(' not in stripped and ')' not in stripped and field_name not in ['public', 'private', 'protected']:
+        # Skip if it looks like a method declaration (has parentheses)
+        if '(' in stripped or ')' in stripped:
+            continue
+        
+        # Field declarations: "int a;", "StdString name;" or "int a, b;"
+        declarations = parse_field_declarations(stripped, file_path=file_path,
+                                                line_number=line_num)
+        for field_type, field_name in declarations:
+            # Skip keywords
+            if field_name not in ['public', 'private', 'protected']:
                 fields.append({
                     'type': field_type,
                     'name': field_name
@@ -137,6 +159,8 @@ def extract_all_fields(file_path: str, class_name: str) -> List[Dict[str, str]]:
 
 def main():
     """Main function to handle command line arguments."""
+    import argparse
+    
     parser = argparse.ArgumentParser(
         description="Extract public fields from a Dto class"
     )
@@ -167,6 +191,8 @@ extract_public_fields = extract_all_fields
 # Export functions for other scripts to import
 __all__ = [
     'find_class_boundaries',
+    'find_class_boundaries_in_lines',
+    'read_class_index',
     'extract_all_fields',
     'extract_public_fields',
     'main'
@@ -5,7 +5,6 @@ S3 Inject Serialization Script
 This script injects Serialize() and Deserialize() methods into Dto classes.
 """
 
-import argparse
 import sys
 import os
 import re
@@ -16,9 +15,16 @@ from typing import List, Dict, Optional
 # print("Executing NayanSerializer/scripts/serializer/S3_inject_serialization.py")
 # Add parent directory to path for imports
 script_dir = os.path.dirname(os.path.abspath(__file__))
-sys.path.insert(0, script_dir)
+if script_dir not in sys.path:
+    sys.path.insert(0, script_dir)
+core_dir = os.path.join(os.path.dirname(script_dir), 'serializationlib_core')
+if core_dir not in sys.path:
+    sys.path.insert(0, core_dir)
 
 try:
+    from serializationlib_file_writer import write_if_changed
+    from serializationlib_generated_blocks import begin_marker, block_hash, end_marker, find_generated_blocks
+    from serializationlib_header_document import HeaderDocument
     import S1_check_dto_macro
     import S2_extract_dto_fields
     import S6_discover_validation_macros
@@ -60,39 +66,13 @@ def add_include_if_needed(file_path: str, include_path: str) -> bool:
     Returns:
         True if include was added or already exists, False on error
     """
-    if check_include_exists(file_path, include_path.replace('<', '').replace('>', '').replace('"', '')):
-        return True
-    
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            lines = file.readlines()
-        
-        # Find the last #include line
-        last_include_idx = -1
-        for i, line in enumerate(lines):
-            if line.strip().startswith('#include'):
-                last_include_idx = i
-        
-        # Insert after the last include
-        if last_include_idx >= 0:
-            lines.insert(last_include_idx + 1, f'#include {include_path}\n')
-        else:
-            # No includes found, add after header guard
-            for i, line in enumerate(lines):
-                if line.strip().startswith('#define') and '_H' in line:
-                    lines.insert(i + 1, f'#include {include_path}\n')
-                    break
-        
-        with open(file_path, 'w', encoding='utf-8') as file:
-            file.writelines(lines)
-        
-        return True
-    except Exception as e:
-        # print(f"Error adding include: {e}")
-        # print(f"Error adding include: {e}")
+    document = HeaderDocument.load(file_path)
+    if document is None:
+        return False
+    document.add_include(include_path)
+    return document.save()
 
 
-        pass
 def is_optional_type(field_type: str) -> bool:
     """
     Check if a field type is an optional type.
@@ -126,6 +106,36 @@ def extract_inner_type_from_optional(field_type: str) -> str:
     return field_type
 
 
+def order_validation_fields(fields: List[Dict[str, str]], validation_fields_by_macro: Dict[str, List[Dict[str, str]]]) -> List[tuple]:
+    """
+    Order validation macros and their fields independently of the registry order.
+    
+    The registry is keyed in the order validation sources were scanned, so its order can
+    change without the class changing. Macros are ordered by their first field in
+    declaration order; macros on the same field keep the order given (S7 returns them
+    in annotation order). Fields keep declaration order.
+    
+    Args:
+        fields: List of field dictionaries in declaration order (from S2)
+        validation_fields_by_macro: Dictionary mapping validation macro names to lists of fields
+        
+    Returns:
+        List of (macro_name, fields_list) tuples
+    """
+    positions = {}
+    for index, field in enumerate(fields):
+        positions.setdefault(field['name'], index)
+    unknown = len(positions)
+    
+    ordered = []
+    for macro_name, fields_list in validation_fields_by_macro.items():
+        sorted_fields = sorted(fields_list, key=lambda field: positions.get(field['name'], unknown))
+        first = positions.get(sorted_fields[0]['name'], unknown) if sorted_fields else unknown
+        ordered.append((first, macro_name, sorted_fields))
+    ordered.sort(key=lambda item: item[0])
+    return [(macro_name, fields_list) for _, macro_name, fields_list in ordered]
+
+
 def generate_serialization_methods(class_name: str, fields: List[Dict[str, str]], validation_fields_by_macro: Dict[str, List[Dict[str, str]]] = None) -> str:
     """
     Generate Serialize() and Deserialize() methods for a Dto class.
@@ -141,6 +151,8 @@ def generate_serialization_methods(class_name: str, fields: List[Dict[str, str]]
     """
     if validation_fields_by_macro is None:
         validation_fields_by_macro = {}
+    # Emit validations in a fixed order so the same class always produces the same bytes
+    ordered_validation_fields = order_validation_fields(fields, validation_fields_by_macro)
     code_lines = []
     
     # Generate Serialize() method
@@ -230,7 +242,7 @@ def generate_serialization_methods(class_name: str, fields: List[Dict[str, str]]
                           'unsigned', 'UInt', 'CUInt', 'short', 'Short', 'CShort']
         
         # Generate validation calls for each validation macro type
-        for macro_name, fields_list in validation_fields_by_macro.items():
+        for macro_name, fields_list in ordered_validation_fields:
             for field in fields_list:
                 field_name = field['name']
                 field_type = field['type'].strip()
@@ -350,7 +362,7 @@ def generate_serialization_methods(class_name: str, fields: List[Dict[str, str]]
             if is_validated:
                 # Find which validation macros apply to this field
                 validation_macros = []
-                for macro_name, fields_list in validation_fields_by_macro.items():
+                for macro_name, fields_list in ordered_validation_fields:
                     if any(f['name'] == field_name for f in fields_list):
                         validation_macros.append(macro_name)
                 validation_desc = "+".join(validation_macros) if validation_macros else "validated"
@@ -418,6 +430,29 @@ def generate_serialization_methods(class_name: str, fields: List[Dict[str, str]]
     return "\n".join(code_lines)
 
 
+def generate_class_include(class_name: str, methods_code: str, source_name: str) -> str:
+    """
+    Generate the out-of-tree include file with the serialization methods of a class.
+    
+    The file is included inside the class body, so it holds only member functions.
+    
+    Args:
+        class_name: Name of the class
+        methods_code: Code from generate_serialization_methods
+        source_name: File name of the header that declares the class
+        
+    Returns:
+        Content of <class_name>.serialization.inc
+    """
+    header_lines = [
+        f"// Generated by serializationlib from {source_name}. Do not edit.",
+        f"// Include inside the body of class {class_name}.",
+        "",
+        ""
+    ]
+    return "\n".join(header_lines) + methods_code + "\n"
+
+
 def mark_dto_annotation_processed(file_path: str, dry_run: bool = False, serializable_annotation: str = "Serializable") -> bool:
     """
     Replace the @Serializable or @Entity annotation with processed marker in a C++ file.
@@ -484,8 +519,7 @@ def mark_dto_annotation_processed(file_path: str, dry_run: bool = False, seriali
         
         # Write back to file if modifications were made and not dry run
         if modified and not dry_run:
-            with open(file_path, 'w', encoding='utf-8') as file:
-                file.writelines(modified_lines)
+            write_if_changed(file_path, ''.join(modified_lines))
             # print(f"✓ Marked {annotation_name} annotation as processed in: {file_path}")
             # print(f"✓ Marked {annotation_name} annotation as processed in: {file_path}")
             # print(f"  Would mark {annotation_name} annotation as processed in: {file_path}")
@@ -503,6 +537,41 @@ def mark_dto_annotation_processed(file_path: str, dry_run: bool = False, seriali
         # print(f"Error modifying file '{file_path}': {e}")
         # print(f"Error modifying file '{file_path}': {e}")
         return False
+
+
+def mark_dto_annotations_in_document(document: HeaderDocument, line_numbers: List[int], serializable_annotation: str = "Serializable") -> bool:
+    """
+    Record the replacement of the @Serializable or @Entity annotation on specific lines with the processed marker.
+    
+    Args:
+        document: HeaderDocument to record the edits in
+        line_numbers: Line numbers (1-based) of the annotations to mark
+        serializable_annotation: Name of the annotation identifier (Serializable -> @Serializable, _Entity -> @Entity)
+        
+    Returns:
+        True if at least one line was marked
+    """
+    # Determine annotation name based on annotation identifier
+    if serializable_annotation == "_Entity":
+        annotation_name = "@Entity"
+    else:
+        annotation_name = "@Serializable"
+    
+    annotation_pattern = rf'^/\*\s*{re.escape(annotation_name)}\s*\*/\s*$'
+    
+    modified = False
+    for line_num in line_numbers:
+        if not 1 <= line_num <= len(document.lines):
+            continue
+        line = document.lines[line_num - 1]
+        if re.match(annotation_pattern, line.strip()):
+            # Replace with processed marker, preserving original indentation
+            indent = len(line) - len(line.lstrip(' '))
+            document.replace_line(line_num, ' ' * indent + f'/*--{annotation_name}--*/\n')
+            modified = True
+    return modified
+
+
 # Backward compatibility alias
 def comment_dto_macro(file_path: str, dry_run: bool = False, serializable_macro: str = "Serializable") -> bool:
     """
@@ -512,33 +581,47 @@ def comment_dto_macro(file_path: str, dry_run: bool = False, serializable_macro:
     return mark_dto_annotation_processed(file_path, dry_run, serializable_macro)
 
 
-def inject_methods_into_class(file_path: str, class_name: str, methods_code: str, dry_run: bool = False) -> bool:
+def inject_methods_into_document(document: HeaderDocument, class_name: str, methods_code: str, start_line: int = 1) -> Optional[bool]:
     """
-    Inject serialization methods into a class before the closing brace.
+    Record the injection of serialization methods before the closing brace of a class.
+    
+    The methods are wrapped in begin/end markers carrying a hash of the code. If the
+    class already has a generated block, it is replaced only when the hash differs.
     
     Args:
-        file_path: Path to the C++ file
+        document: HeaderDocument to record the edit in
         class_name: Name of the class
         methods_code: Code to inject
-        dry_run: If True, don't actually modify the file
+        start_line: Line number (1-based) to start searching for the class from
         
     Returns:
-        True if successful, False otherwise
+        True if the methods will be injected or replaced, False if they are up to date
+        (or were written by hand), None if the class could not be found
     """
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            lines = file.readlines()
-    except Exception as e:
-        # print(f"Error reading file: {e}")
-        # print(f"Error reading file: {e}")
-        return False
+    lines = document.lines
     # Find class boundaries
-    boundaries = S2_extract_dto_fields.find_class_boundaries(file_path, class_name)
+    boundaries = S2_extract_dto_fields.find_class_boundaries_in_lines(lines, class_name, start_line,
+                                                                      class_index=document.class_index)
     if not boundaries:
         # print(f"Error: Could not find class boundaries for {class_name}")
         # print(f"Error: Could not find class boundaries for {class_name}")
-        return False
+        return None
     start_line, end_line = boundaries
+    code_hash = block_hash(methods_code)
+    
+    # Replace the generated block of a previous run if the model changed
+    block = find_generated_blocks(lines[start_line - 1:end_line]).get(class_name)
+    if block:
+        if block['hash'] == code_hash:
+            return False
+        begin_line = start_line + block['begin_line'] - 1
+        end_block_line = start_line + block['end_line'] - 1
+        begin_text = lines[begin_line - 1]
+        indent = begin_text[:len(begin_text) - len(begin_text.lstrip())]
+        block_lines = _wrap_methods(class_name, methods_code, code_hash, indent)
+        start = document.offset_of_line(begin_line)
+        document.replace(start, document.offset_of_line(end_block_line + 1), ''.join(block_lines))
+        return True
     
     # Find the closing brace line (should be end_line)
     # Look for the line with just "};" or "} ;"
@@ -549,12 +632,7 @@ def inject_methods_into_class(file_path: str, class_name: str, methods_code: str
     if 'Serialize()' in class_content and 'Deserialize(' in class_content:
         # print(f"ℹ️  Serialization methods already exist in {class_name}")
         # print(f"ℹ️  Serialization methods already exist in {class_name}")
-        # Methods already exist, return True without injecting again
-        return True
-    if dry_run:
-        # print(f"Would inject methods before line {end_line}:")
-        # print(f"Would inject methods before line {end_line}:")
-        return True
+        return False
     
     # Insert methods before the closing brace
     # Find the last non-empty, non-comment line before the closing brace
@@ -565,8 +643,6 @@ def inject_methods_into_class(file_path: str, class_name: str, methods_code: str
             insert_idx = i + 1
             break
     
-    # Insert the methods code
-    methods_lines = methods_code.split('\n')
     # Add proper indentation to match class indentation
     indent = "    "  # Default 4 spaces
     if insert_idx > 0 and lines[insert_idx - 1]:
@@ -575,30 +651,86 @@ def inject_methods_into_class(file_path: str, class_name: str, methods_code: str
         if leading_spaces > 0:
             indent = lines[insert_idx - 1][:leading_spaces]
     
-    # Indent each line (except empty lines)
-    indented_methods = []
-    for line in methods_lines:
+    # Insert with a blank line before
+    document.insert_lines(insert_idx + 1, ['\n'] + _wrap_methods(class_name, methods_code, code_hash, indent))
+    return True
+
+
+def _wrap_methods(class_name: str, methods_code: str, code_hash: str, indent: str) -> List[str]:
+    # Indent each line (except empty lines) and wrap the methods in block markers
+    block_lines = [begin_marker(class_name, code_hash, indent)]
+    for line in methods_code.split('\n'):
         if line.strip():  # Non-empty line
-            indented_methods.append(indent + line + '\n')
+            block_lines.append(indent + line + '\n')
         else:  # Empty line
-            indented_methods.append('\n')
+            block_lines.append('\n')
+    block_lines.append(end_marker(class_name, indent))
+    return block_lines
+
+
+def inject_methods_into_class(file_path: str, class_name: str, methods_code: str, dry_run: bool = False) -> bool:
+    """
+    Inject serialization methods into a class before the closing brace.
     
-    # Insert with a blank line before
-    lines[insert_idx:insert_idx] = ['\n'] + indented_methods
+    Args:
+        file_path: Path to the C++ file
+        class_name: Name of the class
+        methods_code: Code to inject
+        dry_run: If True, don't actually modify the file
+        
+    Returns:
+        True if successful, False otherwise
+    """
+    document = HeaderDocument.load(file_path)
+    if document is None:
+        # print(f"Error reading file: {file_path}")
+        return False
     
-    # Write back to file
-    try:
-        with open(file_path, 'w', encoding='utf-8') as file:
-            file.writelines(lines)
-        # print(f"✅ Injected serialization methods into {class_name}")
-        # print(f"✅ Injected serialization methods into {class_name}")
-        return True
-    except Exception as e:
-        # print(f"Error writing file: {e}")
-        # print(f"Error writing file: {e}")
+    if inject_methods_into_document(document, class_name, methods_code) is None:
         return False
+    # print(f"✅ Injected serialization methods into {class_name}")
+    return document.save(dry_run=dry_run)
+
+
+def inject_methods_into_classes(document: HeaderDocument, class_methods: List[Dict[str, any]], includes: List[str] = (),
+                                serializable_annotation: str = "Serializable") -> int:
+    """
+    Record method injection, annotation markers and includes for several classes of one header.
+    
+    All edits refer to the original line numbers, so the lines found by S1 stay valid;
+    nothing is written until document.save().
+    
+    Args:
+        document: HeaderDocument to record the edits in
+        class_methods: List of dictionaries with 'class_name', 'methods_code', 'dto_line',
+                       'class_line' and 'processed' (as returned by find_dto_annotations)
+        includes: Include paths to add if missing (e.g., "<optional>")
+        serializable_annotation: Name of the annotation identifier (Serializable -> @Serializable, _Entity -> @Entity)
+        
+    Returns:
+        Number of classes that were injected, regenerated, or had a live annotation
+    """
+    processed = 0
+    for class_info in class_methods:
+        injected = inject_methods_into_document(document, class_info['class_name'], class_info['methods_code'],
+                                                class_info['class_line'])
+        if injected is None or (not injected and class_info.get('processed')):
+            # Not found, or an already processed class whose block is up to date
+            continue
+        mark_dto_annotations_in_document(document, [class_info['dto_line']], serializable_annotation)
+        processed += 1
+    
+    # Note: ArduinoJson.h is already included in NayanSerializer.h, so no need to add it here
+    if processed:
+        for include_path in includes:
+            document.add_include(include_path)
+    return processed
+
+
 def main():
     """Main function to handle command line arguments and inject serialization methods."""
+    import argparse
+    
     parser = argparse.ArgumentParser(
         description="Inject Serialize() and Deserialize() methods into Dto classes"
     )
@@ -735,10 +867,15 @@ __all__ = [
     'add_include_if_needed',
     'is_optional_type',
     'extract_inner_type_from_optional',
+    'order_validation_fields',
     'generate_serialization_methods',
+    'generate_class_include',
     'mark_dto_annotation_processed',
+    'mark_dto_annotations_in_document',
     'comment_dto_macro',  # Keep for backward compatibility
+    'inject_methods_into_document',
     'inject_methods_into_class',
+    'inject_methods_into_classes',
     'main'
 ]
 
@@ -9,7 +9,6 @@ This script checks if a class member has the @NotBlank annotation above it.
 import re
 import sys
 import os
-import argparse
 from pathlib import Path
 from typing import List, Dict, Optional
 
@@ -17,10 +16,13 @@ from typing import List, Dict, Optional
 # print("Executing NayanSerializer/scripts/serializer/S5_check_notblank_macro.py")
 # Add parent directory to path for imports
 script_dir = os.path.dirname(os.path.abspath(__file__))
-sys.path.insert(0, script_dir)
+if script_dir not in sys.path:
+    sys.path.insert(0, script_dir)
 
 try:
     import S2_extract_dto_fields
+    from serializationlib_annotation_scanner import ACCESS, ANNOTATION, events_by_line, find_event, scan_annotations
+    from serializationlib_field_parser import parse_field_declarations
 except ImportError as e:
     # print(f"Error: Could not import required modules: {e}")
     # print(f"Error: Could not import required modules: {e}")
@@ -88,52 +90,47 @@ def extract_notblank_fields(file_path: str, class_name: str) -> List[Dict[str, s
     current_access = None
     
     # Patterns
-    access_pattern = r'^\s*(public|private|protected)\s*:'
-    # Pattern for /* @NotBlank */ or /*@NotBlank*/ annotation (ignoring whitespace)
-    notblank_annotation_pattern = r'/\*\s*@NotBlank\s*\*/'
-    # Pattern for /* @NotNull */ or /*@NotNull*/ annotation (can appear between @NotBlank and field)
-    notnull_annotation_pattern = r'/\*\s*@NotNull\s*\*/'
-    # Field pattern: matches "int a;", "optional<StdString> x;" with optional access specifier
-    field_pattern = r'^\s*(?:Public|Private|Protected)?\s*([A-Za-z_][A-Za-z0-9_<>*&,\s]*?)\s+([A-Za-z_][A-Za-z0-9_]*)\s*[;=]'
+    # /* @NotBlank */ or /*@NotBlank*/ annotation (ignoring whitespace) in scanner events
+    notblank_names = ('@NotBlank',)
+    # /* @NotNull */ or /*@NotNull*/ annotation (can appear between @NotBlank and field)
+    notnull_names = ('@NotNull',)
+    # Annotations that may appear between the annotation and the field
+    skipped_annotation_names = ('@NotNull', '@NotEmpty', '@NotBlank', '@Id', '@Entity', '@Serializable')
+    # Field declarations ("int a;", "optional<StdString> x;" with optional access specifier)
+    # are read by parse_field_declarations
     
-    i = 0
-    while i < len(class_lines):
-        line = class_lines[i]
-        stripped = line.strip()
+    # One scan of the file; only lines of the class with an annotation or access specifier are visited
+    line_events = events_by_line(event for event in scan_annotations(lines) if start_line <= event.line <= end_line)
+    
+    for line_num, events_on_line in line_events.items():
+        stripped = lines[line_num - 1].strip()
+        i = line_num - start_line
+        notblank_event = find_event(events_on_line, ANNOTATION, notblank_names)
         
         # Skip other comments that aren't @NotBlank annotations
         # But allow /* @NotBlank */ annotations to be processed
-        if stripped.startswith('/*') and not re.search(notblank_annotation_pattern, stripped):
-            i += 1
+        if stripped.startswith('/*') and not notblank_event:
             continue
         # Skip single-line comments
         if stripped.startswith('//'):
-            i += 1
-            continue
-        
-        # Skip empty lines
-        if not stripped:
-            i += 1
             continue
         
         # Check for access specifier (case insensitive)
-        access_match = re.search(access_pattern, stripped, re.IGNORECASE)
-        if access_match:
-            current_access = access_match.group(1).lower()
-            i += 1
+        access_event = find_event(events_on_line, ACCESS)
+        if access_event:
+            current_access = access_event.name.lower()
             continue
         
         # Check for @NotBlank annotation (/* @NotBlank */ or /*@NotBlank*/)
-        notblank_match = re.search(notblank_annotation_pattern, stripped)
-        if notblank_match:
+        if notblank_event:
             # Look ahead for field declaration (within next 10 lines, may have @NotNull in between)
-            found_field = False
             for j in range(i + 1, min(i + 11, len(class_lines))):
                 next_line = class_lines[j].strip()
+                next_events = line_events.get(start_line + j)
                 
                 # Skip other comments that aren't annotations
                 # But allow /* @NotNull */, /* @NotBlank */, etc. annotations to be processed
-                if next_line.startswith('/*') and not re.search(r'/\*\s*@(NotNull|NotEmpty|NotBlank|Id|Entity|Serializable)\s*\*/', next_line):
+                if next_line.startswith('/*') and not find_event(next_events, ANNOTATION, skipped_annotation_names):
                     continue
                 # Skip single-line comments
                 if next_line.startswith('//'):
@@ -144,41 +141,38 @@ def extract_notblank_fields(file_path: str, class_name: str) -> List[Dict[str, s
                     continue
                 
                 # Skip @NotNull annotation (can appear between @NotBlank and field)
-                if re.search(notnull_annotation_pattern, next_line):
+                if find_event(next_events, ANNOTATION, notnull_names):
                     continue
                 
                 # Check for field declaration
-                field_match = re.search(field_pattern, next_line)
-                if field_match:
-                    field_type = field_match.group(1).strip()
-                    field_name = field_match.group(2).strip()
+                declarations = parse_field_declarations(next_line, access_prefix=True, file_path=file_path,
+                                                        line_number=start_line + j)
+                if declarations:
                     # Skip if it looks like a method declaration
-                    if '(' not in next_line and ')' not in next_line and field_name not in ['public', 'private', 'protected']:
-                        # Only include if it's a string type (@NotBlank only applies to strings)
-                        if is_string_type(field_type):
-                            notblank_fields.append({
-                                'type': field_type,
-                                'name': field_name,
-                                'access': current_access if current_access else 'none'
-                            })
-                        found_field = True
+                    if '(' not in next_line and ')' not in next_line:
+                        # The annotation applies to every declarator of the line
+                        for field_type, field_name in declarations:
+                            # Only include if it's a string type (@NotBlank only applies to strings)
+                            if field_name not in ['public', 'private', 'protected'] and is_string_type(field_type):
+                                notblank_fields.append({
+                                    'type': field_type,
+                                    'name': field_name,
+                                    'access': current_access if current_access else 'none'
+                                })
                     break
                 
                 # Stop if we hit another annotation or access specifier
-                if next_line and (re.search(access_pattern, next_line, re.IGNORECASE) or 
+                if next_line and (find_event(next_events, ACCESS) or 
                                  re.search(r'^\s*(Dto|Serializable|COMPONENT|SCOPE|VALIDATE|///\s*@(NotNull|NotEmpty|NotBlank|Id|Entity|Serializable))\s*$', next_line)):
                     break
-            
-            i += 1
-            continue
-        
-        i += 1
     
     return notblank_fields
 
 
 def main():
     """Main function to handle command line arguments."""
+    import argparse
+    
     parser = argparse.ArgumentParser(
         description="Extract fields with @NotBlank annotation from a class (string types only)"
     )
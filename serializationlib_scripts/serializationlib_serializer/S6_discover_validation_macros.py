@@ -16,53 +16,34 @@ from typing import Dict, List, Optional
 
 # print("Executing NayanSerializer/scripts/serializer/S6_discover_validation_macros.py")
 # print("Executing NayanSerializer/scripts/serializer/S6_discover_validation_macros.py")
-# Import get_client_files from serializationlib_core
-# First, find the serializationlib_scripts directory to add to path
-try:
-    script_file = os.path.abspath(__file__)
-    current_dir = os.path.dirname(script_file)
-    # current_dir is serializationlib_serializer/, so parent is serializationlib_scripts/
-    serializationlib_scripts_dir = os.path.dirname(current_dir)
-except NameError:
-    # __file__ not available, try to find from globals or search
-    serializationlib_scripts_dir = None
-    if 'library_scripts_dir' in globals():
-        serializationlib_scripts_dir = str(globals()['library_scripts_dir'])
-    elif 'library_dir' in globals():
-        # library_dir is parent of serializationlib_scripts
-        potential = os.path.join(str(globals()['library_dir']), 'serializationlib_scripts')
-        if os.path.exists(potential):
-            serializationlib_scripts_dir = potential
-    else:
-        # Search from current directory
-        search_dir = os.getcwd()
-        for _ in range(5):  # Search up to 5 levels
-            potential = os.path.join(search_dir, 'serializationlib_scripts')
-            if os.path.exists(potential) and os.path.isdir(potential):
-                serializationlib_scripts_dir = potential
-                break
-            parent = os.path.dirname(search_dir)
-            if parent == search_dir:  # Reached root
-                break
-            search_dir = parent
+# Add serializationlib_core (sibling of this directory) to path for imports
+script_dir = os.path.dirname(os.path.abspath(__file__))
+core_dir = os.path.join(os.path.dirname(script_dir), 'serializationlib_core')
+if core_dir not in sys.path:
+    sys.path.insert(0, core_dir)
 
-# Add to path and import
 get_client_files = None
-if serializationlib_scripts_dir and os.path.exists(serializationlib_scripts_dir):
-    core_dir = os.path.join(serializationlib_scripts_dir, 'serializationlib_core')
-    if os.path.exists(core_dir):
-        sys.path.insert(0, core_dir)
-        try:
-            from serializationlib_get_client_files import get_client_files
-        except ImportError as e:
-            # print(f"Warning: Could not import get_client_files: {e}")
-            # print(f"Warning: Could not import get_client_files: {e}")
-            pass
-        # print(f"Warning: Could not find serializationlib_core directory at {core_dir}")
-        # print(f"Warning: Could not find serializationlib_core directory at {core_dir}")
-    # print(f"Warning: Could not find serializationlib_scripts directory")
-    # print(f"Warning: Could not find serializationlib_scripts directory")
-def find_validation_macro_definitions(search_directories: List[str] = None) -> Dict[str, str]:
+has_validation_macro = None
+load_library_manifest = None
+try:
+    from serializationlib_get_client_files import get_client_files
+    from serializationlib_library_manifest import load_library_manifest
+    from serializationlib_prefilter import has_validation_macro
+except ImportError as e:
+    # print(f"Warning: Could not import get_client_files: {e}")
+    # print(f"Warning: Could not import get_client_files: {e}")
+    pass
+
+# Pattern to match: #define MacroName /* Validation Function -> FunctionName */
+# FunctionName can include namespaces (e.g., nayan::validation::DtoValidationUtility::ValidateNotNull)
+# No / may come before #define, so commented lines (// #define ...) are skipped
+# Capture group 1: macro name, group 2: function name (with optional namespaces)
+VALIDATION_MACRO_PATTERN = re.compile(
+    r'^[^/]*#define\s+(\w+)\s+/\*\s*Validation\s+Function\s*->\s*([^\*]+?)\s*\*/', re.IGNORECASE
+)
+
+
+def find_validation_macro_definitions(search_directories: List[str] = None, scan_context=None) -> Dict[str, str]:
     """
     Discover all validation macros by scanning files for the pattern:
     #define MacroName /* Validation Function -> FunctionName */
@@ -73,6 +54,7 @@ def find_validation_macro_definitions(search_directories: List[str] = None) -> D
     
     Args:
         search_directories: List of directories to search (default: uses get_client_files for project_dir and library_dir)
+        scan_context: Optional ScanContext providing the file list and cached file contents
         
     Returns:
         Dictionary mapping macro names to validation function names
@@ -80,16 +62,13 @@ def find_validation_macro_definitions(search_directories: List[str] = None) -> D
     """
     validation_macros = {}
     
-    # Pattern to match: #define MacroName /* Validation Function -> FunctionName */
-    # FunctionName can include namespaces (e.g., nayan::validation::DtoValidationUtility::ValidateNotNull)
-    # Skip commented lines (lines starting with //)
-    # Capture group 1: macro name, group 2: function name (with optional namespaces)
-    pattern = r'^[^/]*#define\s+(\w+)\s+/\*\s*Validation\s+Function\s*->\s*([^\*]+?)\s*\*/'
-    
     header_files = []
     
+    # If a ScanContext is provided, build the registry from its file list, re-scanning only changed files
+    if search_directories is None and scan_context is not None:
+        return build_validation_registry(scan_context)
     # If search_directories is None, use get_client_files to get files from both project_dir and library_dir
-    if search_directories is None:
+    elif search_directories is None:
         if get_client_files is not None:
             # Get project_dir and library_dir from environment variables (set by execute_scripts)
             # or from module globals as fallback
@@ -111,8 +90,12 @@ def find_validation_macro_definitions(search_directories: List[str] = None) -> D
                     # print(f"Warning: Failed to get client files from project_dir: {e}")
                     # print(f"Warning: Failed to get client files from project_dir: {e}")
                     pass
+            # A manifest in the library's library.json names its validation headers directly
+            manifest = load_library_manifest(library_dir) if load_library_manifest is not None else None
+            if manifest is not None and manifest['validation'] is not None:
+                header_files.extend(manifest['validation'])
             # Get files from library_dir (all files, not just headers, since validation macros might be in any file)
-            if library_dir:
+            elif library_dir:
                 try:
                     library_files = get_client_files(library_dir, skip_exclusions=True)
                     # Filter to only header files for consistency
@@ -141,32 +124,18 @@ def find_validation_macro_definitions(search_directories: List[str] = None) -> D
     # If we have header_files list, use it directly
     if header_files:
         for file_path in header_files:
-            if not os.path.exists(file_path):
-                continue
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-                    
-                # Check each line (skip commented lines)
-                for line in lines:
-                    # Skip lines that are commented out (single-line comments)
-                    stripped = line.strip()
-                    if stripped.startswith('//'):
+                if scan_context is not None:
+                    if not scan_context.exists(file_path):
                         continue
+                    lines = scan_context.read_lines(file_path)
+                else:
+                    if not os.path.exists(file_path):
+                        continue
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        lines = f.readlines()
                     
-                    # Skip lines that have // before the #define (inline comments)
-                    if '//' in line:
-                        comment_pos = line.find('//')
-                        define_pos = line.find('#define')
-                        if define_pos != -1 and comment_pos != -1 and comment_pos < define_pos:
-                            continue
-                    
-                    # Find matches in non-commented lines
-                    match = re.search(pattern, line, re.IGNORECASE)
-                    if match:
-                        macro_name = match.group(1).strip()
-                        function_name = match.group(2).strip()
-                        validation_macros[macro_name] = function_name
+                validation_macros.update(extract_validation_macros_from_lines(lines))
                         
             except Exception as e:
                 # Skip files that can't be read
@@ -191,29 +160,7 @@ def find_validation_macro_definitions(search_directories: List[str] = None) -> D
                             with open(file_path, 'r', encoding='utf-8') as f:
                                 lines = f.readlines()
                                 
-                            # Check each line (skip commented lines)
-                            for line in lines:
-                                # Skip lines that are commented out (single-line comments)
-                                stripped = line.strip()
-                                if stripped.startswith('//'):
-                                    continue
-                                
-                                # Skip lines that have // before the #define (inline comments)
-                                # Check if there's a // before any potential #define
-                                if '//' in line:
-                                    # Find position of // and #define
-                                    comment_pos = line.find('//')
-                                    define_pos = line.find('#define')
-                                    # If // comes before #define, skip this line
-                                    if define_pos != -1 and comment_pos != -1 and comment_pos < define_pos:
-                                        continue
-                                
-                                # Find matches in non-commented lines
-                                match = re.search(pattern, line, re.IGNORECASE)
-                                if match:
-                                    macro_name = match.group(1).strip()
-                                    function_name = match.group(2).strip()
-                                    validation_macros[macro_name] = function_name
+                            validation_macros.update(extract_validation_macros_from_lines(lines))
                                 
                         except Exception as e:
                             # Skip files that can't be read
@@ -222,6 +169,79 @@ def find_validation_macro_definitions(search_directories: List[str] = None) -> D
     return validation_macros
 
 
+def extract_validation_macros_from_lines(lines: List[str]) -> Dict[str, str]:
+    """
+    Extract validation macro definitions from already loaded lines.
+    
+    Args:
+        lines: File content as a list of lines
+        
+    Returns:
+        Dictionary mapping macro names to validation function names
+    """
+    validation_macros = {}
+    
+    # Check each line; VALIDATION_MACRO_PATTERN skips commented lines
+    for line in lines:
+        match = VALIDATION_MACRO_PATTERN.match(line)
+        if match:
+            macro_name = match.group(1).strip()
+            function_name = match.group(2).strip()
+            validation_macros[macro_name] = function_name
+    
+    return validation_macros
+
+
+def build_validation_registry(scan_context) -> Dict[str, str]:
+    """
+    Build the validation macro registry for a run from the ScanContext file list.
+    
+    Per-file results come from the scan context's ValidationMacroCache when the file is
+    unchanged since the last run. Only the remaining files are prefiltered and parsed;
+    their results are stored in the cache for the next run.
+    
+    Args:
+        scan_context: ScanContext providing the file list, stat results and cached contents
+        
+    Returns:
+        Dictionary mapping macro names to validation function names (project files first,
+        later definitions override earlier ones)
+    """
+    validation_macros = {}
+    cache = scan_context.validation_cache
+    counters = scan_context.counters
+    
+    source_files = scan_context.validation_source_files
+    for file_path in source_files:
+        stat_result = scan_context.stat(file_path)
+        if stat_result is None:
+            continue
+        
+        file_macros = cache.lookup(file_path, stat_result) if cache is not None else None
+        if file_macros is not None:
+            counters['validation_files_unchanged'] += 1
+        else:
+            counters['validation_files_scanned'] += 1
+            if has_validation_macro is not None and not has_validation_macro(file_path):
+                counters['validation_files_skipped'] += 1
+                file_macros = {}
+            else:
+                counters['validation_files_parsed'] += 1
+                try:
+                    file_macros = extract_validation_macros_from_lines(scan_context.read_lines(file_path))
+                except Exception as e:
+                    # Skip files that can't be read
+                    continue
+            if cache is not None:
+                cache.store(file_path, stat_result, file_macros)
+        
+        validation_macros.update(file_macros)
+    
+    if cache is not None:
+        cache.retain_only(source_files)
+    return validation_macros
+
+
 def extract_validation_macros_from_file(file_path: str) -> Dict[str, str]:
     """
     Extract validation macro definitions from a specific file.
@@ -241,37 +261,11 @@ def extract_validation_macros_from_file(file_path: str) -> Dict[str, str]:
     if not os.path.exists(file_path):
         return validation_macros
     
-    # Pattern to match: #define MacroName /* Validation Function -> FunctionName */
-    # FunctionName can include namespaces (e.g., nayan::validation::DtoValidationUtility::ValidateNotNull)
-    pattern = r'#define\s+(\w+)\s+/\*\s*Validation\s+Function\s*->\s*([^\*]+?)\s*\*/'
-    
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
             lines = f.readlines()
             
-        # Check each line (skip commented lines)
-        for line in lines:
-            # Skip lines that are commented out (single-line comments)
-            stripped = line.strip()
-            if stripped.startswith('//'):
-                continue
-            
-            # Skip lines that have // before the #define (inline comments)
-            # Check if there's a // before any potential #define
-            if '//' in line:
-                # Find position of // and #define
-                comment_pos = line.find('//')
-                define_pos = line.find('#define')
-                # If // comes before #define, skip this line
-                if define_pos != -1 and comment_pos != -1 and comment_pos < define_pos:
-                    continue
-            
-            # Find matches in non-commented lines
-            match = re.search(pattern, line, re.IGNORECASE)
-            if match:
-                macro_name = match.group(1).strip()
-                function_name = match.group(2).strip()
-                validation_macros[macro_name] = function_name
+        validation_macros = extract_validation_macros_from_lines(lines)
             
     except Exception as e:
         pass
@@ -314,6 +308,8 @@ def main():
 # Export functions for other scripts to import
 __all__ = [
     'find_validation_macro_definitions',
+    'build_validation_registry',
+    'extract_validation_macros_from_lines',
     'extract_validation_macro_definitions_from_file',
     'main'
 ]
@@ -16,9 +16,16 @@ from typing import List, Dict, Optional, Set
 # print("Executing NayanSerializer/scripts/serializer/S7_extract_validation_fields.py")
 # Add parent directory to path for imports
 script_dir = os.path.dirname(os.path.abspath(__file__))
-sys.path.insert(0, script_dir)
+if script_dir not in sys.path:
+    sys.path.insert(0, script_dir)
+core_dir = os.path.join(os.path.dirname(script_dir), 'serializationlib_core')
+if core_dir not in sys.path:
+    sys.path.insert(0, core_dir)
 
 try:
+    from serializationlib_annotation_scanner import ACCESS, ANNOTATION, events_by_line, find_event, scan_annotations
+    from serializationlib_field_parser import parse_field_declarations
+    from serializationlib_generated_blocks import blank_generated_blocks
     import S2_extract_dto_fields
     import S6_discover_validation_macros
 except ImportError as e:
@@ -79,7 +86,7 @@ def get_validation_function_info(validation_macros: Dict[str, str], macro_name:
     }
 
 
-def extract_validation_fields(file_path: str, class_name: str, validation_macros: Dict[str, str]) -> Dict[str, List[Dict[str, str]]]:
+def extract_validation_fields(file_path: str, class_name: str, validation_macros: Dict[str, str], scan_context=None) -> Dict[str, List[Dict[str, str]]]:
     """
     Extract all fields with validation annotations.
     
@@ -87,21 +94,26 @@ def extract_validation_fields(file_path: str, class_name: str, validation_macros
         file_path: Path to the C++ file
         class_name: Name of the class
         validation_macros: Dictionary mapping annotation names (e.g., 'NotNull') to function names
+        scan_context: Optional ScanContext used to read the file from the shared cache
         
     Returns:
-        Dictionary mapping validation annotation names to lists of fields
+        Dictionary mapping validation annotation names to lists of fields, in the order the
+        annotations first appear in the class (independent of the registry order)
         Example: {'NotNull': [{'type': 'optional<int>', 'name': 'a', 'access': 'none'}], ...}
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            lines = file.readlines()
+        if scan_context is not None:
+            lines = scan_context.read_source_lines(file_path)
+        else:
+            with open(file_path, 'r', encoding='utf-8') as file:
+                lines = blank_generated_blocks(file.readlines())
     except Exception as e:
         # print(f"Error reading file: {e}")
         # print(f"Error reading file: {e}")
     
         pass
     # Find class boundaries
-    boundaries = S2_extract_dto_fields.find_class_boundaries(file_path, class_name)
+    boundaries = S2_extract_dto_fields.find_class_boundaries(file_path, class_name, scan_context=scan_context)
     if not boundaries:
         return {}
     
@@ -113,92 +125,80 @@ def extract_validation_fields(file_path: str, class_name: str, validation_macros
     if not macro_names:
         return {}
     
-    # Create pattern to match any validation annotation (/* @NotNull */, /* @NotEmpty */, /* @NotBlank */, etc.)
-    # Map macro names to annotation patterns (e.g., 'NotNull' -> '/* @NotNull */')
-    annotation_patterns = {}
-    for macro_name in macro_names:
-        annotation_patterns[macro_name] = rf'/\*\s*@{re.escape(macro_name)}\s*\*/'
+    # Validation annotations (/* @NotNull */, /* @NotEmpty */, /* @NotBlank */, etc.) in scanner events,
+    # mapped back to macro names (e.g., '@NotNull' -> 'NotNull')
+    annotation_macros = {f'@{macro_name}': macro_name for macro_name in macro_names}
     
-    # Combined pattern to match any validation annotation
-    all_annotations = '|'.join(annotation_patterns.values())
-    validation_pattern = rf'({all_annotations})'
+    # One scan of the file; only lines of the class with a validation annotation or access specifier are visited
+    if scan_context is not None:
+        events = scan_context.annotation_events(file_path)
+    else:
+        events = scan_annotations(lines)
+    line_events = events_by_line(event for event in events if start_line <= event.line <= end_line)
     
-    # Patterns
-    access_pattern = r'^\s*(public|private|protected)\s*:'
-    field_pattern = r'^\s*(?:Public|Private|Protected)?\s*([A-Za-z_][A-Za-z0-9_<>*&,\s]*?)\s+([A-Za-z_][A-Za-z0-9_]*)\s*[;=]'
-    
-    # Result dictionary: macro_name -> list of fields
-    result = {macro: [] for macro in macro_names}
+    # Result dictionary: macro_name -> list of fields, keyed in order of first use
+    result = {}
     
     current_access = None
-    i = 0
     
-    while i < len(class_lines):
-        line = class_lines[i]
-        stripped = line.strip()
+    for line_num, events_on_line in line_events.items():
+        stripped = lines[line_num - 1].strip()
+        i = line_num - start_line
+        validation_event = find_event(events_on_line, ANNOTATION, annotation_macros)
         
         # Skip comments (but not the annotation itself which is in a comment)
         if stripped.startswith('/*'):
-            i += 1
             continue
         # Skip other single-line comments that aren't annotations
-        if stripped.startswith('//') and not re.search(validation_pattern, stripped):
-            i += 1
-            continue
-        
-        # Skip empty lines
-        if not stripped:
-            i += 1
+        if stripped.startswith('//') and not validation_event:
             continue
         
         # Check for access specifier
-        access_match = re.search(access_pattern, stripped, re.IGNORECASE)
-        if access_match:
-            current_access = access_match.group(1).lower()
-            i += 1
+        access_event = find_event(events_on_line, ACCESS)
+        if access_event:
+            current_access = access_event.name.lower()
             continue
         
         # Check for validation annotation
-        validation_match = re.search(validation_pattern, stripped)
-        if validation_match:
-            # Find which annotation was matched
-            matched_annotation = None
-            for macro_name, pattern in annotation_patterns.items():
-                if re.search(pattern, stripped):
-                    matched_annotation = macro_name
-                    break
+        if validation_event:
+            # Find which annotation was matched (the first in registry order when a line has several)
+            line_macros = {annotation_macros[event.name] for event in events_on_line
+                           if event.kind == ANNOTATION and event.name in annotation_macros}
+            matched_annotation = next(macro_name for macro_name in macro_names if macro_name in line_macros)
+            
+            result.setdefault(matched_annotation, [])
+            validation_info = get_validation_function_info(validation_macros, matched_annotation)
             
-            if matched_annotation:
-                validation_info = get_validation_function_info(validation_macros, matched_annotation)
-                
-                if validation_info:
-                    # Look ahead for field declaration (within next 10 lines, may have other annotations in between)
-                    found_field = False
-                    for j in range(i + 1, min(i + 11, len(class_lines))):
-                        next_line = class_lines[j].strip()
-                        
-                        # Skip comments (but not the annotation itself)
-                        if next_line.startswith('/*'):
-                            continue
-                        # Skip other single-line comments that aren't annotations
-                        if next_line.startswith('//') and not re.search(r'///\s*@(NotNull|NotEmpty|NotBlank|Id|Entity|Serializable)\b', next_line):
-                            continue
-                        
-                        # Skip empty lines
-                        if not next_line:
-                            continue
-                        
-                        # Skip other validation annotations (can appear between validation annotation and field)
-                        if re.search(validation_pattern, next_line):
-                            continue
-                        
-                        # Check for field declaration
-                        field_match = re.search(field_pattern, next_line)
-                        if field_match:
-                            field_type = field_match.group(1).strip()
-                            field_name = field_match.group(2).strip()
-                            # Skip if it looks like a method declaration
-                            if '(' not in next_line and ')' not in next_line and field_name not in ['public', 'private', 'protected']:
+            if validation_info:
+                # Look ahead for field declaration (within next 10 lines, may have other annotations in between)
+                for j in range(i + 1, min(i + 11, len(class_lines))):
+                    next_line = class_lines[j].strip()
+                    
+                    # Skip comments (but not the annotation itself)
+                    if next_line.startswith('/*'):
+                        continue
+                    # Skip other single-line comments that aren't annotations
+                    if next_line.startswith('//') and not re.search(r'///\s*@(NotNull|NotEmpty|NotBlank|Id|Entity|Serializable)\b', next_line):
+                        continue
+                    
+                    # Skip empty lines
+                    if not next_line:
+                        continue
+                    
+                    # Skip other validation annotations (can appear between validation annotation and field)
+                    if find_event(line_events.get(start_line + j), ANNOTATION, annotation_macros):
+                        continue
+                    
+                    # Check for field declaration
+                    declarations = parse_field_declarations(next_line, access_prefix=True, file_path=file_path,
+                                                            line_number=start_line + j)
+                    if declarations:
+                        # Skip if it looks like a method declaration
+                        if '(' not in next_line and ')' not in next_line:
+                            # The annotation applies to every declarator of the line
+                            for field_type, field_name in declarations:
+                                if field_name in ['public', 'private', 'protected']:
+                                    continue
                                 # Check if validation requires string type
                                 if validation_info['requires_string_type']:
                                     if is_string_type(field_type):
@@ -216,18 +216,12 @@ def extract_validation_fields(file_path: str, class_name: str, validation_macros
                                         'access': current_access if current_access else 'none',
                                         'function_name': validation_info['function_name']
                                     })
-                                found_field = True
-                            break
-                        
-                        # Stop if we hit another annotation or access specifier
-                        if next_line and (re.search(access_pattern, next_line, re.IGNORECASE) or 
-                                         re.search(r'^\s*(Dto|Serializable|COMPONENT|SCOPE|VALIDATE|///\s*@(NotNull|NotEmpty|NotBlank|Id|Entity|Serializable))\s*$', next_line)):
-                            break
-            
-            i += 1
-            continue
-        
-        i += 1
+                        break
+                    
+                    # Stop if we hit another annotation or access specifier
+                    if next_line and (find_event(line_events.get(start_line + j), ACCESS) or 
+                                     re.search(r'^\s*(Dto|Serializable|COMPONENT|SCOPE|VALIDATE|///\s*@(NotNull|NotEmpty|NotBlank|Id|Entity|Serializable))\s*$', next_line)):
+                        break
     
     # Remove empty entries
     return {k: v for k, v in result.items() if v}
@@ -7,26 +7,79 @@ template specialization functions for Serialize and Deserialize.
 """
 
 import re
-import argparse
 import sys
 import os
 from pathlib import Path
 from typing import Optional, Dict, List, Tuple
 
-def check_enum_annotation(file_path: str, serializable_annotation: str = "Serializable") -> Optional[Dict[str, any]]:
+# Add serializationlib_core to path for the header document model
+core_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'serializationlib_core')
+if core_dir not in sys.path:
+    sys.path.insert(0, core_dir)
+
+from serializationlib_annotation_scanner import (
+    ANNOTATION, ENUM, PROCESSED, events_by_line, find_event, scan_annotations
+)
+from serializationlib_generated_blocks import (
+    begin_marker, blank_generated_blocks, block_hash, end_marker, find_generated_blocks
+)
+from serializationlib_header_document import HeaderDocument
+from serializationlib_tokenizer import HeaderTokens
+
+# Enum declaration up to the name
+# Matches: "enum Color {", "enum class Color : uint8_t {" (the body may start on a later line)
+ENUM_DECLARATION_PATTERN = re.compile(r'\benum\s+(?:class\s+|struct\s+)?([A-Za-z_][A-Za-z0-9_]*)\b')
+# Identifiers, numbers, brackets and commas of an enum body
+ENUM_BODY_TOKEN_PATTERN = re.compile(r'\w+|[()\[\]{},]')
+
+
+def check_enum_annotation(file_path: str, serializable_annotation: str = "Serializable", scan_context=None) -> Optional[Dict[str, any]]:
     """
     Check if a C++ file contains an enum with the @Serializable annotation above it.
     
     Args:
         file_path: Path to the C++ file
         serializable_annotation: Name of the annotation identifier (Serializable -> @Serializable)
+        scan_context: Optional ScanContext used to read the file from the shared cache
         
     Returns:
         Dictionary with 'enum_name', 'has_enum', 'annotation_line', 'enum_line' if found, None otherwise
     """
+    enum_infos = find_enum_annotations(file_path, serializable_annotation, scan_context=scan_context)
+    if enum_infos is None:
+        return None
+    if enum_infos:
+        return enum_infos[0]
+    
+    return {
+        'has_enum': False
+    }
+
+
+def find_enum_annotations(file_path: str, serializable_annotation: str = "Serializable", scan_context=None,
+                          include_processed: bool = False) -> Optional[List[Dict[str, any]]]:
+    """
+    Find every enum with the @Serializable annotation in a C++ file and extract its values.
+    
+    The file is read once; values are extracted from the same lines.
+    
+    Args:
+        file_path: Path to the C++ file
+        serializable_annotation: Name of the annotation identifier (Serializable -> @Serializable)
+        scan_context: Optional ScanContext used to read the file from the shared cache
+        include_processed: If True, also return enums whose annotation is already processed
+                           (/*--@Serializable--*/), so their generated block can be refreshed
+        
+    Returns:
+        List of dictionaries with 'enum_name', 'has_enum', 'processed', 'annotation_line', 'enum_line'
+        and 'enum_values' in file order, or None if the file cannot be read
+    """
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            lines = file.readlines()
+        if scan_context is not None:
+            lines = scan_context.read_source_lines(file_path)
+        else:
+            with open(file_path, 'r', encoding='utf-8') as file:
+                lines = blank_generated_blocks(file.readlines())
     except FileNotFoundError:
         return None
     except Exception as e:
@@ -38,57 +91,90 @@ def check_enum_annotation(file_path: str, serializable_annotation: str = "Serial
     else:
         annotation_name = "@Serializable"
     
-    # Pattern to match /* @Serializable */ or /* Serializable */ or /*@Serializable*/
-    annotation_pattern = rf'/\*\s*{re.escape(annotation_name)}\s*\*/|/\*\s*Serializable\s*\*/'
-    processed_pattern = rf'/\*--\s*{re.escape(annotation_name)}\s*--\*/'
+    # Live annotations (/* @Serializable */ or /* Serializable */ or /*@Serializable*/) and
+    # processed markers (/*--@Serializable--*/) in scanner events
+    annotation_names = (annotation_name, 'Serializable')
+    processed_names = (annotation_name,)
+    
+    # A class declaration ends the look ahead: the annotation belongs to the class (S1)
+    class_pattern = r'^(?:template\s*<.*>\s*)?(?:class|struct)\s+[A-Za-z_]'
+    
+    # One scan of the file; only lines with an annotation, declaration or access specifier are visited
+    if scan_context is not None and lines:
+        events = scan_context.annotation_events(file_path)
+    else:
+        events = scan_annotations(lines)
+    line_events = events_by_line(events)
     
-    # Pattern to match enum class declarations
-    enum_pattern = r'enum\s+(?:class\s+)?([A-Za-z_][A-Za-z0-9_]*)\s*(?:[:{])'
+    enum_infos = []
+    seen_enum_lines = set()
+    # Tokenized on the first annotated enum; files without one are never tokenized
+    tokens = None
     
-    for line_num, line in enumerate(lines, 1):
-        stripped_line = line.strip()
+    for line_num, events_on_line in line_events.items():
+        live_annotation = find_event(events_on_line, ANNOTATION, annotation_names)
+        processed_annotation = find_event(events_on_line, PROCESSED, processed_names)
         
         # Check if line is already processed
-        if re.search(processed_pattern, stripped_line):
+        if not include_processed and processed_annotation:
             continue
         
-        # Check for annotation
-        annotation_match = re.search(annotation_pattern, stripped_line)
-        if annotation_match:
-            # Look ahead for enum declaration (within next 20 lines to allow for comments/macros)
-            for i in range(line_num + 1, min(line_num + 21, len(lines) + 1)):  # Start from next line
-                if i <= len(lines):
-                    next_line = lines[i - 1].strip()
-                    
-                    # Skip empty lines
-                    if not next_line:
-                        continue
-                    
-                    # Skip comments (but not the annotation itself)
-                    if next_line.startswith('/*') and not re.search(processed_pattern, next_line):
-                        continue
-                    if next_line.startswith('//'):
-                        continue
-                    
-                    # Check for enum declaration
-                    enum_match = re.search(enum_pattern, next_line)
-                    if enum_match:
-                        enum_name = enum_match.group(1)
-                        return {
-                            'enum_name': enum_name,
-                            'has_enum': True,
-                            'annotation_line': line_num,
-                            'enum_line': i
-                        }
-                    
-                    # Continue searching - don't break early, allow for other text between annotation and enum
+        # Check for annotation; the leftmost one starts the look ahead
+        start_events = [event for event in (live_annotation, processed_annotation) if event]
+        if not start_events:
+            continue
+        annotation_event = min(start_events, key=lambda event: event.start)
+        processed = live_annotation is None
+        # Look ahead for enum declaration (within next 20 lines to allow for comments/macros),
+        # starting with the rest of the annotation line itself
+        for i in range(line_num, min(line_num + 21, len(lines) + 1)):
+            next_line = lines[i - 1].strip()
+            next_events = line_events.get(i)
+            start_column = 0
+            if i == line_num:
+                start_column = annotation_event.end
+                next_line = lines[i - 1][start_column:].strip()
+            
+            # Skip empty lines
+            if not next_line:
+                continue
+            
+            # Skip comments (but not the annotation itself)
+            if next_line.startswith('/*') and not find_event(next_events, PROCESSED, processed_names, start_column):
+                continue
+            if next_line.startswith('//'):
+                continue
+            
+            # Check for enum declaration
+            enum_event = find_event(next_events, ENUM, start=start_column)
+            if enum_event:
+                if i not in seen_enum_lines:
+                    seen_enum_lines.add(i)
+                    enum_name = enum_event.name
+                    if tokens is None:
+                        if scan_context is not None and lines:
+                            tokens = scan_context.header_tokens(file_path)
+                        else:
+                            tokens = HeaderTokens(lines)
+                    enum_infos.append({
+                        'enum_name': enum_name,
+                        'has_enum': True,
+                        'processed': processed,
+                        'annotation_line': line_num,
+                        'enum_line': i,
+                        'enum_values': extract_enum_values_from_lines(lines, enum_name, i, tokens=tokens)
+                    })
+                break
+            
+            if re.search(class_pattern, next_line):
+                break
+            
+            # Continue searching - don't break early, allow for other text between annotation and enum
     
-    return {
-        'has_enum': False
-    }
+    return enum_infos
 
 
-def extract_enum_values(file_path: str, enum_name: str, enum_line: int) -> List[str]:
+def extract_enum_values(file_path: str, enum_name: str, enum_line: int, scan_context=None) -> List[str]:
     """
     Extract enum values from an enum declaration.
     
@@ -96,80 +182,87 @@ def extract_enum_values(file_path: str, enum_name: str, enum_line: int) -> List[
         file_path: Path to the C++ file
         enum_name: Name of the enum
         enum_line: Line number where enum starts
+        scan_context: Optional ScanContext used to read the file from the shared cache
         
     Returns:
         List of enum value names
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            lines = file.readlines()
+        if scan_context is not None:
+            tokens = scan_context.header_tokens(file_path)
+        else:
+            with open(file_path, 'r', encoding='utf-8') as file:
+                tokens = HeaderTokens(blank_generated_blocks(file.readlines()))
     except Exception:
         return []
     
-    enum_values = []
-    brace_count = 0
-    in_enum = False
-    found_opening_brace = False
+    return extract_enum_values_from_lines(tokens.lines, enum_name, enum_line, tokens=tokens)
+
+
+def extract_enum_values_from_lines(lines: List[str], enum_name: str, enum_line: int,
+                                   tokens: Optional[HeaderTokens] = None) -> List[str]:
+    """
+    Extract enum values from an enum declaration in already loaded lines.
     
-    # Start from enum line
-    for i in range(enum_line - 1, len(lines)):
-        line = lines[i]
-        stripped = line.strip()
+    Args:
+        lines: File content as a list of lines
+        enum_name: Name of the enum
+        enum_line: Line number where enum starts
+        tokens: Optional token stream of the lines, to reuse an existing tokenization
         
-        # Check if we're entering the enum
-        if f'enum' in stripped and enum_name in stripped:
-            in_enum = True
-            brace_count = stripped.count('{') - stripped.count('}')
-            if '{' in stripped:
-                found_opening_brace = True
+    Returns:
+        List of enum value names
+    """
+    if tokens is None:
+        tokens = HeaderTokens(lines)
+    
+    body = tokens.find_body(ENUM_DECLARATION_PATTERN, tokens.offset_of_line(enum_line), enum_name)
+    if not body:
+        return []
+    
+    _, open_index, close_index = body
+    # Body without comments, literals and preprocessor lines
+    code = tokens.code(tokens.starts[open_index] + 1, tokens.starts[close_index])
+    
+    # An enum value is the first identifier of each comma-separated entry; commas and
+    # identifiers nested in an initializer (e.g., "A = MAKE(1, 2)") are skipped
+    enum_values = []
+    depth = 0
+    expect_value = True
+    for match in ENUM_BODY_TOKEN_PATTERN.finditer(code):
+        token = match.group()
+        if token in ('(', '[', '{'):
+            depth += 1
+        elif token in (')', ']', '}'):
+            depth -= 1
+        elif depth != 0:
             continue
-        
-        if in_enum:
-            # Track opening brace
-            if '{' in stripped:
-                found_opening_brace = True
-            
-            brace_count += stripped.count('{')
-            brace_count -= stripped.count('}')
-            
-            # Only extract values if we've found the opening brace
-            if found_opening_brace:
-                # Remove comments from line for parsing
-                line_no_comments = re.sub(r'//.*$', '', stripped)  # Remove // comments
-                line_no_comments = re.sub(r'/\*.*?\*/', '', line_no_comments)  # Remove /* */ comments
-                
-                # Extract enum values - pattern: ValueName (optionally followed by = value or comma)
-                # Match: identifier at start of line or after comma/whitespace, before comma or }
-                value_pattern = r'(?:^|\s|,)([A-Za-z_][A-Za-z0-9_]*)\s*(?:=\s*[^,}]+)?\s*(?=,|}|$)'
-                
-                # Find all enum values in this line
-                for match in re.finditer(value_pattern, line_no_comments):
-                    value_name = match.group(1).strip()
-                    # Filter out common keywords and the enum name itself
-                    if (value_name and 
-                        value_name not in enum_values and 
-                        value_name != enum_name and
-                        value_name not in ['if', 'endif', 'define', 'include', 'pragma']):
-                        enum_values.append(value_name)
-            
-            # If braces are balanced and we found the opening brace, we're done
-            if brace_count == 0 and found_opening_brace:
-                break
+        elif token == ',':
+            expect_value = True
+        elif expect_value:
+            expect_value = False
+            if not token[0].isdigit() and token not in enum_values:
+                enum_values.append(token)
     
     return enum_values
 
 
-def generate_enum_serialization_code(enum_name: str, enum_values: List[str]) -> str:
+def generate_enum_serialization_code(enum_name: str, enum_values: List[str],
+                                     qualified_name: Optional[str] = None) -> str:
     """
     Generate template specialization functions for enum serialization/deserialization.
     
     Args:
         enum_name: Name of the enum
         enum_values: List of enum value names
+        qualified_name: Optional namespace-qualified name (e.g., "app::Color"); the
+                        specializations then name the enum from the global namespace
+                        (::app::Color), as needed in an include file outside its namespace
         
     Returns:
         Generated code as string
     """
+    type_name = f"::{qualified_name}" if qualified_name else enum_name
     code_lines = []
     
     code_lines.append("namespace nayan {")
@@ -178,16 +271,16 @@ def generate_enum_serialization_code(enum_name: str, enum_values: List[str]) ->
     
     # Generate Serialize template specialization
     code_lines.append("    /**")
-    code_lines.append(f"     * Serialize {enum_name} enum to JSON string")
+    code_lines.append(f"     * Serialize {type_name} enum to JSON string")
     code_lines.append("     */")
     code_lines.append(f"    template<>")
-    code_lines.append(f"    inline StdString SerializationUtility::Serialize<{enum_name}>(const {enum_name}& value) {{")
+    code_lines.append(f"    inline StdString SerializationUtility::Serialize<{type_name}>(const {type_name}& value) {{")
     code_lines.append("        // Convert enum to string representation")
     code_lines.append("        StdString enumStr;")
     code_lines.append("        switch (value) {")
     
     for value in enum_values:
-        code_lines.append(f"            case {enum_name}::{value}:")
+        code_lines.append(f"            case {type_name}::{value}:")
         code_lines.append(f"                enumStr = \"{value}\";")
         code_lines.append("                break;")
     
@@ -203,10 +296,10 @@ def generate_enum_serialization_code(enum_name: str, enum_values: List[str]) ->
     
     # Generate Deserialize template specialization
     code_lines.append("    /**")
-    code_lines.append(f"     * Deserialize JSON string to {enum_name} enum")
+    code_lines.append(f"     * Deserialize JSON string to {type_name} enum")
     code_lines.append("     */")
     code_lines.append(f"    template<>")
-    code_lines.append(f"    inline {enum_name} SerializationUtility::Deserialize<{enum_name}>(const StdString& input) {{")
+    code_lines.append(f"    inline {type_name} SerializationUtility::Deserialize<{type_name}>(const StdString& input) {{")
     code_lines.append("        // Remove quotes if present")
     code_lines.append("        StdString cleaned = input;")
     code_lines.append("        if (cleaned.length() >= 2 && cleaned.front() == '\\\"' && cleaned.back() == '\\\"') {")
@@ -229,12 +322,12 @@ def generate_enum_serialization_code(enum_name: str, enum_values: List[str]) ->
     for value in enum_values:
         value_lower = value.lower()
         code_lines.append(f"        if (lower == \"{value_lower}\" || cleaned == \"{value}\") {{")
-        code_lines.append(f"            return {enum_name}::{value};")
+        code_lines.append(f"            return {type_name}::{value};")
         code_lines.append("        }")
     
     code_lines.append("        ")
     code_lines.append("        // Default or unknown value")
-    code_lines.append(f"        return {enum_name}::{enum_values[0] if enum_values else 'UNKNOWN'};")
+    code_lines.append(f"        return {type_name}::{enum_values[0] if enum_values else 'UNKNOWN'};")
     code_lines.append("    }")
     code_lines.append("")
     
@@ -244,6 +337,35 @@ def generate_enum_serialization_code(enum_name: str, enum_values: List[str]) ->
     return "\n".join(code_lines)
 
 
+def generate_enum_include(enum_name: str, code: str, source_name: str) -> str:
+    """
+    Generate the out-of-tree include file with the specializations of an enum.
+    
+    The file is included after the enum declaration at global scope and brings
+    its own includes.
+    
+    Args:
+        enum_name: Namespace-qualified name of the enum
+        code: Code from generate_enum_serialization_code
+        source_name: File name of the header that declares the enum
+        
+    Returns:
+        Content of the enum's .serialization.inc
+    """
+    header_lines = [
+        f"// Generated by serializationlib from {source_name}. Do not edit.",
+        f"// Include after the declaration of enum {enum_name}.",
+        "#pragma once",
+        "",
+        "#include <SerializationUtility.h>",
+        "#include <algorithm>",
+        "#include <cctype>",
+        "",
+        ""
+    ]
+    return "\n".join(header_lines) + code + "\n"
+
+
 def find_last_endif(file_path: str) -> Optional[int]:
     """
     Find the line number of the last #endif in the file.
@@ -260,6 +382,19 @@ def find_last_endif(file_path: str) -> Optional[int]:
     except Exception:
         return None
     
+    return find_last_endif_in_lines(lines)
+
+
+def find_last_endif_in_lines(lines: List[str]) -> Optional[int]:
+    """
+    Find the line number of the last #endif in already loaded lines.
+    
+    Args:
+        lines: File content as a list of lines
+        
+    Returns:
+        Line number of last #endif, or None if not found
+    """
     last_endif = None
     for i, line in enumerate(lines, 1):
         stripped = line.strip()
@@ -299,35 +434,11 @@ def add_include_if_needed(file_path: str, include_path: str) -> bool:
     Returns:
         True if include was added or already exists, False on error
     """
-    if check_include_exists(file_path, include_path.replace('<', '').replace('>', '').replace('"', '')):
-        return True
-    
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            lines = file.readlines()
-        
-        # Find the last #include line
-        last_include_idx = -1
-        for i, line in enumerate(lines):
-            if line.strip().startswith('#include'):
-                last_include_idx = i
-        
-        # Insert after the last include
-        if last_include_idx >= 0:
-            lines.insert(last_include_idx + 1, f'#include {include_path}\n')
-        else:
-            # No includes found, add after header guard
-            for i, line in enumerate(lines):
-                if line.strip().startswith('#define') and '_H' in line:
-                    lines.insert(i + 1, f'#include {include_path}\n')
-                    break
-        
-        with open(file_path, 'w', encoding='utf-8') as file:
-            file.writelines(lines)
-        
-        return True
-    except Exception as e:
+    document = HeaderDocument.load(file_path)
+    if document is None:
         return False
+    document.add_include(include_path)
+    return document.save()
 
 
 def inject_enum_code(file_path: str, code: str, dry_run: bool = False) -> bool:
@@ -342,33 +453,34 @@ def inject_enum_code(file_path: str, code: str, dry_run: bool = False) -> bool:
     Returns:
         True if successful, False otherwise
     """
-    last_endif_line = find_last_endif(file_path)
-    if not last_endif_line:
+    document = HeaderDocument.load(file_path)
+    if document is None:
         return False
     
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            lines = file.readlines()
-    except Exception:
+    if inject_enum_code_into_document(document, code) is None:
         return False
+    return document.save(dry_run=dry_run)
+
+
+def inject_enum_code_into_document(document: HeaderDocument, code: str) -> Optional[bool]:
+    """
+    Record the injection of enum serialization code just before the last #endif.
     
-    # Check if code already exists
-    file_content = ''.join(lines)
-    if 'Serialize<' in file_content and 'Deserialize<' in file_content:
-        # Check if it's for this enum specifically
-        # Extract enum name from code
-        serialize_match = re.search(r'Serialize<([A-Za-z_][A-Za-z0-9_]*)>', code)
-        if serialize_match:
-            enum_name = serialize_match.group(1)
-            if f'Serialize<{enum_name}>' in file_content:
-                # Already exists
-                return True
-    
-    if dry_run:
-        return True
+    The code is wrapped in begin/end markers carrying a hash of the code. If the enum
+    already has a generated block, it is replaced only when the hash differs.
     
-    # Insert code before last #endif
-    insert_idx = last_endif_line - 1  # Convert to 0-indexed
+    Args:
+        document: HeaderDocument to record the edit in
+        code: Code to inject
+        
+    Returns:
+        True if the code will be injected or replaced, False if it is up to date,
+        None if there is no #endif
+    """
+    # Extract enum name from code
+    serialize_match = re.search(r'Serialize<([A-Za-z_][A-Za-z0-9_]*)>', code)
+    enum_name = serialize_match.group(1) if serialize_match else None
+    code_hash = block_hash(code)
     
     # Add proper indentation
     code_lines = code.split('\n')
@@ -378,17 +490,62 @@ def inject_enum_code(file_path: str, code: str, dry_run: bool = False) -> bool:
             indented_code.append(line + '\n')
         else:
             indented_code.append('\n')
+    if enum_name:
+        indented_code = [begin_marker(enum_name, code_hash)] + indented_code + [end_marker(enum_name)]
+    
+    # Replace the generated block of a previous run if the enum values changed
+    block = find_generated_blocks(document.lines).get(enum_name) if enum_name else None
+    if block:
+        if block['hash'] == code_hash:
+            return False
+        start = document.offset_of_line(block['begin_line'])
+        document.replace(start, document.offset_of_line(block['end_line'] + 1), ''.join(indented_code))
+        return True
     
-    # Insert with blank line before
-    lines[insert_idx:insert_idx] = ['\n'] + indented_code
+    last_endif_line = find_last_endif_in_lines(document.lines)
+    if not last_endif_line:
+        return None
     
-    # Write back to file
-    try:
-        with open(file_path, 'w', encoding='utf-8') as file:
-            file.writelines(lines)
-        return True
-    except Exception as e:
+    # Check if code already exists
+    file_content = document.text
+    if enum_name and f'Serialize<{enum_name}>' in file_content and 'Deserialize<' in file_content:
+        # Already exists
         return False
+    
+    # Insert with blank line before the last #endif
+    document.insert_lines(last_endif_line, ['\n'] + indented_code)
+    return True
+
+
+def inject_enum_codes(document: HeaderDocument, enum_codes: List[Dict[str, any]]) -> int:
+    """
+    Record the specializations of several enums, their annotation markers and the includes.
+    
+    Nothing is written until document.save().
+    
+    Args:
+        document: HeaderDocument to record the edits in
+        enum_codes: List of dictionaries with 'enum_name', 'annotation_line', 'code' and optionally
+                    'processed' (annotation already processed), in file order
+        
+    Returns:
+        Number of enums that were injected, regenerated, or had a live annotation
+    """
+    processed = 0
+    for enum_code in enum_codes:
+        injected = inject_enum_code_into_document(document, enum_code['code'])
+        if injected is None or (not injected and enum_code.get('processed')):
+            # No #endif, or an already processed enum whose block is up to date
+            continue
+        mark_enum_annotations_in_document(document, [enum_code['annotation_line']])
+        processed += 1
+    
+    # Add necessary includes
+    if processed:
+        document.add_include("<SerializationUtility.h>")
+        document.add_include("<algorithm>")
+        document.add_include("<cctype>")
+    return processed
 
 
 def mark_enum_annotation_processed(file_path: str, annotation_line: int, dry_run: bool = False) -> bool:
@@ -403,45 +560,45 @@ def mark_enum_annotation_processed(file_path: str, annotation_line: int, dry_run
     Returns:
         True if successful, False otherwise
     """
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            lines = file.readlines()
-    except Exception:
+    document = HeaderDocument.load(file_path)
+    if document is None:
         return False
     
-    if annotation_line < 1 or annotation_line > len(lines):
+    if not mark_enum_annotations_in_document(document, [annotation_line]):
         return False
+    return document.save(dry_run=dry_run)
+
+
+def mark_enum_annotations_in_document(document: HeaderDocument, line_numbers: List[int]) -> bool:
+    """
+    Record the replacement of the enum annotations on specific lines with the processed marker.
     
-    line = lines[annotation_line - 1]
-    stripped = line.strip()
-    
+    Args:
+        document: HeaderDocument to record the edits in
+        line_numbers: Line numbers (1-based) of the annotations
+        
+    Returns:
+        True if at least one line was marked
+    """
     # Pattern to match /* @Serializable */ or /* Serializable */
     annotation_pattern = r'/\*\s*(@?Serializable)\s*\*/'
     
-    if re.search(annotation_pattern, stripped):
-        # Replace with processed marker
-        processed_line = re.sub(
-            r'/\*\s*(@?Serializable)\s*\*/',
-            r'/*--@Serializable--*/',
-            line
-        )
-        
-        if not dry_run:
-            lines[annotation_line - 1] = processed_line
-            try:
-                with open(file_path, 'w', encoding='utf-8') as file:
-                    file.writelines(lines)
-                return True
-            except Exception:
-                return False
-        else:
-            return True
-    
-    return False
+    modified = False
+    for annotation_line in line_numbers:
+        if annotation_line < 1 or annotation_line > len(document.lines):
+            continue
+        line = document.lines[annotation_line - 1]
+        if re.search(annotation_pattern, line.strip()):
+            # Replace with processed marker
+            document.replace_line(annotation_line, re.sub(annotation_pattern, r'/*--@Serializable--*/', line))
+            modified = True
+    return modified
 
 
 def main():
     """Main function to handle command line arguments and process enum serialization."""
+    import argparse
+    
     parser = argparse.ArgumentParser(
         description="Generate serialization/deserialization functions for enums with @Serializable annotation"
     )
@@ -462,46 +619,49 @@ def main():
     
     args = parser.parse_args()
     
-    # Check if enum has annotation
-    enum_info = check_enum_annotation(args.file_path, args.annotation)
+    # Find every enum with the annotation
+    enum_infos = find_enum_annotations(args.file_path, args.annotation)
     
-    if not enum_info or not enum_info.get('has_enum'):
+    if not enum_infos:
         # No enum with annotation found
         return 0
     
-    enum_name = enum_info['enum_name']
-    enum_line = enum_info['enum_line']
-    
-    # Extract enum values
-    enum_values = extract_enum_values(args.file_path, enum_name, enum_line)
-    
-    if not enum_values:
-        # Could not extract enum values
-        return 1
-    
-    # Generate code
-    code = generate_enum_serialization_code(enum_name, enum_values)
+    enum_codes = []
+    for enum_info in enum_infos:
+        enum_name = enum_info['enum_name']
+        enum_values = enum_info['enum_values']
+        
+        if not enum_values:
+            # Could not extract enum values
+            continue
+        
+        # Generate code
+        code = generate_enum_serialization_code(enum_name, enum_values)
+        
+        if args.dry_run:
+            print(f"Would generate code for enum: {enum_name}")
+            print(f"Enum values: {', '.join(enum_values)}")
+            print("\nGenerated code:")
+            print(code)
+            continue
+        
+        enum_codes.append({
+            'enum_name': enum_name,
+            'annotation_line': enum_info['annotation_line'],
+            'code': code
+        })
     
     if args.dry_run:
-        print(f"Would generate code for enum: {enum_name}")
-        print(f"Enum values: {', '.join(enum_values)}")
-        print("\nGenerated code:")
-        print(code)
         return 0
-    
-    # Add necessary includes
-    add_include_if_needed(args.file_path, "<SerializationUtility.h>")
-    add_include_if_needed(args.file_path, "<algorithm>")
-    add_include_if_needed(args.file_path, "<cctype>")
-    
-    # Inject code
-    success = inject_enum_code(args.file_path, code, dry_run=False)
-    if not success:
+    if not enum_codes:
         return 1
     
-    # Mark annotation as processed
-    annotation_line = enum_info['annotation_line']
-    mark_enum_annotation_processed(args.file_path, annotation_line, dry_run=False)
+    # Inject code, mark annotations and add includes in one write
+    document = HeaderDocument.load(args.file_path)
+    if document is None:
+        return 1
+    if inject_enum_codes(document, enum_codes) != len(enum_codes) or not document.save():
+        return 1
     
     return 0
 
@@ -509,10 +669,16 @@ def main():
 # Export functions for other scripts to import
 __all__ = [
     'check_enum_annotation',
+    'find_enum_annotations',
     'extract_enum_values',
+    'extract_enum_values_from_lines',
     'generate_enum_serialization_code',
+    'generate_enum_include',
     'inject_enum_code',
+    'inject_enum_code_into_document',
+    'inject_enum_codes',
     'mark_enum_annotation_processed',
+    'mark_enum_annotations_in_document',
     'main'
 ]
 
@@ -0,0 +1,22 @@
+"""
+Serializer stages of the serializationlib pre-build pipeline.
+
+The stage modules import each other by their plain module names, so this
+directory and serializationlib_core are put on sys.path once here. Use
+Pipeline to run the stages in-process.
+"""
+
+import os
+import sys
+
+_serializer_dir = os.path.dirname(os.path.abspath(__file__))
+_core_dir = os.path.join(os.path.dirname(_serializer_dir), 'serializationlib_core')
+for _path in (_core_dir, _serializer_dir):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+from serializationlib_pipeline import Pipeline
+
+__all__ = [
+    'Pipeline'
+]
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Serializationlib File Processor
+
+Per-file work of the pre-build pipeline: enum serialization, DTO field and
+validation extraction, code generation and injection for a single header.
+Each header is read once and all its edits are written in one atomic write,
+or, with a generated directory, its code goes to include files there and the
+header is left untouched.
+Lives in its own importable module so it can run in worker processes.
+"""
+
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+# Add this directory and serializationlib_core to path for the stage imports
+script_dir = os.path.dirname(os.path.abspath(__file__))
+if script_dir not in sys.path:
+    sys.path.insert(0, script_dir)
+core_dir = os.path.join(os.path.dirname(script_dir), 'serializationlib_core')
+if core_dir not in sys.path:
+    sys.path.insert(0, core_dir)
+
+from serializationlib_file_writer import write_if_changed
+from serializationlib_generated_files import generated_file_path
+from serializationlib_header_document import HeaderDocument
+from serializationlib_profiler import get_profiler
+from serializationlib_scan_context import READ_COUNTERS, ScanContext
+import S1_check_dto_macro
+import S2_extract_dto_fields
+import S3_inject_serialization
+import S7_extract_validation_fields
+import S8_handle_enum_serialization
+
+
+def process_header_file(file_path: str, serializable_macro: str, validation_macros: Dict[str, str],
+                        dry_run: bool = False, scan_context=None, output_dir: Optional[str] = None) -> Dict[str, any]:
+    """
+    Process one header: generate enum specializations and DTO methods for its annotations.
+
+    Args:
+        file_path: Path to the header file
+        serializable_macro: Name of the annotation identifier (Serializable -> @Serializable, _Entity -> @Entity)
+        validation_macros: Validation registry from find_validation_macro_definitions (computed once per run)
+        dry_run: If True, show what would be processed without modifying files
+        scan_context: Optional ScanContext used to read the file from the shared cache
+        output_dir: Optional generated directory; if given, the header is left untouched and
+                    the code for <output_dir>/<Name>.serialization.inc is returned in 'generated'
+
+    Returns:
+        Dictionary with 'file_path', 'processed' (number of enums/classes processed),
+        'modified' (True if the file may have been written), 'outputs' (generated files),
+        'generated' (their (path, content) pairs, to pass to write_generated_files) and
+        'written' (number of generated files whose content changed, filled in by the caller)
+    """
+    result = {
+        'file_path': file_path,
+        'processed': 0,
+        'modified': False,
+        'outputs': [],
+        'generated': [],
+        'written': 0
+    }
+
+    if scan_context is None:
+        # Per-file cache so every stage below shares one read
+        scan_context = ScanContext()
+    profiler = get_profiler()
+    document = HeaderDocument.load(file_path, scan_context=scan_context)
+    if document is None:
+        return result
+
+    # First, find every enum with @Serializable annotation (values are extracted in the same scan).
+    # In place, processed annotations count too, so a changed enum or class regenerates its block
+    with profiler.stage('S8', file_path):
+        enum_infos = S8_handle_enum_serialization.find_enum_annotations(
+            file_path, serializable_macro, scan_context=scan_context, include_processed=not output_dir
+        )
+        enum_codes = []
+        for enum_info in enum_infos or []:
+            if enum_info['enum_values']:
+                # An include file is outside the enum's namespace, so it names the enum in full
+                qualified_name = None
+                if output_dir:
+                    qualified_name = qualified_name_at(document, enum_info['enum_name'], enum_info['enum_line'])
+                enum_codes.append({
+                    'enum_name': enum_info['enum_name'],
+                    'qualified_name': qualified_name,
+                    'processed': enum_info['processed'],
+                    'annotation_line': enum_info['annotation_line'],
+                    'enum_line': enum_info['enum_line'],
+                    'code': S8_handle_enum_serialization.generate_enum_serialization_code(
+                        enum_info['enum_name'], enum_info['enum_values'], qualified_name
+                    )
+                })
+
+    # Find every class with the @Serializable annotation
+    with profiler.stage('S1', file_path):
+        dto_infos = S1_check_dto_macro.find_dto_annotations(
+            file_path, serializable_macro, scan_context=scan_context, include_processed=not output_dir
+        )
+
+    class_methods = []
+    has_optional_fields = False
+    for dto_info in dto_infos:
+        class_name = dto_info['class_name']
+        # Extract fields
+        with profiler.stage('S2', file_path):
+            fields = S2_extract_dto_fields.extract_all_fields(file_path, class_name, scan_context=scan_context)
+
+        if not fields:
+            # print(f"⚠️  Warning: No fields found in {class_name}")
+            pass
+        if any(S3_inject_serialization.is_optional_type(field['type'].strip()) for field in fields):
+            has_optional_fields = True
+
+        # Extract validation fields using the shared validation registry
+        with profiler.stage('S7', file_path):
+            validation_fields_by_macro = S7_extract_validation_fields.extract_validation_fields(
+                file_path, class_name, validation_macros, scan_context=scan_context
+            )
+
+        # Generate methods
+        with profiler.stage('S3 generate', file_path):
+            methods_code = S3_inject_serialization.generate_serialization_methods(
+                class_name, fields, validation_fields_by_macro
+            )
+        class_methods.append({
+            'class_name': class_name,
+            'methods_code': methods_code,
+            'processed': dto_info['processed'],
+            'dto_line': dto_info['dto_line'],
+            'class_line': dto_info['class_line']
+        })
+
+    if output_dir:
+        # The caller writes the files once no other header claims them (write_generated_files)
+        result['generated'] = build_generated_files(document, enum_codes, class_methods, output_dir)
+        result['outputs'] = [output_path for output_path, _ in result['generated']]
+        result['processed'] += len(result['generated'])
+        return result
+
+    with profiler.stage('inject', file_path):
+        # Record all specializations, annotation markers and includes
+        if enum_codes:
+            result['processed'] += S8_handle_enum_serialization.inject_enum_codes(document, enum_codes)
+
+        # Record method injection, annotation markers and includes for all classes
+        includes = ["<optional>"] if has_optional_fields else []
+        result['processed'] += S3_inject_serialization.inject_methods_into_classes(
+            document, class_methods, includes=includes, serializable_annotation=serializable_macro
+        )
+
+    # Apply every edit to the header in one atomic write
+    if document.modified and not dry_run:
+        with profiler.stage('write', file_path):
+            document.save(scan_context=scan_context)
+        result['modified'] = True
+    # print(f"   ✅ Successfully processed {result['processed']} enum(s)/class(es)")
+    return result
+
+
+def build_generated_files(document: HeaderDocument, enum_codes: List[Dict[str, any]],
+                          class_methods: List[Dict[str, any]], output_dir: str) -> List[Tuple[str, str]]:
+    """
+    Build the include files with the generated code of one header.
+
+    Each class or enum gets the file of its namespace-qualified name, so equal
+    names in different namespaces or enclosing classes do not share a file.
+
+    Args:
+        document: HeaderDocument of the header
+        enum_codes: Enum specializations, as built by process_header_file with an output directory
+        class_methods: Class methods, as built by process_header_file
+        output_dir: Generated directory
+
+    Returns:
+        List of (generated file path, content) in header order of enums, then classes
+    """
+    source_name = os.path.basename(document.file_path)
+    generated = []
+    for enum_code in enum_codes:
+        qualified_name = enum_code['qualified_name']
+        generated.append((generated_file_path(output_dir, qualified_name),
+                          S8_handle_enum_serialization.generate_enum_include(
+                              qualified_name, enum_code['code'], source_name
+                          )))
+    for class_info in class_methods:
+        qualified_name = qualified_name_at(document, class_info['class_name'], class_info['class_line'])
+        generated.append((generated_file_path(output_dir, qualified_name),
+                          S3_inject_serialization.generate_class_include(
+                              class_info['class_name'], class_info['methods_code'], source_name
+                          )))
+    return generated
+
+
+def qualified_name_at(document: HeaderDocument, name: str, line_number: int) -> str:
+    """
+    Qualify a class or enum name with the namespaces and classes around its declaration.
+
+    Args:
+        document: HeaderDocument of the header
+        name: Class or enum name
+        line_number: Line (1-based) of the declaration
+
+    Returns:
+        Qualified name (e.g., "app::dto::UserDto"), or the name itself at global scope
+    """
+    line = document.lines[line_number - 1]
+    offset = document.offset_of_line(line_number) + len(line) - len(line.lstrip())
+    scope = document.class_index.scope_of(offset)
+    return f"{scope}::{name}" if scope else name
+
+
+def write_generated_files(generated: List[Tuple[str, str]], dry_run: bool = False) -> int:
+    """
+    Write the include files of one header to the generated directory.
+
+    Args:
+        generated: List of (generated file path, content) from build_generated_files
+        dry_run: If True, don't actually write files
+
+    Returns:
+        Number of files whose content changed
+    """
+    written = 0
+    if dry_run:
+        return written
+    for output_path, content in generated:
+        try:
+            if write_if_changed(output_path, content):
+                written += 1
+        except OSError:
+            # print(f"Error writing {output_path}")
+            continue
+    return written
+
+
+def process_header_file_task(task: tuple) -> Dict[str, any]:
+    """
+    Worker entry point for ProcessPoolExecutor.map.
+
+    Args:
+        task: Tuple of (file_path, serializable_macro, validation_macros, dry_run, output_dir)
+
+    Returns:
+        Result dictionary from process_header_file, plus 'counters' (file reads of the task)
+        and 'profile' (data drained from the worker's Profiler, None unless profiling)
+    """
+    file_path, serializable_macro, validation_macros, dry_run, output_dir = task
+    profiler = get_profiler()
+    if profiler.enabled:
+        # A forked worker starts with a copy of the parent's data
+        profiler.reset()
+        profiler.install_regex_counter()
+    scan_context = ScanContext()
+    result = process_header_file(file_path, serializable_macro, validation_macros, dry_run=dry_run,
+                                 scan_context=scan_context, output_dir=output_dir)
+    result['counters'] = {name: scan_context.counters[name] for name in READ_COUNTERS}
+    result['profile'] = profiler.drain()
+    return result
+
+
+def process_header_file_tasks(tasks: List[tuple]) -> List[Dict[str, any]]:
+    """
+    Worker entry point for a chunk of headers, to submit several headers at once.
+
+    Args:
+        tasks: Tuples for process_header_file_task
+
+    Returns:
+        Result dictionaries from process_header_file_task, in task order
+    """
+    return [process_header_file_task(task) for task in tasks]
+
+
+def resolve_jobs(jobs: Optional[int] = None) -> int:
+    """
+    Resolve the number of worker processes.
+
+    Uses the jobs argument, then the SERIALIZATIONLIB_JOBS environment variable,
+    then 1 (sequential). A value of 0 means one worker per CPU.
+
+    Args:
+        jobs: Requested number of jobs, or None to read the environment
+
+    Returns:
+        Number of worker processes (at least 1)
+    """
+    if jobs is None:
+        try:
+            jobs = int(os.environ.get('SERIALIZATIONLIB_JOBS', '1'))
+        except ValueError:
+            jobs = 1
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    return jobs
+
+
+# Export functions for other scripts to import
+__all__ = [
+    'process_header_file',
+    'process_header_file_task',
+    'process_header_file_tasks',
+    'build_generated_files',
+    'write_generated_files',
+    'resolve_jobs'
+]
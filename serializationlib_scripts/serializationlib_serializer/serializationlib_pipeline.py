@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Serializationlib Pipeline
+
+In-process API for the pre-build pipeline. A Pipeline instance keeps its
+configuration, fingerprint ledger and validation macro cache between runs, so
+long-lived callers can call run() repeatedly. With an output directory,
+generated code goes to include files there instead of into the headers.
+
+The stage modules are imported on first use, once a run finds an annotated
+header, and the include graph only with a compilation database, so a build
+without changes only pays for discovery, the validation registry and the ledger.
+Identical library copies installed for several PlatformIO environments are
+parsed once; the other copies receive the result.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+# Add this directory and serializationlib_core to path for the stage imports
+script_dir = os.path.dirname(os.path.abspath(__file__))
+if script_dir not in sys.path:
+    sys.path.insert(0, script_dir)
+core_dir = os.path.join(os.path.dirname(script_dir), 'serializationlib_core')
+if core_dir not in sys.path:
+    sys.path.insert(0, core_dir)
+
+from serializationlib_generated_files import resolve_output_dir
+from serializationlib_ledger import BuildLedger, compute_tool_version, hash_validation_registry
+from serializationlib_profiler import default_profile_dir, get_profiler
+from serializationlib_scan_context import ScanContext
+from serializationlib_validation_cache import ValidationMacroCache
+
+
+class Pipeline:
+    """
+    Processes every header with @Serializable classes and enums in a project.
+    """
+
+    def __init__(self, project_dir=None, library_dir=None, serializable_macro: str = "Serializable",
+                 jobs: Optional[int] = None, use_ledger: bool = True, output_dir=None, compile_commands=None):
+        """
+        Args:
+            project_dir: Path to the client project root (where platformio.ini is)
+            library_dir: Path to the serializationlib library root
+            serializable_macro: Name of the annotation identifier (Serializable -> @Serializable, _Entity -> @Entity)
+            jobs: Number of worker processes (default: SERIALIZATIONLIB_JOBS or 1, 0 = one per CPU)
+            use_ledger: If True, skip headers and validation sources unchanged since the previous run
+            output_dir: Generated directory for out-of-tree output (default: from SERIALIZATIONLIB_OUTPUT,
+                        None = inject into the headers in place)
+            compile_commands: compile_commands.json or "auto" to only process the library headers
+                              the build includes (default: from SERIALIZATIONLIB_COMPILE_COMMANDS,
+                              None = every library header)
+        """
+        self.project_dir = str(project_dir) if project_dir else None
+        self.library_dir = str(library_dir) if library_dir else None
+        self.serializable_macro = serializable_macro or "Serializable"
+        self.jobs = jobs
+        self.use_ledger = use_ledger
+        self.output_dir = resolve_output_dir(self.project_dir, output_dir)
+        self.compile_commands = None
+        # The include graph module is only loaded when a compilation database is requested
+        if compile_commands is not None or os.environ.get('SERIALIZATIONLIB_COMPILE_COMMANDS'):
+            from serializationlib_include_graph import resolve_compile_commands
+            self.compile_commands = resolve_compile_commands(self.project_dir, compile_commands)
+        self.scan_context: Optional[ScanContext] = None
+        # Path to profile.json of the last run (SERIALIZATIONLIB_PROFILE)
+        self.profile_report: Optional[str] = None
+        self._ledger = None
+        self._validation_cache = None
+        self._include_graph = None
+        self._caches_loaded = False
+
+    @property
+    def ledger(self) -> Optional[BuildLedger]:
+        """Fingerprint ledger of the project, loaded on first use (None if disabled)."""
+        self._load_caches()
+        return self._ledger
+
+    @property
+    def validation_cache(self) -> Optional[ValidationMacroCache]:
+        """Validation macro cache of the project, loaded on first use (None if disabled)."""
+        self._load_caches()
+        return self._validation_cache
+
+    @property
+    def include_graph(self) -> Optional[IncludeGraph]:
+        """Include graph of the compilation database, loaded on first use (None without one)."""
+        self._load_caches()
+        return self._include_graph
+
+    def _load_caches(self) -> None:
+        if self._caches_loaded:
+            return
+        self._caches_loaded = True
+        if not self.use_ledger:
+            # The include graph still restricts scanning, it just isn't kept between runs
+            if self.compile_commands:
+                from serializationlib_include_graph import IncludeGraph
+                self._include_graph = IncludeGraph(self.compile_commands)
+            return
+        try:
+            tool_version = compute_tool_version()
+            # Skipped headers must have been processed for the same annotation and output mode
+            ledger_version = f'{tool_version}+{self.serializable_macro}+{self.output_dir or "in-place"}'
+            self._ledger = BuildLedger.for_project(self.project_dir, ledger_version)
+            self._validation_cache = ValidationMacroCache.for_project(self.project_dir, tool_version)
+            if self.compile_commands:
+                from serializationlib_include_graph import IncludeGraph
+                self._include_graph = IncludeGraph.for_project(self.project_dir, self.compile_commands, tool_version)
+        except Exception:
+            import traceback
+            traceback.print_exc()
+
+    def create_scan_context(self) -> ScanContext:
+        """
+        Create the scan context for one run.
+
+        Returns:
+            ScanContext over the project, its libraries and this library
+        """
+        return ScanContext(self.project_dir, self.library_dir, ledger=self.ledger,
+                           validation_cache=self.validation_cache, include_graph=self.include_graph)
+
+    def find_validation_macros(self, scan_context: ScanContext) -> Dict[str, str]:
+        """
+        Build the validation macro registry once for a run, shared by every header.
+
+        Args:
+            scan_context: ScanContext of the run
+
+        Returns:
+            Dictionary mapping macro names to validation function names
+        """
+        import S6_discover_validation_macros
+        with get_profiler().stage('S6'):
+            return S6_discover_validation_macros.find_validation_macro_definitions(None, scan_context=scan_context)
+
+    def process_files(self, header_files: List[str], scan_context: ScanContext, dry_run: bool = False,
+                      validation_macros: Optional[Dict[str, str]] = None) -> int:
+        """
+        Generate serialization code for a list of headers.
+
+        Args:
+            header_files: Headers to process
+            scan_context: ScanContext of the run
+            dry_run: If True, show what would be processed without modifying files
+            validation_macros: Validation registry of the run (default: find_validation_macros)
+
+        Returns:
+            Number of enums and classes processed
+        """
+        header_files = [file_path for file_path in header_files if scan_context.exists(file_path)]
+        if not header_files:
+            return 0
+        # Identical copies of a library (one per PlatformIO environment) reuse the result of the first copy
+        header_files, copies = self.split_library_copies(header_files, scan_context)
+
+        from serializationlib_file_processor import (
+            process_header_file, process_header_file_task, process_header_file_tasks, resolve_jobs
+        )
+        processed_count = 0
+
+        # Discover validation macros once per run and share the registry with every file
+        if validation_macros is None:
+            validation_macros = self.find_validation_macros(scan_context)
+
+        jobs = min(resolve_jobs(self.jobs), len(header_files))
+
+        # A header that fails is reported and left out; the other headers are still processed
+        results = []
+        if jobs <= 1:
+            # Process each header file in this process, reading through the shared cache
+            for file_path in header_files:
+                try:
+                    results.append(process_header_file(
+                        file_path, self.serializable_macro, validation_macros, dry_run=dry_run,
+                        scan_context=scan_context, output_dir=self.output_dir
+                    ))
+                except Exception:
+                    self.mark_failed(file_path, copies, scan_context)
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            # Spread the per-file work over worker processes in chunks. Every header is independent
+            # and written only by its own worker (generated files are written here afterwards);
+            # results are collected in input order.
+            tasks = [(file_path, self.serializable_macro, validation_macros, dry_run, self.output_dir)
+                     for file_path in header_files]
+            chunksize = max(1, len(tasks) // (jobs * 4))
+            chunks = [tasks[start:start + chunksize] for start in range(0, len(tasks), chunksize)]
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                futures = [executor.submit(process_header_file_tasks, chunk) for chunk in chunks]
+                for chunk, future in zip(chunks, futures):
+                    try:
+                        results.extend(future.result())
+                        continue
+                    except Exception:
+                        if len(chunk) == 1:
+                            self.mark_failed(chunk[0][0], copies, scan_context)
+                            continue
+                    # Retry the headers of a failed chunk one by one, so only the failing ones are left out
+                    for task in chunk:
+                        try:
+                            results.append(executor.submit(process_header_file_task, task).result())
+                        except Exception:
+                            self.mark_failed(task[0], copies, scan_context)
+
+        profiler = get_profiler()
+        if self.output_dir:
+            self.write_generated_files(results, scan_context, dry_run=dry_run)
+        for result in results:
+            processed_count += result['processed']
+            # Worker processes report their reads and profile data with the result
+            for name, value in result.get('counters', {}).items():
+                scan_context.counters[name] += value
+            profiler.merge(result.get('profile'))
+            if result['modified']:
+                scan_context.invalidate(result['file_path'])
+            # The ledger only skips the header while its generated files exist
+            for output_path in result['outputs']:
+                scan_context.add_output(result['file_path'], output_path)
+            scan_context.counters['generated_files_written'] += result['written']
+            scan_context.counters['generated_files_unchanged'] += len(result['outputs']) - result['written']
+            for copy_path in copies.get(result['file_path'], ()):
+                processed_count += self.apply_to_copy(result, copy_path, scan_context, dry_run=dry_run)
+        return processed_count
+
+    def mark_failed(self, file_path: str, copies: Dict[str, List[str]], scan_context: ScanContext) -> None:
+        """
+        Report a header whose processing raised and keep it (and its library copies) out of the ledger.
+
+        Call this from an exception handler; the traceback of the exception is printed.
+
+        Args:
+            file_path: Path to the header
+            copies: Duplicate library copies of parsed headers, from split_library_copies
+            scan_context: ScanContext of the run
+        """
+        import traceback
+        print(f"serializationlib: failed to process {file_path}; other headers are still processed")
+        traceback.print_exc()
+        scan_context.mark_failed(file_path)
+        for copy_path in copies.get(file_path, ()):
+            scan_context.mark_failed(copy_path)
+
+    def write_generated_files(self, results: List[Dict[str, any]], scan_context: ScanContext,
+                              dry_run: bool = False) -> None:
+        """
+        Write the generated files of every processed header.
+
+        All headers claim their files first, so a file produced by two headers (or by a
+        header and an unchanged header of an earlier run) fails the run before any write,
+        also when the headers were processed by different worker processes.
+
+        Args:
+            results: Results of process_header_file, updated with 'written'
+            scan_context: ScanContext of the run
+            dry_run: If True, don't actually write files
+
+        Raises:
+            ValueError: If two headers produce the same generated file
+        """
+        from serializationlib_file_processor import write_generated_files
+        for result in results:
+            scan_context.claim_outputs(result['file_path'], result['outputs'])
+        with get_profiler().stage('write'):
+            for result in results:
+                result['written'] = write_generated_files(result['generated'], dry_run=dry_run)
+
+    def split_library_copies(self, header_files: List[str],
+                             scan_context: ScanContext) -> Tuple[List[str], Dict[str, List[str]]]:
+        """
+        Separate headers of duplicate library copies from the headers to parse.
+
+        A copy is only separated when its first copy is processed in the same run and
+        both have the same content.
+
+        Args:
+            header_files: Headers to process
+            scan_context: ScanContext of the run
+
+        Returns:
+            Tuple of (headers to parse, dictionary mapping a parsed header to its copies)
+        """
+        library_copies = scan_context.library_copies
+        if not library_copies:
+            return header_files, {}
+        pending = set(header_files)
+        primaries = []
+        copies: Dict[str, List[str]] = {}
+        for file_path in header_files:
+            representative = library_copies.get(file_path)
+            if representative in pending:
+                try:
+                    identical = scan_context.read_text(file_path) == scan_context.read_text(representative)
+                except (OSError, UnicodeDecodeError):
+                    identical = False
+                if identical:
+                    copies.setdefault(representative, []).append(file_path)
+                    continue
+            primaries.append(file_path)
+        return primaries, copies
+
+    def apply_to_copy(self, result: Dict[str, any], copy_path: str, scan_context: ScanContext,
+                      dry_run: bool = False) -> int:
+        """
+        Give a duplicate library header the result of its parsed copy without parsing it.
+
+        In place, the processed content of the parsed header is written to the copy.
+        Generated files are shared, so they are only registered for the copy.
+
+        Args:
+            result: Result of process_header_file for the parsed header
+            copy_path: Path to the duplicate header
+            scan_context: ScanContext of the run
+            dry_run: If True, leave the copy untouched
+
+        Returns:
+            Number of enums and classes processed (the same as for the parsed header)
+        """
+        scan_context.counters['headers_deduplicated'] += 1
+        if result['modified'] and not dry_run:
+            from serializationlib_file_writer import write_if_changed
+            if write_if_changed(copy_path, scan_context.read_text(result['file_path'])):
+                scan_context.invalidate(copy_path)
+        for output_path in result['outputs']:
+            scan_context.add_output(copy_path, output_path)
+        return result['processed']
+
+    def run(self, dry_run: bool = False, scan_context: Optional[ScanContext] = None) -> int:
+        """
+        Run the pipeline over the project.
+
+        A scan context created here records fingerprints in the ledger once the run
+        completes; a scan context passed in is left to the caller.
+
+        Args:
+            dry_run: If True, show what would be processed without modifying files
+            scan_context: Optional ScanContext to use instead of a new one
+
+        Returns:
+            Number of enums and classes processed
+        """
+        if not self.project_dir:
+            return 0
+
+        profiler = get_profiler()
+        profiler.start()
+        processed_count = 0
+        owns_scan_context = scan_context is None
+        try:
+            if owns_scan_context:
+                scan_context = self.create_scan_context()
+            self.scan_context = scan_context
+
+            # The registry comes first: when a macro changed, headers unchanged since the
+            # last run still need their validation code regenerated
+            validation_macros = self.find_validation_macros(scan_context)
+            if scan_context.ledger is not None:
+                scan_context.ledger.require_validation_registry(hash_validation_registry(validation_macros))
+            # Header files from project_dir and all discovered libraries in build/_deps/ and .pio/libdeps/,
+            # prefiltered so only files with a live annotation reach the line-by-line stages
+            processed_count = self.process_files(scan_context.annotated_header_files, scan_context,
+                                                 dry_run=dry_run, validation_macros=validation_macros)
+
+            # Only remember fingerprints after a complete run, so failures are retried next build
+            if owns_scan_context and not dry_run:
+                with profiler.stage('ledger'):
+                    scan_context.commit_ledger()
+        finally:
+            if profiler.enabled:
+                from serializationlib_file_processor import resolve_jobs
+                self.profile_report = profiler.finish(default_profile_dir(self.project_dir), extra={
+                    'project_dir': self.project_dir,
+                    'jobs': resolve_jobs(self.jobs),
+                    'dry_run': dry_run,
+                    'processed': processed_count,
+                    'scan_counters': scan_context.report() if scan_context is not None else {},
+                })
+        return processed_count
+
+
+# Export functions for other scripts to import
+__all__ = [
+    'Pipeline'
+]
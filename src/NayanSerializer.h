@@ -8,6 +8,13 @@ using std::optional;
 // They are written as //@AnnotationName in source files
 // After processing, they become /*@AnnotationName*/ to be ignored
 // Examples: //@Serializable, //@NotNull, //@NotBlank, //@NotEmpty
+//
+// With out-of-tree output (SERIALIZATIONLIB_OUTPUT=generated) the headers are not
+// rewritten; include the generated code instead:
+//   inside a @Serializable class body:  #include "ClassName.serialization.inc"
+//   after a @Serializable enum:         #include "EnumName.serialization.inc"
+// Classes and enums inside namespaces or classes use one directory per scope,
+// e.g. #include "app/dto/UserDto.serialization.inc" for app::dto::UserDto.
 
 #include <ArduinoJson.h>
 #include <StandardDefines.h>